@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as StageTimeout
+from typing import Callable, Dict, Optional
+
+# ----------------------------
+# Request deadlines with per-stage budgets
+# ----------------------------
+#
+# A /report request gets a hard deadline. Its stages run concurrently on the
+# stage executor, and the pipeline waits for each one at most its budget (a
+# share of the deadline, counted from when the stage was submitted, and
+# never past the deadline itself). A stage that overruns cannot be
+# interrupted (model calls are not cancellable), so it finishes in the
+# background: fusion proceeds with the signals that are available, and once
+# the overrunning stages settle a callback re-fuses the report.
+#
+# Environment overrides:
+#   COASTAL_DEADLINE_IMAGE_MS   deadline for image reports (default 10000, 0 = none)
+#   COASTAL_DEADLINE_VIDEO_MS   deadline for video reports (default 90000, 0 = none)
+
+DEADLINE_MS = {
+    "image": float(os.environ.get("COASTAL_DEADLINE_IMAGE_MS", "10000")),
+    "video": float(os.environ.get("COASTAL_DEADLINE_VIDEO_MS", "90000")),
+}
+
+# Share of the deadline each stage may take. Vision runs first; satellite and
+# text understanding start when it returns, so the chain fits in the deadline.
+STAGE_BUDGETS = {
+    "quality": 0.3,
+    "vision": 0.6,
+    "social": 0.6,
+    "satellite": 0.3,
+    "text_understanding": 0.3,
+}
+
+# Share of the deadline kept for fusion and bookkeeping after the last wait
+FUSION_RESERVE = 0.05
+
+
+def deadline_for(kind: str) -> Optional[float]:
+    """Deadline in seconds for an "image" or "video" report (None = no deadline)"""
+    deadline_ms = DEADLINE_MS.get(kind, DEADLINE_MS["image"])
+    return deadline_ms / 1000 if deadline_ms > 0 else None
+
+
+def missing_stage(stage: str, status: str = "timeout", **details) -> Dict:
+    """Placeholder result for a stage that is not available at fusion time"""
+    return {"status": status, "stage": stage, **details}
+
+
+class StageRunner:
+    """
+    Runs the stages of one request and waits for each within its budget
+
+    Without a deadline every stage runs inline, to completion, in the
+    calling thread (the plain sequential pipeline, e.g. for profiling and
+    evaluation runs).
+    """
+
+    def __init__(self, deadline_s: float = None, executor=None, budgets: Dict = None, started: float = None):
+        self.deadline_s = deadline_s
+        self.executor = executor
+        self.budgets = {**STAGE_BUDGETS, **(budgets or {})}
+        # time.perf_counter() when the request arrived (queue wait and
+        # decoding before the first stage count toward the deadline)
+        self.started = time.perf_counter() if started is None else started
+        self._futures = {}
+        self._submitted = {}
+        self._finished = {}
+        self.missed = []
+
+    def submit(self, stage: str, fn, *args, **kwargs):
+        self._submitted[stage] = time.perf_counter()
+
+        if self.deadline_s is None:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = self.executor.submit(fn, *args, **kwargs)
+
+        self._futures[stage] = future
+        future.add_done_callback(lambda _: self._finished.setdefault(stage, time.perf_counter()))
+
+    def _timeout(self, stage: str, wait: bool) -> Optional[float]:
+        if self.deadline_s is None:
+            return None
+        if not wait:
+            return 0.0
+        end = min(
+            self._submitted[stage] + self.budgets.get(stage, 1.0) * self.deadline_s,
+            self.started + (1 - FUSION_RESERVE) * self.deadline_s
+        )
+        return max(0.0, end - time.perf_counter())
+
+    def result(self, stage: str, wait: bool = True):
+        """
+        Result of a stage, or None when it missed its budget
+
+        Args:
+            stage: Stage name given to submit()
+            wait: False = take the result only if it is already there
+
+        Raises:
+            The stage's own exception if it failed in time
+        """
+
+        try:
+            return self._futures[stage].result(timeout=self._timeout(stage, wait))
+        except StageTimeout:
+            if stage not in self.missed:
+                self.missed.append(stage)
+            return None
+
+    def when_settled(self, callback: Callable[[Dict], None]):
+        """
+        Call callback(late) once every missed stage has finished
+
+        late maps each missed stage to its result, or to the exception it
+        raised. Runs in the thread that finished the last stage.
+        """
+
+        stages = list(self.missed)
+        remaining = [len(stages)]
+        lock = threading.Lock()
+
+        def settled(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            late = {}
+            for stage in stages:
+                future = self._futures[stage]
+                late[stage] = future.exception() or future.result()
+            callback(late)
+
+        for stage in stages:
+            self._futures[stage].add_done_callback(settled)
+
+    def report(self) -> Dict:
+        """Deadline, elapsed time and per-stage durations (None = missed)"""
+        return {
+            "deadline_ms": None if self.deadline_s is None else round(self.deadline_s * 1000),
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000),
+            "stages_ms": {
+                stage: None if stage in self.missed
+                else round((self._finished.get(stage, time.perf_counter()) - submitted) * 1000)
+                for stage, submitted in self._submitted.items()
+            },
+            "missed": list(self.missed),
+        }
@@ -0,0 +1,429 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import cv2
+import numpy as np
+
+# ----------------------------
+# Thresholds
+# ----------------------------
+
+# Hamming distance (out of 64 bits) below which two images are near-duplicates
+NEAR_DUPLICATE_DISTANCE = 10
+# Hamming distance below which the prior vision result can be reused as-is
+REUSE_DISTANCE = 4
+
+# CLIP cosine similarity above which two images are near-duplicates (catches crops)
+NEAR_DUPLICATE_SIMILARITY = 0.92
+# CLIP cosine similarity above which the prior vision result can be reused
+REUSE_SIMILARITY = 0.97
+
+# COASTAL_DUPLICATE_REUSE=0 still flags near-duplicates but always re-runs
+# the vision stage (load tests replay the same files)
+REUSE_RESULTS = os.environ.get("COASTAL_DUPLICATE_REUSE", "1") == "1"
+
+# Multi-index hashing: the 64-bit hash is split into 4 chunks of 16 bits
+HASH_CHUNKS = 4
+CHUNK_BITS = 16
+
+
+def perceptual_hash(image) -> int:
+    """
+    Compute a 64-bit DCT perceptual hash (pHash)
+
+    Robust to re-encoding, resizing and mild colour changes, so recycled
+    photos keep (almost) the same hash.
+
+    Args:
+        image: Path to image file or decoded RGB/grayscale array (see backend.ingest)
+
+    Returns:
+        64-bit hash as a Python int
+    """
+
+    if isinstance(image, str):
+        # A reduced grayscale decode is plenty for a 32x32 thumbnail
+        gray = cv2.imread(image, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        if gray is None:
+            raise ValueError(f"Unable to load image: {image}")
+    elif image.ndim == 3:
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    else:
+        gray = image
+
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    dct = cv2.dct(small)[:8, :8]
+
+    # Compare low frequencies against their median (skip the DC term)
+    median = np.median(dct.flatten()[1:])
+    bits = (dct > median).flatten()
+
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def _chunk_values(value: int) -> List[int]:
+    mask = (1 << CHUNK_BITS) - 1
+    return [(value >> (i * CHUNK_BITS)) & mask for i in range(HASH_CHUNKS)]
+
+
+def _chunk_neighbours(chunk: int, radius: int) -> List[int]:
+    """All chunk values within `radius` bit flips of `chunk`"""
+    values = [chunk]
+    frontier = [(chunk, -1)]
+    for _ in range(radius):
+        next_frontier = []
+        for value, last_bit in frontier:
+            for bit in range(last_bit + 1, CHUNK_BITS):
+                flipped = value ^ (1 << bit)
+                values.append(flipped)
+                next_frontier.append((flipped, bit))
+        frontier = next_frontier
+    return values
+
+
+class DuplicateIndex:
+    """
+    Index of previously analyzed media for near-duplicate lookup
+
+    - Perceptual hashes are searched with multi-index hashing: by the
+      pigeonhole principle, two hashes within Hamming distance r agree to
+      within r // 4 bits on at least one of the four 16-bit chunks, so only
+      a handful of buckets are probed regardless of archive size.
+    - CLIP image embeddings are kept in a contiguous float32 matrix for
+      vectorized cosine top-k (catches crops that move the hash).
+
+    When `storage_dir` is given, entries are appended to flat files so the
+    index survives restarts without rewriting the whole archive. Several
+    processes (the workers of backend.prefork) can share one storage
+    directory: each picks up the others' appends before adding or looking up.
+    The embedding matrix (3 KB per image at 768 dims) is then memory-mapped
+    from embeddings.f32 rather than loaded, so workers share one copy in the
+    page cache and appends only extend the mapping. Without `storage_dir`
+    it is held in RAM (tests and evaluation runs).
+    """
+
+    def __init__(self, embedding_dim: int = 768, storage_dir: Optional[str] = None):
+        self.embedding_dim = embedding_dim
+        self.storage_dir = storage_dir
+        self._lock = threading.Lock()
+
+        self._tables = [dict() for _ in range(HASH_CHUNKS)]
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        # Memory-mapped (storage_dir) or in-memory embedding rows
+        self._embeddings = np.zeros((0 if storage_dir else 1024, embedding_dim), dtype=np.float32)
+        self._has_embedding = np.zeros(1024, dtype=bool)
+        self._entries = []
+
+        # Bytes of entries.jsonl already inserted (see _sync())
+        self._entries_bytes = 0
+
+        if storage_dir:
+            os.makedirs(storage_dir, exist_ok=True)
+            with self._storage_lock():
+                self._sync()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ---------- Storage ----------
+
+    def _paths(self):
+        return (
+            os.path.join(self.storage_dir, "hashes.u64"),
+            os.path.join(self.storage_dir, "embeddings.f32"),
+            os.path.join(self.storage_dir, "entries.jsonl"),
+        )
+
+    @contextmanager
+    def _storage_lock(self):
+        # Workers of a multi-process server append to the same files; keep
+        # the three records of one entry together
+        with open(os.path.join(self.storage_dir, ".lock"), "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _sync(self):
+        """
+        Insert the records appended since the last sync (by this or another process)
+
+        Called with the storage lock held, so no append is in progress.
+        """
+
+        hash_path, emb_path, entries_path = self._paths()
+        if not os.path.exists(entries_path):
+            return
+
+        known = len(self._entries)
+
+        # Keep only complete lines (a crash can leave a torn last line)
+        entries, ends = [], []
+        with open(entries_path, "rb") as f:
+            f.seek(self._entries_bytes)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+                ends.append((ends[-1] if ends else self._entries_bytes) + len(line))
+
+        hashes = np.fromfile(hash_path, dtype=np.uint64, offset=known * 8) if os.path.exists(hash_path) else np.zeros(0, dtype=np.uint64)
+        embedding_rows = os.path.getsize(emb_path) // (self.embedding_dim * 4) if os.path.exists(emb_path) else 0
+
+        # Entries are written last, so a partial append leaves extra hash /
+        # embedding records behind; cut all three files back to the last
+        # complete entry, otherwise the next append would be misaligned
+        count = min(len(entries), len(hashes), max(0, embedding_rows - known))
+        total = known + count
+        self._entries_bytes = ends[count - 1] if count else self._entries_bytes
+        sizes = (total * 8, total * self.embedding_dim * 4, self._entries_bytes)
+        for path, size in zip((hash_path, emb_path, entries_path), sizes):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+        self._map_embeddings(total)
+        for i in range(count):
+            self._insert(entries[i], int(hashes[i]), None, entries[i].get("has_embedding", False))
+
+    def _map_embeddings(self, rows: int):
+        """Map the first `rows` embeddings of embeddings.f32 (no copy)"""
+        if rows == len(self._embeddings):
+            return
+        _, emb_path, _ = self._paths()
+        # Read-only: rows are only ever appended, through _append_to_storage().
+        # Earlier mappings stay valid for lookups still using them
+        self._embeddings = np.memmap(emb_path, dtype=np.float32, mode="r", shape=(rows, self.embedding_dim))
+
+    def _storage_changed(self) -> bool:
+        _, _, entries_path = self._paths()
+        try:
+            return os.path.getsize(entries_path) != self._entries_bytes
+        except OSError:
+            return False
+
+    def _append_to_storage(self, entry: Dict, phash: int, embedding: np.ndarray):
+        hash_path, emb_path, entries_path = self._paths()
+
+        with open(hash_path, "ab") as f:
+            f.write(np.array([phash], dtype=np.uint64).tobytes())
+        with open(emb_path, "ab") as f:
+            f.write(embedding.astype(np.float32).tobytes())
+        line = (json.dumps(entry) + "\n").encode("utf-8")
+        with open(entries_path, "ab") as f:
+            f.write(line)
+        self._entries_bytes += len(line)
+
+    # ---------- Insert ----------
+
+    def _grow(self):
+        # Hashes and flags are 9 bytes per entry; the embedding matrix is
+        # only copied when held in memory (no storage_dir)
+        capacity = len(self._hashes) * 2
+        self._hashes = np.resize(self._hashes, capacity)
+        if not self.storage_dir:
+            embeddings = np.zeros((capacity, self.embedding_dim), dtype=np.float32)
+            embeddings[: len(self._embeddings)] = self._embeddings
+            self._embeddings = embeddings
+        has_embedding = np.zeros(capacity, dtype=bool)
+        has_embedding[: len(self._has_embedding)] = self._has_embedding
+        self._has_embedding = has_embedding
+
+    def _insert(self, entry: Dict, phash: int, embedding: Optional[np.ndarray], has_embedding: bool):
+        """Index one entry; `embedding` is None when it is already in the mapped file"""
+        idx = len(self._entries)
+        if idx >= len(self._hashes):
+            self._grow()
+
+        self._hashes[idx] = phash
+        if embedding is not None:
+            self._embeddings[idx] = embedding
+        self._has_embedding[idx] = has_embedding
+        self._entries.append(entry)
+
+        for table, chunk in zip(self._tables, _chunk_values(phash)):
+            table.setdefault(chunk, []).append(idx)
+
+    def add(self, report_id: str, phash: int, embedding=None, vision_result: dict = None, timestamp: str = None):
+        """
+        Add an analyzed image to the index
+
+        Args:
+            report_id: ID of the report the image belongs to
+            phash: Perceptual hash from perceptual_hash()
+            embedding: Optional CLIP image embedding
+            vision_result: Vision AI result to reuse for future duplicates
+            timestamp: ISO timestamp (defaults to now, UTC)
+        """
+
+        has_embedding = embedding is not None
+        if has_embedding:
+            vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm > 0 else vector
+        else:
+            vector = np.zeros(self.embedding_dim, dtype=np.float32)
+
+        entry = {
+            "report_id": report_id,
+            "timestamp": timestamp or datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "has_embedding": has_embedding,
+            "vision_result": vision_result,
+        }
+
+        with self._lock:
+            if not self.storage_dir:
+                self._insert(entry, phash, vector, has_embedding)
+                return
+            # Catch up first, so in-memory order matches the files
+            with self._storage_lock():
+                self._sync()
+                self._append_to_storage(entry, phash, vector)
+                self._map_embeddings(len(self._entries) + 1)
+                self._insert(entry, phash, None, has_embedding)
+
+    # ---------- Lookup ----------
+
+    def _hash_candidates(self, phash: int, max_distance: int) -> np.ndarray:
+        radius = max_distance // HASH_CHUNKS
+        candidates = set()
+        for table, chunk in zip(self._tables, _chunk_values(phash)):
+            for value in _chunk_neighbours(chunk, radius):
+                bucket = table.get(value)
+                if bucket:
+                    candidates.update(bucket)
+        return np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+
+    def embedding_of(self, idx: int) -> Optional[np.ndarray]:
+        return self._embeddings[idx].copy() if self._has_embedding[idx] else None
+
+    def find_near_duplicates(
+        self,
+        phash: int,
+        embedding=None,
+        max_distance: int = NEAR_DUPLICATE_DISTANCE,
+        min_similarity: float = NEAR_DUPLICATE_SIMILARITY,
+        top_k: int = 5,
+    ) -> List[Dict]:
+        """
+        Find previously analyzed images that are near-duplicates
+
+        Args:
+            phash: Perceptual hash of the new image
+            embedding: Optional CLIP image embedding of the new image
+            max_distance: Maximum Hamming distance for a hash match
+            min_similarity: Minimum cosine similarity for an embedding match
+            top_k: Maximum number of matches returned
+
+        Returns:
+            Matches sorted from closest to farthest
+        """
+
+        if self.storage_dir and self._storage_changed():
+            with self._lock, self._storage_lock():
+                self._sync()
+
+        with self._lock:
+            count = len(self._entries)
+            if count == 0:
+                return []
+
+            # 1. Hash lookup (multi-index hashing + vectorized popcount)
+            candidates = self._hash_candidates(phash, max_distance)
+
+            # Rows below `count` are never written again (inserts only append,
+            # _grow() copies into new arrays and a remap leaves the old mapping
+            # intact), so the scans below can run on these references without
+            # holding the lock
+            hashes = self._hashes
+            embeddings = self._embeddings
+            has_embedding = self._has_embedding
+            entries = self._entries
+
+        matches = {}
+        if len(candidates):
+            distances = np.bitwise_count(hashes[candidates] ^ np.uint64(phash))
+            for idx, distance in zip(candidates[distances <= max_distance], distances[distances <= max_distance]):
+                matches[int(idx)] = {"hamming_distance": int(distance), "cosine_similarity": None}
+
+        # 2. Embedding lookup (cosine top-k over the stored embedding matrix)
+        if embedding is not None:
+            query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+            norm = np.linalg.norm(query)
+            if norm > 0:
+                query = query / norm
+                similarities = embeddings[:count] @ query
+                similarities[~has_embedding[:count]] = -1.0
+
+                k = min(top_k, count)
+                top = np.argpartition(-similarities, k - 1)[:k]
+                for idx in top:
+                    if similarities[idx] >= min_similarity:
+                        match = matches.setdefault(int(idx), {"hamming_distance": None, "cosine_similarity": None})
+                        match["cosine_similarity"] = round(float(similarities[idx]), 4)
+
+                # Fill in similarities for hash-only matches
+                for idx, match in matches.items():
+                    if match["cosine_similarity"] is None and has_embedding[idx]:
+                        match["cosine_similarity"] = round(float(similarities[idx]), 4)
+
+        results = []
+        for idx, match in matches.items():
+            entry = entries[idx]
+            if match["hamming_distance"] is None:
+                match["hamming_distance"] = int(np.bitwise_count(hashes[idx] ^ np.uint64(phash)))
+            results.append({
+                "index": idx,
+                "report_id": entry["report_id"],
+                "timestamp": entry["timestamp"],
+                "hamming_distance": match["hamming_distance"],
+                "cosine_similarity": match["cosine_similarity"],
+            })
+
+        results.sort(key=lambda m: (m["hamming_distance"], -(m["cosine_similarity"] or 0.0)))
+        return results[:top_k]
+
+    def reusable_result(self, matches: List[Dict]) -> Optional[Dict]:
+        """
+        Return the closest match whose vision result can be reused, if any
+        """
+
+        if not REUSE_RESULTS:
+            return None
+        for match in matches:
+            close_hash = match["hamming_distance"] <= REUSE_DISTANCE
+            close_embedding = (match["cosine_similarity"] or 0.0) >= REUSE_SIMILARITY
+            vision_result = self._entries[match["index"]].get("vision_result")
+            if (close_hash or close_embedding) and vision_result:
+                return {"match": match, "vision_result": dict(vision_result)}
+        return None
+
+
+def summarize_matches(matches: List[Dict], reused: Optional[Dict] = None) -> Dict:
+    """Build the duplicate check section of the API response"""
+
+    return {
+        "is_near_duplicate": len(matches) > 0,
+        "matches": [
+            {
+                "report_id": m["report_id"],
+                "timestamp": m["timestamp"],
+                "hamming_distance": m["hamming_distance"],
+                "cosine_similarity": m["cosine_similarity"],
+            }
+            for m in matches
+        ],
+        "reused_vision_result": reused is not None,
+        "reused_from": reused["match"]["report_id"] if reused else None,
+        "note": "Possible recycled image from an earlier report" if matches else "No prior copies found",
+    }
@@ -0,0 +1,105 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# ----------------------------
+# Shared embedding mode
+# ----------------------------
+#
+# COASTAL_SHARED_EMBEDDINGS=1 makes every stage work in CLIP space:
+# one CLIP image embedding and one CLIP text embedding per report are
+# reused for label scoring, social similarity, report/event matching and
+# text-to-image consistency, and the sentence-transformer models are not
+# loaded at all.
+#
+# CLIP text-text cosines run much higher than sentence-transformer ones
+# (unrelated sentences still score around 0.5), so text similarities are
+# rescaled with calibrate_similarity() before the stages apply their
+# thresholds (social "verified" > 0.6, partial event match > 0.5) or hand
+# them to fusion. COASTAL_SHARED_SIMILARITY_FLOOR sets the CLIP cosine that
+# maps to 0.
+
+SHARED_EMBEDDINGS = os.environ.get("COASTAL_SHARED_EMBEDDINGS", "0") == "1"
+
+SHARED_SIMILARITY_FLOOR = float(os.environ.get("COASTAL_SHARED_SIMILARITY_FLOOR", "0.5"))
+
+# CLIP checkpoint used by the vision stage (and the shared embedding space)
+CLIP_MODEL_NAME = os.environ.get("COASTAL_CLIP_MODEL", "openai/clip-vit-large-patch14")
+EMBEDDING_SPACE = CLIP_MODEL_NAME
+
+_MAX_CACHED_SETS = 64
+_reference_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def cached_embeddings(name: str, texts, encode_fn) -> np.ndarray:
+    """
+    Embeddings of a fixed list of reference texts, encoded once
+
+    Args:
+        name: Namespace for the cache (one per model / stage)
+        texts: Reference texts (e.g. known posts, event descriptions)
+        encode_fn: Callable mapping a list of texts to normalized embeddings
+
+    Returns:
+        (len(texts), dim) float32 array of L2-normalized embeddings
+    """
+
+    key = (name, tuple(texts))
+    with _lock:
+        embeddings = _reference_cache.get(key)
+        if embeddings is not None:
+            _reference_cache.move_to_end(key)
+            return embeddings
+
+    embeddings = np.asarray(encode_fn(list(texts)), dtype=np.float32)
+
+    with _lock:
+        _reference_cache[key] = embeddings
+        while len(_reference_cache) > _MAX_CACHED_SETS:
+            _reference_cache.popitem(last=False)
+
+    return embeddings
+
+
+def calibrate_similarity(similarities, shared: bool = None):
+    """
+    Text-text cosine similarities on the sentence-transformer scale
+
+    Identity outside shared mode. In shared mode the CLIP cosines are mapped
+    linearly from [SHARED_SIMILARITY_FLOOR, 1] onto [0, 1] (and clipped), so
+    the thresholds tuned for sentence-transformers keep their meaning.
+
+    Args:
+        similarities: Cosine similarity or array of similarities
+        shared: Override for SHARED_EMBEDDINGS (defaults to the current mode)
+    """
+
+    if shared is None:
+        shared = SHARED_EMBEDDINGS
+    if not shared:
+        return similarities
+    scaled = (np.asarray(similarities, dtype=np.float32) - SHARED_SIMILARITY_FLOOR) / (1 - SHARED_SIMILARITY_FLOOR)
+    return np.clip(scaled, 0.0, 1.0)
+
+
+def encode_shared_texts(texts, batch_size: int = 64) -> np.ndarray:
+    """CLIP text embeddings (shared space) for a list of texts, in batches"""
+    from backend.vision import encode_texts
+
+    texts = list(texts)
+    if len(texts) <= batch_size:
+        return encode_texts(texts)
+    return np.concatenate([
+        encode_texts(texts[start:start + batch_size])
+        for start in range(0, len(texts), batch_size)
+    ])
+
+
+def to_list(embedding) -> list:
+    """JSON-friendly embedding for API responses / downstream indexing"""
+    if embedding is None:
+        return None
+    return [round(float(v), 6) for v in np.asarray(embedding).reshape(-1)]
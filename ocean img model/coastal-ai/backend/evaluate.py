@@ -0,0 +1,442 @@
+"""
+Accuracy-vs-latency evaluation of pipeline configurations
+
+Runs a labeled golden set of images, videos and texts through the /report
+pipeline (main.process_report; text-only items through main.triage_texts)
+once per named configuration, each in a fresh process with its own scratch
+data directory, and reports against the reference configuration:
+
+- decision agreement, alert_level confusion and final_score drift
+- event type agreement and accuracy against the labels
+- latency percentiles per media kind, model load time and memory
+
+Usage:
+
+    python -m backend.evaluate init data/golden          # manifest skeleton to label
+    python -m backend.evaluate run --manifest data/golden/manifest.jsonl \\
+        --configs reference,shared_embeddings,clip_base,fast
+    python -m backend.evaluate run --manifest ... --config-file my_configs.json
+
+Manifest (JSON lines, paths relative to the manifest):
+
+    {"id": "storm-01", "file": "media/storm-01.jpg", "text": "Huge waves at the jetty",
+     "latitude": 13.05, "longitude": 80.28,
+     "expected": {"event_type": "abnormal_wave", "alert_level": "high"}}
+
+Items without "file" are text-only; "expected" is optional.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, "data", "evaluations")
+
+# Named configurations: environment overrides applied before the models load
+CONFIGURATIONS = {
+    "reference": {},
+    "shared_embeddings": {"COASTAL_SHARED_EMBEDDINGS": "1"},
+    "clip_base": {"COASTAL_CLIP_MODEL": "openai/clip-vit-base-patch32"},
+    "yolo_small": {"COASTAL_YOLO_MODEL": "yolov8s.pt"},
+    "yolo_nano": {"COASTAL_YOLO_MODEL": "yolov8n.pt"},
+    "video_half_rate": {"COASTAL_VIDEO_SAMPLE_FPS": "0.5"},
+    "fast": {
+        "COASTAL_CLIP_MODEL": "openai/clip-vit-base-patch32",
+        "COASTAL_YOLO_MODEL": "yolov8n.pt",
+        "COASTAL_SHARED_EMBEDDINGS": "1",
+        "COASTAL_VIDEO_SAMPLE_FPS": "0.5",
+    },
+}
+
+# The simulated satellite check draws from `random`; every configuration
+# reseeds it per item, so its draws do not show up as configuration drift
+RANDOM_SEED = 0
+
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv']
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+
+
+# ----------------------------
+# Golden set
+# ----------------------------
+
+def load_manifest(path: str) -> list:
+    """Read the golden set; file paths are resolved relative to the manifest"""
+
+    root = os.path.dirname(os.path.abspath(path))
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if item.get("file"):
+                item["file"] = os.path.join(root, item["file"])
+            item.setdefault("text", "")
+            item.setdefault("expected", {})
+            items.append(item)
+    return items
+
+
+def media_kind(item: dict) -> str:
+    if not item.get("file"):
+        return "text"
+    ext = os.path.splitext(item["file"])[1].lower()
+    return "video" if ext in VIDEO_EXTENSIONS else "image"
+
+
+def init_manifest(directory: str) -> str:
+    """Write a manifest skeleton listing every image/video under `directory`"""
+
+    path = os.path.join(directory, "manifest.jsonl")
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+
+    with open(path, "w", encoding="utf-8") as f:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() not in VIDEO_EXTENSIONS + IMAGE_EXTENSIONS:
+                    continue
+                rel = os.path.relpath(os.path.join(root, name), directory)
+                f.write(json.dumps({
+                    "id": os.path.splitext(rel)[0].replace(os.sep, "/"),
+                    "file": rel.replace(os.sep, "/"),
+                    "text": "",
+                    "expected": {"event_type": None, "alert_level": None}
+                }) + "\n")
+    return path
+
+
+# ----------------------------
+# One configuration (runs in its own process)
+# ----------------------------
+
+def _outcome(kind: str, response: dict) -> dict:
+    """The parts of a response that are compared across configurations"""
+
+    if kind == "text":
+        understanding = response["text_understanding"]
+        return {
+            "event_type": understanding["text_event"],
+            "final_score": understanding["text_confidence"],
+            "alert_level": None,
+            "decision": None,
+            "social_confidence": response["social_verification"].get("confidence"),
+        }
+
+    decision = response["final_decision"]
+    return {
+        "event_type": response["vision_ai"].get("event_type"),
+        "final_score": decision.get("final_score"),
+        "confidence": decision.get("confidence"),
+        "alert_level": decision.get("alert_level"),
+        "decision": decision.get("decision"),
+    }
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss is in KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _warm_up(main):
+    """One synthetic report so lazy initialization is not billed to the first item"""
+    import cv2
+    from backend.loadtest import synthetic_sea_image
+
+    path = os.path.join(main.UPLOAD_DIR, "warmup.jpg")
+    cv2.imwrite(path, synthetic_sea_image(640, 480, 0.5, seed=0))
+    main.process_report(path, "warm up report, calm sea")
+    main.triage_texts(["warm up report, calm sea"])
+
+
+def run_items(manifest_path: str, output_path: str, warmup: bool = True):
+    """Worker body: load the pipeline with the current environment and time every item"""
+
+    from backend.utils import process_memory
+
+    load_start = time.perf_counter()
+    from backend import main
+    load_time = time.perf_counter() - load_start
+    memory_after_load = process_memory()
+
+    if warmup:
+        _warm_up(main)
+
+    items = []
+    for item in load_manifest(manifest_path):
+        kind = media_kind(item)
+        record = {"id": item["id"], "kind": kind, "expected": item["expected"]}
+
+        # Per item (not per run), so warm-up or a failed item cannot shift the sequence
+        random.seed(f"{RANDOM_SEED}:{item['id']}")
+        start = time.perf_counter()
+        try:
+            if kind == "text":
+                response = main.triage_texts([item["text"]])["results"][0]
+            else:
+                response = main.process_report(item["file"], item["text"], item.get("latitude"), item.get("longitude"))
+            record["latency_s"] = time.perf_counter() - start
+            if response.get("error"):
+                record["error"] = response["error"]
+            else:
+                record["outcome"] = _outcome(kind, response)
+        except Exception as e:
+            record["latency_s"] = time.perf_counter() - start
+            record["error"] = str(e)
+
+        items.append(record)
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "model_load_s": round(load_time, 2),
+            "memory_after_load": memory_after_load,
+            "memory_end": process_memory(),
+            "peak_rss_mb": _peak_rss_mb(),
+            "items": items,
+        }, f)
+
+
+def run_configuration(name: str, overrides: dict, manifest_path: str, warmup: bool = True) -> dict:
+    """Run the golden set under one configuration in a fresh process"""
+
+    with tempfile.TemporaryDirectory(prefix=f"coastal-eval-{name}-") as scratch:
+        output_path = os.path.join(scratch, "result.json")
+        env = {
+            **os.environ,
+            **overrides,
+            # Fresh indexes/rollups per run: no reuse across configurations,
+            # nothing written to the service's data directory
+            "COASTAL_DATA_DIR": os.path.join(scratch, "data"),
+        }
+        cmd = [sys.executable, "-m", "backend.evaluate", "_run-items",
+               "--manifest", os.path.abspath(manifest_path), "--output", output_path]
+        if not warmup:
+            cmd.append("--no-warmup")
+
+        completed = subprocess.run(cmd, cwd=BASE_DIR, env=env)
+        if completed.returncode != 0:
+            return {"name": name, "overrides": overrides, "failed": f"exit code {completed.returncode}"}
+
+        with open(output_path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+
+    return {"name": name, "overrides": overrides, **result}
+
+
+# ----------------------------
+# Metrics
+# ----------------------------
+
+def _latency_stats(latencies) -> dict:
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    p50, p95 = np.percentile(values, [50, 95])
+    return {
+        "mean_ms": round(float(values.mean()), 1),
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "max_ms": round(float(values.max()), 1),
+    }
+
+
+def _agreement(pairs) -> float:
+    pairs = [(a, b) for a, b in pairs if a is not None and b is not None]
+    return round(sum(a == b for a, b in pairs) / len(pairs), 4) if pairs else None
+
+
+def summarize_run(run: dict) -> dict:
+    """Latency, memory and label accuracy of one configuration"""
+
+    items = run["items"]
+    ok = [i for i in items if "outcome" in i]
+
+    latency = {"all": _latency_stats([i["latency_s"] for i in ok])}
+    for kind in sorted({i["kind"] for i in ok}):
+        latency[kind] = _latency_stats([i["latency_s"] for i in ok if i["kind"] == kind])
+
+    accuracy = {}
+    for field in ["event_type", "alert_level"]:
+        accuracy[field] = _agreement(
+            (i["outcome"].get(field), i["expected"].get(field)) for i in ok
+        )
+
+    return {
+        "items": len(items),
+        "errors": len(items) - len(ok),
+        "latency": latency,
+        "model_load_s": run["model_load_s"],
+        "rss_after_load_mb": run["memory_after_load"]["rss_mb"],
+        "peak_rss_mb": run["peak_rss_mb"],
+        "label_accuracy": accuracy,
+    }
+
+
+def compare_runs(reference: dict, candidate: dict) -> dict:
+    """Decision agreement, alert_level confusion and score drift of candidate vs reference"""
+
+    ref = {i["id"]: i["outcome"] for i in reference["items"] if "outcome" in i}
+    cand = {i["id"]: i["outcome"] for i in candidate["items"] if "outcome" in i}
+    common = sorted(set(ref) & set(cand))
+
+    confusion = {}
+    for item_id in common:
+        r, c = ref[item_id]["alert_level"], cand[item_id]["alert_level"]
+        if r is not None and c is not None:
+            confusion.setdefault(r, {}).setdefault(c, 0)
+            confusion[r][c] += 1
+
+    drift = np.array([
+        cand[i]["final_score"] - ref[i]["final_score"] for i in common
+        if cand[i]["final_score"] is not None and ref[i]["final_score"] is not None
+    ])
+
+    ref_latency = np.mean([i["latency_s"] for i in reference["items"] if "outcome" in i] or [np.nan])
+    cand_latency = np.mean([i["latency_s"] for i in candidate["items"] if "outcome" in i] or [np.nan])
+
+    return {
+        "compared_items": len(common),
+        "decision_agreement": _agreement((ref[i]["decision"], cand[i]["decision"]) for i in common),
+        "alert_level_agreement": _agreement((ref[i]["alert_level"], cand[i]["alert_level"]) for i in common),
+        "event_type_agreement": _agreement((ref[i]["event_type"], cand[i]["event_type"]) for i in common),
+        "alert_level_confusion": confusion,
+        "score_drift": {
+            "mean": round(float(drift.mean()), 4),
+            "mean_abs": round(float(np.abs(drift).mean()), 4),
+            "p95_abs": round(float(np.percentile(np.abs(drift), 95)), 4),
+            "max_abs": round(float(np.abs(drift).max()), 4),
+        } if len(drift) else {},
+        "speedup": round(float(ref_latency / cand_latency), 2) if cand_latency else None,
+        "changed_decisions": [
+            {"id": i, "reference": ref[i]["decision"], "candidate": cand[i]["decision"]}
+            for i in common if ref[i]["decision"] != cand[i]["decision"]
+        ],
+    }
+
+
+def format_table(results: dict) -> str:
+    reference = results["reference"]
+    lines = [f"{'configuration':<20} {'mean ms':>9} {'p95 ms':>9} {'speedup':>8} {'rss MB':>8} "
+             f"{'decision':>9} {'alert':>7} {'drift':>7} {'acc event':>10} {'acc alert':>10}"]
+    for name, entry in results["configurations"].items():
+        if "failed" in entry:
+            lines.append(f"{name:<20} failed: {entry['failed']}")
+            continue
+        summary, comparison = entry["summary"], entry.get("comparison") or {}
+        suffix = " (ref)" if name == reference else ""
+        lines.append(
+            f"{(name + suffix):<20} {summary['latency']['all'].get('mean_ms', '-'):>9} "
+            f"{summary['latency']['all'].get('p95_ms', '-'):>9} {comparison.get('speedup', '-'):>8} "
+            f"{summary['peak_rss_mb'] or '-':>8} "
+            f"{_fmt(comparison.get('decision_agreement')):>9} {_fmt(comparison.get('alert_level_agreement')):>7} "
+            f"{comparison.get('score_drift', {}).get('mean_abs', '-'):>7} "
+            f"{_fmt(summary['label_accuracy']['event_type']):>10} {_fmt(summary['label_accuracy']['alert_level']):>10}"
+        )
+    return "\n".join(lines)
+
+
+def _fmt(value) -> str:
+    return "-" if value is None else f"{value:.1%}"
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+
+def evaluate(manifest_path: str, names: list, configurations: dict, reference: str = "reference",
+             warmup: bool = True) -> dict:
+    """Run every named configuration and compare each against the reference"""
+
+    if reference not in names:
+        names = [reference] + names
+
+    runs = {}
+    for name in names:
+        print(f"[evaluate] running configuration '{name}' {configurations[name]}", flush=True)
+        runs[name] = run_configuration(name, configurations[name], manifest_path, warmup)
+
+    results = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "manifest": os.path.abspath(manifest_path),
+        "reference": reference,
+        "configurations": {},
+    }
+    for name, run in runs.items():
+        if "failed" in run:
+            results["configurations"][name] = {"overrides": run["overrides"], "failed": run["failed"]}
+            continue
+        entry = {"overrides": run["overrides"], "summary": summarize_run(run), "items": run["items"]}
+        if name != reference and "failed" not in runs[reference]:
+            entry["comparison"] = compare_runs(runs[reference], run)
+        results["configurations"][name] = entry
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coastal AI accuracy-vs-latency evaluation")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    init = sub.add_parser("init", help="Write a manifest skeleton for a directory of media")
+    init.add_argument("directory")
+
+    run = sub.add_parser("run", help="Evaluate configurations on a golden set")
+    run.add_argument("--manifest", required=True)
+    run.add_argument("--configs", default="reference,shared_embeddings,fast",
+                     help=f"Comma-separated names from: {', '.join(CONFIGURATIONS)}")
+    run.add_argument("--config-file", default=None, help="JSON object of extra {name: {ENV: value}} configurations")
+    run.add_argument("--reference", default="reference")
+    run.add_argument("--no-warmup", action="store_true")
+    run.add_argument("--output", default=None)
+
+    worker = sub.add_parser("_run-items")
+    worker.add_argument("--manifest", required=True)
+    worker.add_argument("--output", required=True)
+    worker.add_argument("--no-warmup", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "init":
+        print(f"[evaluate] wrote {init_manifest(args.directory)}; fill in text and expected labels")
+        return
+
+    if args.command == "_run-items":
+        run_items(args.manifest, args.output, warmup=not args.no_warmup)
+        return
+
+    configurations = dict(CONFIGURATIONS)
+    if args.config_file:
+        with open(args.config_file, "r", encoding="utf-8") as f:
+            configurations.update(json.load(f))
+
+    names = [name.strip() for name in args.configs.split(",") if name.strip()]
+    unknown = [name for name in names + [args.reference] if name not in configurations]
+    if unknown:
+        parser.error(f"Unknown configuration(s): {', '.join(unknown)}")
+
+    results = evaluate(args.manifest, names, configurations, args.reference, warmup=not args.no_warmup)
+    print(format_table(results))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = args.output or os.path.join(RESULTS_DIR, f"evaluation-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"[evaluate] results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
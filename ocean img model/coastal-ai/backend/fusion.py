@@ -1,69 +1,461 @@
-def final_decision(vision, satellite, social, text_understanding=None):
+import numpy as np
+
+# ----------------------------
+# Fusion configuration
+# ----------------------------
+
+DEFAULT_WEIGHTS = {
+    "clip": 0.35,
+    "satellite": 0.25,
+    "social": 0.15,
+    "text": 0.15,
+    "mismatch_penalty": 0.15,
+    "strong_match_bonus": 0.10,
+    "uncertainty_factor": 0.9,   # Applied to uncertain reports
+    "no_text_factor": 0.95,      # Applied when there is no text understanding
+    "quality_factor": 0.85,      # Applied to confidence for poor media
+}
+
+DEFAULT_THRESHOLDS = {
+    "high": 0.75,
+    "medium": 0.55,
+    "low": 0.35,
+    "uncertainty": 0.5,
+    "quality": 0.5,
+}
+
+# Weighted evidence signals (weight name -> signal column). A missing (NaN)
+# one is dropped and the weights of the available ones are renormalized.
+WEIGHTED_SIGNALS = {
+    "clip": "clip_score",
+    "satellite": "satellite",
+    "social": "social",
+    "text": "text_confidence",
+}
+
+# Stage results with these statuses did not produce a signal in time
+MISSING_STATUSES = ("timeout", "deferred", "skipped")
+
+# Defaults used when a signal is missing (NaN) and not renormalized
+SIGNAL_DEFAULTS = {
+    "clip_score": 0.0,
+    "satellite": 0.5,
+    "social": 0.5,
+    "text_confidence": 0.5,
+    "consistency_score": 0.5,
+    "uncertainty": 0.0,
+}
+
+SIGNAL_COLUMNS = [
+    "clip_score", "satellite", "social", "text_confidence",
+    "consistency", "consistency_score", "uncertainty", "quality", "has_text"
+]
+
+# Consistency labels are encoded as small integers in columnar form
+CONSISTENCY_LABELS = [
+    "UNKNOWN", "MISMATCH", "STRONG_MATCH", "MATCH", "PARTIAL_MATCH", "UNCERTAIN", "NO_TEXT"
+]
+CONSISTENCY_CODES = {label: code for code, label in enumerate(CONSISTENCY_LABELS)}
+
+# Indexed by level: 0 = minimal ... 3 = high
+ALERT_LEVELS = np.array(["minimal", "low", "medium", "high"])
+DECISIONS = np.array(["REJECT_REPORT", "MONITOR", "VERIFY_WITH_AUTHORITIES", "EMERGENCY_ALERT"])
+ACTIONS = np.array([
+    "Insufficient evidence, likely false alarm",
+    "Continue monitoring, no immediate action",
+    "Requires manual verification by coastal authorities",
+    "Immediate authority notification and public warning",
+])
+
+
+def encode_consistency(values) -> np.ndarray:
+    """Map consistency labels (strings) to integer codes; unknown labels -> 0"""
+
+    values = np.asarray(values)
+    if values.dtype.kind in "iu":
+        return values.astype(np.int8)
+
+    labels, inverse = np.unique(values.astype(str), return_inverse=True)
+    codes = np.array([CONSISTENCY_CODES.get(label, 0) for label in labels], dtype=np.int8)
+    return codes[inverse]
+
+
+def _column(signals: dict, name: str, n: int, fill_missing: bool = True) -> np.ndarray:
+    values = signals.get(name)
+    if values is None:
+        default = SIGNAL_DEFAULTS.get(name, np.nan) if fill_missing else np.nan
+        return np.full(n, default, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if fill_missing and name in SIGNAL_DEFAULTS:
+        values = np.where(np.isnan(values), SIGNAL_DEFAULTS[name], values)
+    return values
+
+
+def is_missing(stage_result) -> bool:
+    """True for a stage placeholder (see backend.deadlines.missing_stage)"""
+    return isinstance(stage_result, dict) and stage_result.get("status") in MISSING_STATUSES
+
+
+def _clip_score(vision: dict) -> float:
+    return vision.get("clip_score", 0) or vision.get("average_clip_score", 0) or vision.get("marine_score", 0)
+
+
+# ----------------------------
+# Columnar (batch) fusion
+# ----------------------------
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """
+    Round to 2 decimals like Python's round() (what scores were always rounded with)
+
+    np.round scales by 100 first and rounds half to even, so values such as
+    0.225 land on the other side (0.22 instead of 0.23) and can cross a threshold.
+    round() decides on the exact value, so the rounding error of value * 100
+    is recovered (Dekker's exact product) and breaks the ties that scaling made.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * 100
+
+    # value * 100 == scaled + error exactly (100 needs no splitting)
+    split = values * 134217729.0
+    high = split - (split - values)
+    error = (high * 100 - scaled) + (values - high) * 100
+
+    whole = np.floor(scaled)
+    fraction = scaled - whole
+    tie = fraction == 0.5
+    up = (fraction > 0.5) | (tie & (error > 0)) | (tie & (error == 0) & (whole % 2 == 1))
+    return (whole + up) / 100
+
+
+def fuse_batch(signals: dict, weights: dict = None, thresholds: dict = None, renormalize: bool = True) -> dict:
+    """
+    Vectorized fusion over many reports at once
+
+    signals: dict of equal-length arrays, see SIGNAL_COLUMNS
+        clip_score, satellite, social, text_confidence, uncertainty (floats, NaN = missing)
+        consistency (labels or codes), quality (NaN = not assessed)
+        has_text (bool, whether text understanding is available)
+    weights / thresholds: overrides for DEFAULT_WEIGHTS / DEFAULT_THRESHOLDS
+    renormalize: drop missing weighted signals and rescale the weights of the
+        available ones (False = substitute SIGNAL_DEFAULTS)
+
+    Returns dict of arrays: final_score, confidence, level, alert_level, decision,
+    action, coverage (share of the applicable signal weight that was available)
+    """
+
+    w = {**DEFAULT_WEIGHTS, **(weights or {})}
+    t = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+
+    n = len(next(iter(signals.values())))
+    uncertainty = _column(signals, "uncertainty", n)
+    quality = _column(signals, "quality", n)
+
+    has_text = signals.get("has_text")
+    has_text = np.ones(n, dtype=bool) if has_text is None else np.asarray(has_text, dtype=bool)
+
+    consistency = signals.get("consistency")
+    consistency = np.zeros(n, dtype=np.int8) if consistency is None else encode_consistency(consistency)
+
+    # Weighted score over the available signals, rescaled to the total weight
+    # that applies (text only counts for reports with text understanding)
+    weighted = np.zeros(n)
+    total_weight = np.zeros(n)
+    available_weight = np.zeros(n)
+    complete = np.ones(n, dtype=bool)
+    for name, column in WEIGHTED_SIGNALS.items():
+        values = _column(signals, column, n, fill_missing=not renormalize)
+        applies = has_text if name == "text" else np.ones(n, dtype=bool)
+        present = applies & ~np.isnan(values)
+        weighted += np.where(present, w[name] * values, 0.0)
+        total_weight += w[name] * applies
+        available_weight += w[name] * present
+        complete &= present | ~applies
+    # Rows with every signal keep the plain weighted sum (bit-identical to the
+    # scalar formula); only rows with missing signals are rescaled
+    renormalized = np.divide(weighted * total_weight, available_weight,
+                             out=np.zeros(n), where=available_weight > 0)
+    base = np.where(complete, weighted, renormalized)
+    coverage = np.divide(available_weight, total_weight, out=np.ones(n), where=total_weight > 0)
+
+    # Text understanding: consistency adjustments, uncertainty
+    text_score = base.copy()
+    text_score -= w["mismatch_penalty"] * (consistency == CONSISTENCY_CODES["MISMATCH"])
+    text_score += w["strong_match_bonus"] * (consistency == CONSISTENCY_CODES["STRONG_MATCH"])
+    text_score = np.where(uncertainty > t["uncertainty"], text_score * w["uncertainty_factor"], text_score)
+
+    score = np.where(has_text, text_score, base * w["no_text_factor"])
+    score = _round2(np.clip(score, 0.0, 1.0))
+
+    level = (
+        (score > t["low"]).astype(np.int8) +
+        (score > t["medium"]) +
+        (score > t["high"])
+    )
+
+    # Poor media quality reduces confidence (not the score itself)
+    low_quality = quality < t["quality"]  # NaN compares False
+    confidence = np.where(low_quality, score * w["quality_factor"], score)
+
+    return {
+        "final_score": score,
+        "confidence": confidence,
+        "level": level,
+        "low_quality": low_quality,
+        "alert_level": ALERT_LEVELS[level],
+        "decision": DECISIONS[level],
+        "action": ACTIONS[level],
+        "coverage": coverage,
+    }
+
+
+# ----------------------------
+# Per-report helpers
+# ----------------------------
+
+def signal_row(vision, satellite, social, text_understanding=None, quality_score=None) -> dict:
+    """
+    Flatten the per-stage dicts of one report into a row of fusion signals
+
+    Stage placeholders (is_missing) become NaN signals.
+    """
+
+    clip_score = np.nan if is_missing(vision) else _clip_score(vision)
+
+    row = {
+        "clip_score": clip_score,
+        "satellite": np.nan if is_missing(satellite) else satellite.get("satellite_confidence", 0.5),
+        "social": np.nan if is_missing(social) else social.get("social_confidence", 0.5),
+        "text_confidence": np.nan,
+        "consistency": "UNKNOWN",
+        "consistency_score": np.nan,
+        "uncertainty": np.nan,
+        "quality": np.nan if quality_score is None else quality_score,
+        "has_text": bool(text_understanding),
+    }
+
+    if text_understanding and not is_missing(text_understanding):
+        row["text_confidence"] = text_understanding.get("text_confidence", 0.5)
+        row["consistency"] = text_understanding.get("consistency") or "UNKNOWN"
+        row["consistency_score"] = text_understanding.get("consistency_score", 0.5)
+        row["uncertainty"] = text_understanding.get("uncertainty", 0.0)
+
+    return row
+
+
+def rows_to_signals(rows) -> dict:
+    """Convert a list of signal rows into columnar arrays"""
+
+    signals = {}
+    for name in SIGNAL_COLUMNS:
+        values = [row[name] for row in rows]
+        if name == "consistency":
+            signals[name] = encode_consistency(values)
+        elif name == "has_text":
+            signals[name] = np.array(values, dtype=bool)
+        else:
+            signals[name] = np.array(values, dtype=np.float64)
+    return signals
+
+
+def signals_from_responses(responses) -> dict:
+    """Columnar signals from stored /report responses (for replaying history)"""
+
+    rows = [
+        signal_row(
+            r.get("vision_ai", {}),
+            r.get("satellite_verification", {}),
+            r.get("social_verification", {}),
+            r.get("text_understanding"),
+            (r.get("quality_assessment") or {}).get("quality_score")
+        )
+        for r in responses
+    ]
+    return rows_to_signals(rows)
+
+
+def final_decision(vision, satellite, social, text_understanding=None, quality_score=None):
     """
     Enhanced fusion with text understanding
-    
+
     vision: dict from vision.py
     satellite: dict from satellite.py
     social: dict from social.py
     text_understanding: dict from report_understanding.py (optional)
+    quality_score: media quality from image_quality.py (optional)
+
+    Single-report wrapper over fuse_batch(). Stages given as placeholders
+    (see backend.deadlines.missing_stage) are left out with the remaining
+    weights renormalized, and listed under "missing_signals".
+    """
+
+    row = signal_row(vision, satellite, social, text_understanding, quality_score)
+    fused = fuse_batch(rows_to_signals([row]))
+
+    score = float(fused["final_score"][0])
+    result = {
+        "final_score": score,
+        "confidence": float(fused["confidence"][0]),
+        "decision": str(fused["decision"][0]),
+        "alert_level": str(fused["alert_level"][0]),
+        "action": str(fused["action"][0])
+    }
+
+    if fused["low_quality"][0]:
+        result["quality_warning"] = "Low media quality reduces confidence"
+
+    missing = [
+        name for name, column in WEIGHTED_SIGNALS.items()
+        if np.isnan(row[column]) and (name != "text" or row["has_text"])
+    ]
+    if missing:
+        result["missing_signals"] = missing
+        result["signal_coverage"] = round(float(fused["coverage"][0]), 2)
+
+    return result
+
+
+# ----------------------------
+# Multi-media reports
+# ----------------------------
+
+# Weight floor for poor-quality items (a blurry photo is weak evidence, not none)
+MIN_ITEM_WEIGHT = 0.2
+
+
+def fuse_media_items(visions: list, quality_scores: list = None) -> dict:
     """
-    
-    # Base weighted score from all signals
-    clip_score = vision.get("clip_score", 0) or vision.get("average_clip_score", 0) or vision.get("marine_score", 0)
-    
-    score = (
-        0.35 * clip_score +
-        0.25 * satellite.get("satellite_confidence", 0.5) +
-        0.15 * social.get("social_confidence", 0.5)
+    Combine the vision results of several photos / clips of one report
+
+    Each item votes for its event type with weight quality x clip score, so
+    sharp, confident items outweigh blurry or ambiguous ones. The combined
+    clip score is the quality-weighted mean over the items that support the
+    winning event; the evidence quality is the best quality among them.
+
+    visions: per-item vision results (items with an "error" are ignored)
+    quality_scores: per-item media quality (None = not assessed)
+
+    Returns a vision result for the whole report (the input of final_decision),
+    plus "agreement", "evidence_quality", "best_item" and "media_items"
+    """
+
+    quality_scores = [None if q is None else float(q) for q in (quality_scores or [None] * len(visions))]
+    weights = [max(MIN_ITEM_WEIGHT, 1.0 if q is None else q) for q in quality_scores]
+    valid = [i for i, vision in enumerate(visions) if "error" not in vision]
+
+    if not valid:
+        return {
+            "error": "No media item could be analyzed",
+            "event_type": "unknown",
+            "clip_score": 0.0,
+            "vision_confidence": 0.0,
+            "media_items": len(visions)
+        }
+
+    votes = {}
+    for i in valid:
+        event_type = visions[i].get("event_type", "unknown")
+        votes[event_type] = votes.get(event_type, 0.0) + weights[i] * _clip_score(visions[i])
+    event_type = max(votes, key=votes.get)
+
+    supporting = [i for i in valid if visions[i].get("event_type", "unknown") == event_type]
+    support_weight = sum(weights[i] for i in supporting)
+    clip_score = sum(weights[i] * _clip_score(visions[i]) for i in supporting) / support_weight
+    vision_confidence = (
+        sum(weights[i] * visions[i].get("vision_confidence", 0.0) for i in valid) /
+        sum(weights[i] for i in valid)
     )
-    
-    # Add text understanding if available
-    if text_understanding:
-        text_score = text_understanding.get("text_confidence", 0.5)
-        consistency_score = text_understanding.get("consistency_score", 0.5)
-        
-        # Weight text confidence
-        score += 0.15 * text_score
-        
-        # Penalize mismatches
-        if text_understanding.get("consistency") == "MISMATCH":
-            score -= 0.15
-        elif text_understanding.get("consistency") == "STRONG_MATCH":
-            score += 0.10
-        
-        # Consider uncertainty
-        uncertainty = text_understanding.get("uncertainty", 0.0)
-        if uncertainty > 0.5:
-            score *= 0.9  # Reduce confidence for uncertain reports
-    else:
-        # No text understanding, slightly reduce overall confidence
-        score *= 0.95
-    
-    score = max(0.0, min(1.0, score))  # Clamp between 0 and 1
-    score = round(score, 2)
-    
-    # Determine alert level and action
-    if score > 0.75:
-        alert_level = "high"
-        decision = "EMERGENCY_ALERT"
-        action = "Immediate authority notification and public warning"
-    elif score > 0.55:
-        alert_level = "medium"
-        decision = "VERIFY_WITH_AUTHORITIES"
-        action = "Requires manual verification by coastal authorities"
-    elif score > 0.35:
-        alert_level = "low"
-        decision = "MONITOR"
-        action = "Continue monitoring, no immediate action"
-    else:
-        alert_level = "minimal"
-        decision = "REJECT_REPORT"
-        action = "Insufficient evidence, likely false alarm"
-    
+    best = max(supporting, key=lambda i: weights[i] * _clip_score(visions[i]))
+
+    detected_objects = []
+    for i in valid:
+        detected_objects.extend(visions[i].get("detected_objects", []))
+
+    total_votes = sum(votes.values())
+    supporting_quality = [quality_scores[i] for i in supporting if quality_scores[i] is not None]
+
     return {
-        "final_score": score,
-        "confidence": score,
-        "decision": decision,
-        "alert_level": alert_level,
-        "action": action
+        "clip_score": round(float(clip_score), 2),
+        "vision_confidence": round(float(vision_confidence), 2),
+        "marine_score": round(float(clip_score), 2),
+        "event_type": event_type,
+        "detected_objects": list(dict.fromkeys(detected_objects)),
+        "wave_label": visions[best].get("wave_label", "normal ocean"),
+        "media_items": len(visions),
+        "agreement": round(float(votes[event_type] / total_votes), 2) if total_votes else 0.0,
+        "evidence_quality": max(supporting_quality) if supporting_quality else None,
+        "best_item": best,
+        "items": [
+            {
+                "event_type": vision.get("event_type", "unknown"),
+                "clip_score": _clip_score(vision),
+                "quality_score": quality_scores[i],
+                "weight": round(weights[i], 2),
+                "supports_event": i in supporting,
+                "error": vision.get("error")
+            }
+            for i, vision in enumerate(visions)
+        ]
     }
+
+
+# ----------------------------
+# Columnar archive (Parquet / Arrow)
+# ----------------------------
+
+def export_signals(path: str, signals: dict, fused: dict = None):
+    """
+    Write per-stage signals (and optionally fused outputs) to a columnar archive
+
+    `.parquet` or `.arrow`/`.feather` (Arrow IPC). Uses pyarrow when
+    installed, otherwise polars.
+    """
+
+    columns = dict(signals)
+    columns["consistency"] = np.asarray(CONSISTENCY_LABELS)[encode_consistency(signals["consistency"])]
+    if fused:
+        for name in ["final_score", "confidence", "alert_level", "decision"]:
+            columns[name] = fused[name]
+
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+
+        table = pa.table({name: np.asarray(values) for name, values in columns.items()})
+        if path.endswith(".parquet"):
+            pq.write_table(table, path)
+        else:
+            feather.write_feather(table, path)
+    except ImportError:
+        import polars as pl
+
+        frame = pl.DataFrame({name: np.asarray(values) for name, values in columns.items()})
+        if path.endswith(".parquet"):
+            frame.write_parquet(path)
+        else:
+            frame.write_ipc(path)
+
+
+def load_signals(path: str) -> dict:
+    """Read signals written by export_signals() back into NumPy columns"""
+
+    try:
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path) if path.endswith(".parquet") else feather.read_table(path)
+        columns = {name: table.column(name).to_numpy() for name in table.column_names}
+    except ImportError:
+        import polars as pl
+
+        frame = pl.read_parquet(path) if path.endswith(".parquet") else pl.read_ipc(path)
+        columns = {name: frame[name].to_numpy() for name in frame.columns}
+
+    return {name: columns[name] for name in SIGNAL_COLUMNS if name in columns}
+
+
+def replay(path: str, weights: dict = None, thresholds: dict = None) -> dict:
+    """Re-score an archived report history with new weights/thresholds"""
+
+    return fuse_batch(load_signals(path), weights, thresholds)
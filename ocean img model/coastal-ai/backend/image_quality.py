@@ -1,32 +1,58 @@
 import cv2
 import numpy as np
-from PIL import Image
 
-def assess_image_quality(image_path: str) -> dict:
+from backend.ingest import MODEL_LONG_SIDE, from_bgr
+
+# Sharpness (Laplacian variance) and noise are per-pixel measures, so their
+# thresholds only hold at one scale. Every image is measured with its long
+# side reduced to this, whether it arrives full size (from a path), draft
+# decoded by backend.ingest (anywhere between 1x and 2x this size) or as a
+# video frame; smaller images are measured as they are.
+QUALITY_LONG_SIDE = MODEL_LONG_SIDE
+
+def _reference_gray(gray: np.ndarray) -> np.ndarray:
+    """Grayscale image at the reference resolution (downscale only)"""
+    height, width = gray.shape[:2]
+    scale = QUALITY_LONG_SIDE / max(height, width)
+    if scale >= 1.0:
+        return gray
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+def assess_image_quality(image_path: str = None, image: dict = None) -> dict:
     """
     Assess image quality to determine reliability of visual analysis
     
     Poor quality (blur, darkness, noise) reduces confidence in detections
     
     Args:
-        image_path: Path to image file
+        image_path: Path to image file (decoded here if `image` is not given)
+        image: Already-decoded image from backend.ingest (preferred, avoids a second decode)
     
     Returns:
         Dictionary with quality metrics and overall score
     """
     
     try:
-        # Load image
-        img = cv2.imread(image_path)
-        if img is None:
-            return {
-                "quality_score": 0.0,
-                "issues": ["Unable to load image"],
-                "reliability": "VERY_LOW"
-            }
+        if image is not None:
+            gray = cv2.cvtColor(image["rgb"], cv2.COLOR_RGB2GRAY)
+            # Resolution is judged on the uploaded image, not the reduced decode
+            width, height = image["original_size"]
+        else:
+            # Load image
+            img = cv2.imread(image_path)
+            if img is None:
+                return {
+                    "quality_score": 0.0,
+                    "issues": ["Unable to load image"],
+                    "reliability": "VERY_LOW"
+                }
+            
+            # Convert to grayscale for analysis
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            height, width = img.shape[:2]
         
-        # Convert to grayscale for analysis
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = _reference_gray(gray)
         
         # 1. Blur Detection (Laplacian variance)
         laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
@@ -53,7 +79,6 @@ def assess_image_quality(image_path: str) -> dict:
         noise_score = max(0.0, 1.0 - (noise_var / 100.0))  # Lower noise = higher score
         
         # 5. Resolution Check
-        height, width = img.shape[:2]
         min_resolution = 320 * 240
         actual_resolution = height * width
         resolution_score = min(1.0, actual_resolution / min_resolution)
@@ -152,21 +177,10 @@ def assess_video_quality(video_path: str, sample_frames: int = 5) -> dict:
             if not ret:
                 continue
             
-            # Save frame temporarily
-            temp_path = f"temp_frame_{idx}.jpg"
-            cv2.imwrite(temp_path, frame)
-            
-            # Assess frame quality
-            frame_quality = assess_image_quality(temp_path)
+            # Assess the decoded frame directly (no temp file round-trip)
+            frame_quality = assess_image_quality(image=from_bgr(frame))
             frame_scores.append(frame_quality["quality_score"])
             all_issues.update(frame_quality.get("issues", []))
-            
-            # Clean up
-            import os
-            try:
-                os.remove(temp_path)
-            except:
-                pass
         
         cap.release()
         
@@ -0,0 +1,429 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from backend.fusion import ACTIONS, ALERT_LEVELS, DECISIONS, DEFAULT_THRESHOLDS
+
+# ----------------------------
+# Online incident clustering
+# ----------------------------
+#
+# Reports about the same event at the same stretch of coast are merged into
+# one incident, and alerts are emitted per incident (when it escalates), not
+# per report. Incidents are registered in a uniform grid of CELL_KM cells;
+# a new report only probes the 3x3 cells around it, so assignment costs O(1)
+# expected regardless of how many incidents are open.
+#
+# State lives in SQLite (the rollups database in the service), and each
+# report is assigned inside one write transaction, so the workers of a
+# multi-process server share incidents and each alert is emitted once.
+
+# Grid cell size
+CELL_KM = 2.0
+# Every member of an incident stays within this distance of its centroid, so
+# incidents cannot chain along the coast one report at a time. Half a cell
+# keeps any two members within one cell of each other, so the 3x3 probe
+# always sees every incident a report could join.
+INCIDENT_RADIUS_KM = CELL_KM / 2
+# An incident closes when it receives no report for this long (seconds)
+INCIDENT_GAP_SECONDS = 3600
+# Open incidents are swept for expiry at most this often (seconds)
+SWEEP_INTERVAL = 60
+
+# Event types that describe the same underlying incident
+EVENT_FAMILIES = {
+    "abnormal_wave": "sea_state",
+    "rough_sea": "sea_state",
+    "marine_garbage": "pollution",
+    "ship": "vessel",
+}
+
+# Each corroborating report removes this share of the remaining doubt
+# (scaled by its own confidence); reports at or below the "low" threshold
+# do not corroborate
+CORROBORATION_WEIGHT = 0.25
+# Alerts are emitted when an incident first reaches this level, then on each escalation
+ALERT_MIN_LEVEL = 2  # medium
+RECENT_ALERTS = 500
+CLOSED_INCIDENTS = 200
+RECENT_REPORT_IDS = 50
+
+LEVEL_NAMES = [str(level) for level in ALERT_LEVELS]
+
+_KM_PER_DEG_LAT = 110.57
+_KM_PER_DEG_LON = 111.32
+
+
+def _project(lat: float, lon: float):
+    """Equirectangular projection to km (accurate enough at incident scale)"""
+    return lon * _KM_PER_DEG_LON * math.cos(math.radians(lat)), lat * _KM_PER_DEG_LAT
+
+
+def _epoch(timestamp: Optional[str]) -> float:
+    if not timestamp:
+        return time.time()
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec="seconds")
+
+
+def _level(score: float) -> int:
+    t = DEFAULT_THRESHOLDS
+    return int(score > t["low"]) + int(score > t["medium"]) + int(score > t["high"])
+
+
+class Incident:
+    """Running state of one incident (all updates are O(1))"""
+
+    __slots__ = ("incident_id", "family", "event_types", "x", "y", "lat", "lon", "cells",
+                 "min_x", "min_y", "max_x", "max_y", "first_seen", "last_seen", "reports",
+                 "report_ids", "max_confidence", "log_doubt", "score", "alerted_level")
+
+    def __init__(self, incident_id: str, family: str):
+        self.incident_id = incident_id
+        self.family = family
+        self.event_types = Counter()
+        self.x = self.y = self.lat = self.lon = 0.0
+        self.cells = set()
+        # Bounding box of the members (bounds their distance from the centroid)
+        self.min_x = self.min_y = math.inf
+        self.max_x = self.max_y = -math.inf
+        self.first_seen = self.last_seen = 0.0
+        self.reports = 0
+        self.report_ids = []
+        self.max_confidence = 0.0
+        self.log_doubt = 0.0  # sum of log(1 - weight * confidence) over corroborating reports
+        self.score = 0.0
+        self.alerted_level = 0
+
+    def fits(self, x: float, y: float, radius_km: float = INCIDENT_RADIUS_KM) -> bool:
+        """Whether every member, and (x, y), stays within radius_km of the centroid once (x, y) joins"""
+        n = self.reports + 1
+        cx, cy = self.x + (x - self.x) / n, self.y + (y - self.y) / n
+        far_x = max(abs(min(self.min_x, x) - cx), abs(max(self.max_x, x) - cx))
+        far_y = max(abs(min(self.min_y, y) - cy), abs(max(self.max_y, y) - cy))
+        return math.hypot(far_x, far_y) <= radius_km
+
+    def add(self, report_id: str, event_type: str, x: float, y: float, lat: float, lon: float,
+            confidence: float, epoch: float):
+        self.reports += 1
+        n = self.reports
+
+        # Running centroid
+        self.x += (x - self.x) / n
+        self.y += (y - self.y) / n
+        self.lat += (lat - self.lat) / n
+        self.lon += (lon - self.lon) / n
+        self.min_x, self.max_x = min(self.min_x, x), max(self.max_x, x)
+        self.min_y, self.max_y = min(self.min_y, y), max(self.max_y, y)
+
+        self.first_seen = epoch if n == 1 else min(self.first_seen, epoch)
+        self.last_seen = max(self.last_seen, epoch)
+        self.event_types[event_type] += 1
+        self.report_ids = (self.report_ids + [report_id])[-RECENT_REPORT_IDS:]
+
+        if confidence > DEFAULT_THRESHOLDS["low"]:
+            self.log_doubt += math.log1p(-CORROBORATION_WEIGHT * confidence)
+        self.max_confidence = max(self.max_confidence, confidence)
+
+        # Strongest report, with the doubt left by it reduced by every other corroborating report
+        strongest = math.log1p(-CORROBORATION_WEIGHT * self.max_confidence) if self.max_confidence > DEFAULT_THRESHOLDS["low"] else 0.0
+        self.score = 1.0 - (1.0 - self.max_confidence) * math.exp(self.log_doubt - strongest)
+
+    # ---------- Storage ----------
+
+    _COLUMNS = ("family", "x", "y", "lat", "lon", "min_x", "min_y", "max_x", "max_y", "first_seen",
+                "last_seen", "reports", "max_confidence", "log_doubt", "score", "alerted_level")
+
+    @classmethod
+    def from_row(cls, row) -> "Incident":
+        seq, *values, event_types, report_ids, cells = row
+        incident = cls(_incident_id(seq), values[0])
+        for name, value in zip(cls._COLUMNS[1:], values[1:]):
+            setattr(incident, name, value)
+        incident.event_types = Counter(json.loads(event_types))
+        incident.report_ids = json.loads(report_ids)
+        incident.cells = {tuple(cell) for cell in json.loads(cells)}
+        return incident
+
+    def to_row(self) -> tuple:
+        return (
+            *(getattr(self, name) for name in self._COLUMNS),
+            json.dumps(self.event_types), json.dumps(self.report_ids), json.dumps(sorted(self.cells)),
+        )
+
+    def summary(self) -> Dict:
+        level = _level(self.score)
+        return {
+            "incident_id": self.incident_id,
+            "event_family": self.family,
+            "event_type": self.event_types.most_common(1)[0][0],
+            "event_types": dict(self.event_types),
+            "centroid": {"lat": round(self.lat, 5), "lon": round(self.lon, 5)},
+            "reports": self.reports,
+            "recent_report_ids": list(self.report_ids),
+            "first_seen": _iso(self.first_seen),
+            "last_seen": _iso(self.last_seen),
+            "incident_confidence": round(self.score, 3),
+            "max_report_confidence": round(self.max_confidence, 3),
+            "alert_level": LEVEL_NAMES[level],
+            "decision": str(DECISIONS[level]),
+            "action": str(ACTIONS[level]),
+        }
+
+
+def _incident_id(seq: int) -> str:
+    return f"INC-{seq:06d}"
+
+
+def _incident_seq(incident_id: str) -> Optional[int]:
+    prefix, _, number = incident_id.partition("-")
+    return int(number) if prefix == "INC" and number.isdigit() else None
+
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS incidents (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        family TEXT NOT NULL,
+        x REAL, y REAL, lat REAL, lon REAL,
+        min_x REAL, min_y REAL, max_x REAL, max_y REAL,
+        first_seen REAL, last_seen REAL NOT NULL,
+        reports INTEGER, max_confidence REAL, log_doubt REAL, score REAL, alerted_level INTEGER,
+        event_types TEXT, report_ids TEXT, cells TEXT,
+        closed INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    # Grid of open incidents: (family, cell) -> incident
+    """
+    CREATE TABLE IF NOT EXISTS incident_cells (
+        family TEXT NOT NULL, cx INTEGER NOT NULL, cy INTEGER NOT NULL, seq INTEGER NOT NULL,
+        PRIMARY KEY (family, cx, cy, seq)
+    ) WITHOUT ROWID
+    """,
+    "CREATE TABLE IF NOT EXISTS incident_alerts (id INTEGER PRIMARY KEY AUTOINCREMENT, alert TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS incident_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS incidents_open ON incidents (closed, last_seen)",
+]
+
+_SELECT = "SELECT seq, " + ", ".join(Incident._COLUMNS) + ", event_types, report_ids, cells FROM incidents"
+
+
+class IncidentEngine:
+    """
+    Grid-bucketed online clustering of reports into incidents
+
+    Args:
+        db_path: SQLite database shared by every worker process
+        cell_km: Grid cell size
+        gap_seconds: Quiet time after which an incident closes
+    """
+
+    def __init__(self, db_path: str, cell_km: float = CELL_KM, gap_seconds: float = INCIDENT_GAP_SECONDS):
+        self.db_path = db_path
+        self.cell_km = cell_km
+        self.radius_km = cell_km / 2
+        self.gap_seconds = gap_seconds
+        self._local = threading.local()
+        self._last_sweep = 0.0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Not kept: a connection must not be carried into forked workers
+        conn = sqlite3.connect(db_path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        conn.close()
+
+    def after_fork(self):
+        """Drop connections inherited from the parent process (never use them)"""
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; transactions are explicit (BEGIN IMMEDIATE)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _cell(self, x: float, y: float):
+        return math.floor(x / self.cell_km), math.floor(y / self.cell_km)
+
+    # ---------- Insert ----------
+
+    def add_report(self, report_id: str, event_type: str, decision: dict, latitude: float = None,
+                   longitude: float = None, timestamp: str = None) -> Optional[Dict]:
+        """
+        Assign a report to an incident (creating one if none is nearby)
+
+        Args:
+            report_id: Report ID
+            event_type: Event type from the vision stage
+            decision: Result of fusion.final_decision()
+            latitude, longitude: Report location
+            timestamp: ISO timestamp of the report (defaults to now)
+
+        Returns:
+            Incident summary plus "alert" (the alert emitted by this report,
+            or None when it was coalesced into an earlier one), or None when
+            the report cannot be clustered (no location or no incident-type event)
+        """
+
+        family = EVENT_FAMILIES.get(event_type)
+        if family is None or latitude is None or longitude is None:
+            return None
+
+        epoch = _epoch(timestamp)
+        x, y = _project(latitude, longitude)
+        cx, cy = self._cell(x, y)
+        confidence = float(decision.get("confidence", 0.0))
+
+        conn = self._connection()
+        # Takes the write lock up front: the lookup and the update are one step
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if epoch - self._last_sweep > SWEEP_INTERVAL:
+                self._sweep(conn, epoch)
+
+            incident = self._nearest(conn, family, x, y, cx, cy, epoch)
+            new_incident = incident is None
+            if new_incident:
+                seq = conn.execute(
+                    "INSERT INTO incidents (family, last_seen) VALUES (?, ?)", (family, epoch)
+                ).lastrowid
+                incident = Incident(_incident_id(seq), family)
+
+            incident.add(report_id, event_type, x, y, latitude, longitude, confidence, epoch)
+            seq = _incident_seq(incident.incident_id)
+            if (cx, cy) not in incident.cells:
+                incident.cells.add((cx, cy))
+                conn.execute("INSERT OR IGNORE INTO incident_cells VALUES (?, ?, ?, ?)", (family, cx, cy, seq))
+            self._count(conn, "reports_clustered")
+
+            summary = incident.summary()
+            alert = None
+            level = _level(incident.score)
+            if level >= ALERT_MIN_LEVEL and level > incident.alerted_level:
+                escalation = incident.alerted_level >= ALERT_MIN_LEVEL
+                incident.alerted_level = level
+                alert = {
+                    "incident_id": incident.incident_id,
+                    "alert_level": summary["alert_level"],
+                    "decision": summary["decision"],
+                    "action": summary["action"],
+                    "incident_confidence": summary["incident_confidence"],
+                    "reports": incident.reports,
+                    "centroid": summary["centroid"],
+                    "event_type": summary["event_type"],
+                    "emitted_at": _iso(epoch),
+                    "trigger_report_id": report_id,
+                    "escalation": escalation,
+                }
+                conn.execute("INSERT INTO incident_alerts (alert) VALUES (?)", (json.dumps(alert),))
+                conn.execute(
+                    "DELETE FROM incident_alerts WHERE id <= (SELECT MAX(id) FROM incident_alerts) - ?",
+                    (RECENT_ALERTS,)
+                )
+                self._count(conn, "alerts_emitted")
+
+            conn.execute(
+                "UPDATE incidents SET " + ", ".join(f"{name} = ?" for name in Incident._COLUMNS)
+                + ", event_types = ?, report_ids = ?, cells = ? WHERE seq = ?",
+                (*incident.to_row(), seq)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        summary["new_incident"] = new_incident
+        summary["alert"] = alert
+        summary["coalesced"] = alert is None and level >= ALERT_MIN_LEVEL
+        return summary
+
+    def _count(self, conn: sqlite3.Connection, name: str):
+        conn.execute(
+            "INSERT INTO incident_counters VALUES (?, 1) ON CONFLICT (name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def _nearest(self, conn: sqlite3.Connection, family: str, x: float, y: float, cx: int, cy: int,
+                 epoch: float) -> Optional[Incident]:
+        """Closest open incident of the same family in the 3x3 neighbourhood that (x, y) can join"""
+        rows = conn.execute(
+            _SELECT + " WHERE closed = 0 AND last_seen >= ? AND seq IN (SELECT seq FROM incident_cells "
+            "WHERE family = ? AND cx BETWEEN ? AND ? AND cy BETWEEN ? AND ?)",
+            (epoch - self.gap_seconds, family, cx - 1, cx + 1, cy - 1, cy + 1)
+        ).fetchall()
+
+        best, best_distance = None, None
+        for row in rows:
+            incident = Incident.from_row(row)
+            if not incident.fits(x, y, self.radius_km):
+                continue
+            distance = math.hypot(incident.x - x, incident.y - y)
+            if best is None or distance < best_distance:
+                best, best_distance = incident, distance
+        return best
+
+    def _sweep(self, conn: sqlite3.Connection, epoch: float):
+        """Close incidents that have been quiet for longer than the gap"""
+        self._last_sweep = epoch
+        cutoff = epoch - self.gap_seconds
+        conn.execute(
+            "DELETE FROM incident_cells WHERE seq IN (SELECT seq FROM incidents WHERE closed = 0 AND last_seen < ?)",
+            (cutoff,)
+        )
+        conn.execute("UPDATE incidents SET closed = 1 WHERE closed = 0 AND last_seen < ?", (cutoff,))
+        conn.execute(
+            "DELETE FROM incidents WHERE closed = 1 AND seq NOT IN "
+            "(SELECT seq FROM incidents WHERE closed = 1 ORDER BY last_seen DESC LIMIT ?)",
+            (CLOSED_INCIDENTS,)
+        )
+
+    # ---------- Query ----------
+
+    def open_incidents(self, min_level: str = None) -> List[Dict]:
+        """Open incidents, most severe and most corroborated first"""
+        min_index = LEVEL_NAMES.index(min_level) if min_level in LEVEL_NAMES else 0
+        rows = self._connection().execute(_SELECT + " WHERE closed = 0").fetchall()
+        incidents = [Incident.from_row(row) for row in rows]
+        incidents = [i.summary() for i in incidents if _level(i.score) >= min_index]
+        return sorted(incidents, key=lambda i: (-i["incident_confidence"], -i["reports"]))
+
+    def get(self, incident_id: str) -> Optional[Dict]:
+        seq = _incident_seq(incident_id)
+        row = self._connection().execute(_SELECT + " WHERE seq = ?", (seq,)).fetchone() if seq else None
+        return Incident.from_row(row).summary() if row else None
+
+    def recent_alerts(self, limit: int = 50) -> List[Dict]:
+        rows = self._connection().execute(
+            "SELECT alert FROM incident_alerts ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [json.loads(alert) for alert, in rows]
+
+    def stats(self) -> Dict:
+        conn = self._connection()
+        counters = dict(conn.execute("SELECT name, value FROM incident_counters").fetchall())
+        return {
+            "open_incidents": conn.execute("SELECT COUNT(*) FROM incidents WHERE closed = 0").fetchone()[0],
+            "grid_cells": conn.execute(
+                "SELECT COUNT(*) FROM (SELECT DISTINCT family, cx, cy FROM incident_cells)"
+            ).fetchone()[0],
+            "reports_clustered": counters.get("reports_clustered", 0),
+            "alerts_emitted": counters.get("alerts_emitted", 0),
+        }
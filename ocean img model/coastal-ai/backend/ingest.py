@@ -0,0 +1,75 @@
+import math
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+# ----------------------------
+# Resolution needed downstream
+# ----------------------------
+
+# YOLO letterboxes the long side to 640, CLIP resizes the short side to 224.
+# Anything decoded beyond that is thrown away by the models.
+MODEL_LONG_SIDE = 640
+MODEL_SHORT_SIDE = 224
+
+
+def load_image(image_path: str, long_side: int = MODEL_LONG_SIDE, short_side: int = MODEL_SHORT_SIDE) -> dict:
+    """
+    Decode an uploaded image once, at the smallest size every model can use
+
+    JPEGs are decoded in draft mode: libjpeg scales by 1/2, 1/4 or 1/8 in
+    the DCT domain, so a 48 MP photo never materializes at full resolution.
+    Other formats are decoded normally.
+
+    Args:
+        image_path: Path to image file
+        long_side: Minimum long side to keep (YOLO input size)
+        short_side: Minimum short side to keep (CLIP input size)
+
+    Returns:
+        Dictionary with:
+            rgb: HxWx3 uint8 RGB array, shared by YOLO, CLIP and quality metrics
+            original_size: (width, height) of the stored image
+            decoded_size: (width, height) actually decoded
+    """
+
+    with Image.open(image_path) as img:
+        original_size = img.size
+        width, height = original_size
+
+        if img.format == "JPEG":
+            scale = max(long_side / max(width, height), short_side / min(width, height))
+            if scale < 1.0:
+                # draft() picks the largest DCT scaling that stays >= the requested size
+                img.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+
+        # Match cv2.imread, which honours EXIF orientation
+        ImageOps.exif_transpose(img, in_place=True)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+
+        rgb = np.asarray(img)
+
+    return {
+        "rgb": rgb,
+        "original_size": original_size,
+        "decoded_size": (rgb.shape[1], rgb.shape[0])
+    }
+
+
+def from_bgr(frame: np.ndarray) -> dict:
+    """Wrap an already-decoded BGR frame (e.g. from cv2.VideoCapture)"""
+
+    height, width = frame.shape[:2]
+    return {
+        # One channel swap; the fast CLIP processor needs a contiguous array
+        "rgb": cv2.cvtColor(frame, cv2.COLOR_BGR2RGB),
+        "original_size": (width, height),
+        "decoded_size": (width, height)
+    }
+
+
+def bgr_view(image: dict) -> np.ndarray:
+    """BGR view of an ingested image for OpenCV / Ultralytics (no copy)"""
+    return image["rgb"][..., ::-1]
@@ -0,0 +1,458 @@
+"""
+End-to-end load test for the Coastal AI service
+
+Starts backend.main:app locally, generates synthetic images, videos and
+report texts, then ramps concurrency step by step and records throughput,
+latency percentiles, error rates and server CPU/memory for each step.
+
+Usage:
+
+    python -m backend.loadtest --concurrency 1,2,4,8 --step-seconds 60 \\
+        --mix image=0.6,video=0.1,text=0.3
+    python -m backend.loadtest --url http://127.0.0.1:8000 --server-pid 1234
+    python -m backend.loadtest --compare data/loadtests/a.json data/loadtests/b.json
+
+The synthetic files are replayed many times, so a server started here has
+near-duplicate reuse switched off (every request runs the full vision
+stage) and keeps its runtime data in a scratch directory, not data/. A
+server given with --url should be started the same way
+(COASTAL_DUPLICATE_REUSE=0, COASTAL_DATA_DIR=<scratch dir>).
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+import psutil
+import requests
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, "data", "loadtests")
+
+# ----------------------------
+# Synthetic workload
+# ----------------------------
+
+REPORT_TEMPLATES = [
+    "Huge waves hitting the {place}, water is coming over the wall",
+    "Rough sea near the {place}, fishing boats returning early",
+    "Lots of plastic garbage floating near the {place}",
+    "Maybe a tsunami? The sea pulled back at the {place}",
+    "Calm water at the {place}, nothing unusual",
+    "Large ship anchored close to the {place}",
+    "Strong currents and {place} flooded, people evacuating",
+]
+PLACES = ["harbour", "north beach", "fishing jetty", "lighthouse", "river mouth", "promenade"]
+
+# (width, height) of generated photos: small upload, HD, 12 MP phone photo
+IMAGE_SIZES = [(640, 480), (1920, 1080), (4000, 3000)]
+
+
+def synthetic_sea_image(width: int, height: int, rough: float, seed: int) -> np.ndarray:
+    """BGR image of a sky/sea scene with wave texture and sensor noise"""
+
+    rng = np.random.default_rng(seed)
+    rows, cols = np.mgrid[0:height, 0:width].astype(np.float32)
+    horizon = int(height * rng.uniform(0.3, 0.5))
+
+    image = np.zeros((height, width, 3), dtype=np.float32)
+    image[:horizon] = [235, 200, 160]  # sky
+    waves = np.sin(cols / (8 + 30 * (1 - rough)) + rows / 5.0) * (20 + 60 * rough)
+    sea = np.stack([140 + waves, 100 + waves * 0.8, 40 + waves * 0.5], axis=-1)
+    image[horizon:] = sea[horizon:]
+    image += rng.normal(0, 6, image.shape)
+
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def generate_media(out_dir: str, n_images: int = 12, n_videos: int = 3, seed: int = 0) -> dict:
+    """
+    Write synthetic images and videos to out_dir
+
+    Returns:
+        {"image": [paths], "video": [paths]}
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    media = {"image": [], "video": []}
+
+    for i in range(n_images):
+        width, height = IMAGE_SIZES[i % len(IMAGE_SIZES)]
+        path = os.path.join(out_dir, f"synthetic_{i}_{width}x{height}.jpg")
+        if not os.path.exists(path):
+            cv2.imwrite(path, synthetic_sea_image(width, height, rng.random(), seed + i))
+        media["image"].append(path)
+
+    for i in range(n_videos):
+        path = os.path.join(out_dir, f"synthetic_{i}.mp4")
+        if not os.path.exists(path):
+            fps, seconds = 15, 4 + 4 * i
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (640, 360))
+            rough = rng.random()
+            for f in range(fps * seconds):
+                frame = synthetic_sea_image(640, 360, min(1.0, rough + f / (fps * seconds) * 0.3), seed + 100 * i)
+                writer.write(np.roll(frame, f * 3, axis=1))
+            writer.release()
+        media["video"].append(path)
+
+    return media
+
+
+def synthetic_text(rng: random.Random) -> str:
+    return rng.choice(REPORT_TEMPLATES).format(place=rng.choice(PLACES))
+
+
+def parse_mix(mix: str) -> dict:
+    """'image=0.6,video=0.1,text=0.3' -> normalized weights"""
+
+    weights = {}
+    for part in mix.split(","):
+        kind, weight = part.split("=")
+        weights[kind.strip()] = float(weight)
+    total = sum(weights.values())
+    return {kind: weight / total for kind, weight in weights.items()}
+
+
+# ----------------------------
+# Requests
+# ----------------------------
+
+def send_request(session: requests.Session, url: str, kind: str, media: dict, rng: random.Random, timeout: float):
+    """Send one request of the given kind; returns (latency_s, ok, error)"""
+
+    start = time.perf_counter()
+    try:
+        if kind == "text":
+            texts = [synthetic_text(rng) for _ in range(rng.randint(1, 32))]
+            response = session.post(f"{url}/triage", json={"texts": texts}, timeout=timeout)
+        else:
+            path = rng.choice(media[kind])
+            with open(path, "rb") as f:
+                response = session.post(
+                    f"{url}/report",
+                    files={"file": (os.path.basename(path), f)},
+                    data={"text": synthetic_text(rng)},
+                    timeout=timeout
+                )
+        latency = time.perf_counter() - start
+
+        if response.status_code != 200:
+            return latency, False, f"HTTP {response.status_code}"
+        body = response.json()
+        if isinstance(body, dict) and body.get("error"):
+            return latency, False, "pipeline error"
+        return latency, True, None
+
+    except requests.RequestException as e:
+        return time.perf_counter() - start, False, type(e).__name__
+
+
+class ResourceSampler:
+    """Samples CPU and RSS of the server process tree in the background"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _processes(self):
+        root = psutil.Process(self.pid)
+        return [root] + root.children(recursive=True)
+
+    def _run(self):
+        procs = {}
+        while not self._stop.is_set():
+            try:
+                cpu, rss = 0.0, 0
+                for proc in self._processes():
+                    # cpu_percent needs a per-process baseline, so keep the objects
+                    proc = procs.setdefault(proc.pid, proc)
+                    cpu += proc.cpu_percent(None)
+                    rss += proc.memory_info().rss
+                self.samples.append((cpu, rss))
+            except psutil.Error:
+                pass
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self.samples = []
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        # First sample has no cpu baseline
+        samples = self.samples[1:] or self.samples
+        if not samples:
+            return {}
+        cpu = np.array([s[0] for s in samples])
+        rss = np.array([s[1] for s in samples]) / (1024 * 1024)
+        return {
+            "cpu_percent_mean": round(float(cpu.mean()), 1),
+            "cpu_percent_max": round(float(cpu.max()), 1),
+            "rss_mb_mean": round(float(rss.mean()), 1),
+            "rss_mb_max": round(float(rss.max()), 1),
+        }
+
+
+def run_step(url: str, concurrency: int, seconds: float, mix: dict, media: dict,
+             sampler: ResourceSampler = None, timeout: float = 300.0, seed: int = 0) -> dict:
+    """Run one concurrency step for `seconds` and summarize it"""
+
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+    records = []
+
+    def worker(worker_id: int):
+        rng = random.Random(seed * 1000 + worker_id)
+        session = requests.Session()
+        kinds, weights = zip(*mix.items())
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            latency, ok, error = send_request(session, url, kind, media, rng, timeout)
+            with lock:
+                records.append((kind, latency, ok, error))
+
+    if sampler:
+        sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    server = sampler.stop() if sampler else {}
+
+    return summarize_step(concurrency, elapsed, records, server)
+
+
+def _latency_stats(latencies) -> dict:
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    p50, p90, p95, p99 = np.percentile(values, [50, 90, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 1),
+        "p90_ms": round(float(p90), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1),
+        "max_ms": round(float(values.max()), 1),
+    }
+
+
+def summarize_step(concurrency: int, elapsed: float, records: list, server: dict) -> dict:
+    ok_latencies = [r[1] for r in records if r[2]]
+    errors = {}
+    for r in records:
+        if not r[2]:
+            errors[r[3]] = errors.get(r[3], 0) + 1
+
+    per_kind = {}
+    for kind in sorted({r[0] for r in records}):
+        kind_records = [r for r in records if r[0] == kind]
+        per_kind[kind] = {
+            "requests": len(kind_records),
+            "errors": sum(1 for r in kind_records if not r[2]),
+            **_latency_stats([r[1] for r in kind_records if r[2]])
+        }
+
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 1),
+        "requests": len(records),
+        "throughput_rps": round(len(ok_latencies) / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round(1 - len(ok_latencies) / len(records), 4) if records else 0.0,
+        "errors": errors,
+        "latency": _latency_stats(ok_latencies),
+        "per_kind": per_kind,
+        "server": server,
+    }
+
+
+def find_saturation(steps: list, min_gain: float = 0.05) -> int:
+    """Lowest concurrency after which throughput stops improving by min_gain"""
+
+    best = None
+    for step in steps:
+        if best and step["throughput_rps"] < best["throughput_rps"] * (1 + min_gain):
+            return best["concurrency"]
+        if not best or step["throughput_rps"] > best["throughput_rps"]:
+            best = step
+    return None
+
+
+# ----------------------------
+# Server management
+# ----------------------------
+
+def start_server(port: int, prefork_workers: int = 0, env: dict = None) -> subprocess.Popen:
+    """Start backend.main:app on localhost (uvicorn, or backend.prefork with N workers)"""
+
+    if prefork_workers:
+        cmd = [sys.executable, "-m", "backend.prefork", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(prefork_workers), "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning"]
+
+    return subprocess.Popen(cmd, cwd=BASE_DIR, env={**os.environ, **(env or {})})
+
+
+def wait_for_server(url: str, proc: subprocess.Popen = None, timeout: float = 600.0):
+    """Wait until the server answers (model loading can take minutes)"""
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}")
+        try:
+            if requests.get(f"{url}/admin/memory", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    raise TimeoutError(f"Server at {url} did not start within {timeout}s")
+
+
+def stop_server(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# ----------------------------
+# Results
+# ----------------------------
+
+def save_results(results: dict, path: str = None) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = path or os.path.join(RESULTS_DIR, f"loadtest-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def compare_results(baseline_path: str, candidate_path: str) -> str:
+    """Side-by-side throughput / p95 per concurrency step"""
+
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {s["concurrency"]: s for s in json.load(f)["steps"]}
+    with open(candidate_path, "r", encoding="utf-8") as f:
+        candidate = {s["concurrency"]: s for s in json.load(f)["steps"]}
+
+    lines = [f"{'conc':>5} {'rps base':>10} {'rps new':>10} {'p95 base':>10} {'p95 new':>10} {'err new':>8}"]
+    for concurrency in sorted(set(baseline) | set(candidate)):
+        b, c = baseline.get(concurrency, {}), candidate.get(concurrency, {})
+        lines.append(
+            f"{concurrency:>5} {b.get('throughput_rps', '-'):>10} {c.get('throughput_rps', '-'):>10} "
+            f"{b.get('latency', {}).get('p95_ms', '-'):>10} {c.get('latency', {}).get('p95_ms', '-'):>10} "
+            f"{c.get('error_rate', '-'):>8}"
+        )
+    return "\n".join(lines)
+
+
+def print_step(step: dict):
+    latency = step["latency"]
+    server = step["server"]
+    print(
+        f"[loadtest] c={step['concurrency']:>3} rps={step['throughput_rps']:>7} "
+        f"p50={latency.get('p50_ms', '-')}ms p95={latency.get('p95_ms', '-')}ms "
+        f"p99={latency.get('p99_ms', '-')}ms err={step['error_rate']:.2%} "
+        f"cpu={server.get('cpu_percent_mean', '-')}% rss={server.get('rss_mb_max', '-')}MB",
+        flush=True
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coastal AI load test")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated concurrency ramp")
+    parser.add_argument("--step-seconds", type=float, default=60)
+    parser.add_argument("--warmup-seconds", type=float, default=10)
+    parser.add_argument("--mix", default="image=0.6,video=0.1,text=0.3")
+    parser.add_argument("--media-dir", default=os.path.join(RESULTS_DIR, "media"))
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--videos", type=int, default=3)
+    parser.add_argument("--url", default=None, help="Use an already running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, default=None, help="PID to sample when --url is given")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--prefork-workers", type=int, default=0, help="Start backend.prefork with N workers")
+    parser.add_argument("--duplicate-reuse", action="store_true",
+                        help="Let the started server reuse vision results of near-duplicates")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print(compare_results(*args.compare))
+        return
+
+    started = datetime.now().isoformat(timespec="seconds")
+    mix = parse_mix(args.mix)
+    media = generate_media(args.media_dir, args.images, args.videos)
+
+    proc, data_dir = None, None
+    if args.url:
+        url, server_pid = args.url.rstrip("/"), args.server_pid
+    else:
+        url = f"http://127.0.0.1:{args.port}"
+        # Uploads, indexes and rollups of the run must not land in the real data directory
+        data_dir = tempfile.mkdtemp(prefix="coastal-loadtest-")
+        env = {"COASTAL_DATA_DIR": data_dir}
+        if not args.duplicate_reuse:
+            env["COASTAL_DUPLICATE_REUSE"] = "0"
+        proc = start_server(args.port, args.prefork_workers, env)
+        server_pid = proc.pid
+
+    try:
+        wait_for_server(url, proc)
+        sampler = ResourceSampler(server_pid) if server_pid else None
+
+        if args.warmup_seconds:
+            run_step(url, 1, args.warmup_seconds, mix, media, timeout=args.timeout)
+
+        steps = []
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            step = run_step(url, concurrency, args.step_seconds, mix, media, sampler, args.timeout, seed=concurrency)
+            print_step(step)
+            steps.append(step)
+    finally:
+        if proc is not None:
+            stop_server(proc)
+        if data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    results = {
+        "label": args.label,
+        "started": started,
+        "url": url,
+        "mix": mix,
+        "prefork_workers": args.prefork_workers,
+        "duplicate_reuse": args.duplicate_reuse if not args.url else None,
+        "cpu_count": os.cpu_count(),
+        "steps": steps,
+        "saturation_concurrency": find_saturation(steps),
+    }
+    print(f"[loadtest] saturation at concurrency {results['saturation_concurrency']}")
+    print(f"[loadtest] results saved to {save_results(results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,34 @@
-from fastapi import FastAPI, UploadFile, Form
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+import itertools
 import shutil
 import os
+import time
+import uuid
+from typing import List, Optional, Union
+from pydantic import BaseModel
+from datetime import datetime, timezone
 
-from backend.vision import analyze_image
-from backend.vision_video import analyze_video
+from backend.resources import scheduler
+from backend.qos import QoSController, DeferredResults, vision_degradations
+from backend.deadlines import StageRunner, deadline_for, missing_stage
+from backend.vision import analyze_image, analyze_images, IMAGE_EMBEDDING_DIM
+from backend.vision_video import analyze_video, aggregate_video, iter_samples, new_samples, segment_result
+from backend.video_mapreduce import should_parallelize
 from backend.satellite import satellite_check
-from backend.social import social_check
-from backend.fusion import final_decision
-from backend.report_understanding import understand_report
+from backend.social import social_check, social_checks
+from backend.fusion import final_decision, fuse_media_items, is_missing
+from backend.report_understanding import understand_report, understand_reports
 from backend.image_quality import assess_image_quality, assess_video_quality
+from backend.ingest import load_image
+from backend.duplicate_index import DuplicateIndex, perceptual_hash, summarize_matches
+from backend.rollups import AlertRollups, region_for
+from backend.incidents import IncidentEngine
+from backend.utils import process_memory, worker_memory_report
+from backend.profiling import PROFILE_MODES, authorized, profile_request, profiler_control
+from backend.embeddings import SHARED_EMBEDDINGS, EMBEDDING_SPACE, encode_shared_texts, to_list
 
 app = FastAPI(title="Coastal AI Alert System")
 
@@ -27,10 +44,38 @@ app.add_middleware(
 # ---------- Paths ----------
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 FRONTEND_DIR = os.path.join(BASE_DIR, "frontend")
-UPLOAD_DIR = os.path.join(BASE_DIR, "data", "images")
+# Runtime data (uploads, indexes, rollups); evaluation runs point this at a scratch directory
+DATA_DIR = os.environ.get("COASTAL_DATA_DIR", os.path.join(BASE_DIR, "data"))
+UPLOAD_DIR = os.path.join(DATA_DIR, "images")
+INDEX_DIR = os.path.join(DATA_DIR, "index")
+ROLLUP_DB = os.path.join(DATA_DIR, "rollups", "rollups.db")
+DEFERRED_DB = os.path.join(DATA_DIR, "reports", "deferred.db")
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# ---------- Near-Duplicate Index (all previously analyzed images) ----------
+duplicate_index = DuplicateIndex(embedding_dim=IMAGE_EMBEDDING_DIM, storage_dir=INDEX_DIR)
+
+# ---------- Regional Alert Rollups (dashboard statistics) ----------
+rollups = AlertRollups(ROLLUP_DB)
+
+# ---------- Incident Clustering (one alert per incident, not per report) ----------
+# Shares the rollups database, so all workers cluster into the same incidents
+incidents = IncidentEngine(ROLLUP_DB)
+
+# ---------- Load-Adaptive Degradation (latency SLOs) ----------
+qos = QoSController(executor_threads=scheduler.executor_threads)
+# Results that arrive after the response (deferred or late stages); kept in
+# SQLite so any worker can serve them
+deferred = DeferredResults(db_path=DEFERRED_DB)
+
+
+def init_worker():
+    """Reset per-process resources in a freshly forked worker (see backend.prefork)"""
+    rollups.after_fork()
+    incidents.after_fork()
+    deferred.after_fork()
+
 # ---------- Serve Static Frontend ----------
 app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
 
@@ -39,83 +84,702 @@ async def serve_frontend():
     with open(os.path.join(FRONTEND_DIR, "index.html"), "r", encoding="utf-8") as f:
         return f.read()
 
+# ---------- Admin: Memory ----------
+@app.get("/admin/memory")
+async def admin_memory():
+    """Memory of this worker, and of all sibling workers under backend.prefork"""
+    parent_pid = os.environ.get("COASTAL_PREFORK_PARENT")
+    return {
+        "worker": process_memory(),
+        "prefork": worker_memory_report(int(parent_pid)) if parent_pid else None
+    }
+
+# ---------- Admin: CPU / Inference Scheduling ----------
+@app.get("/admin/resources")
+async def admin_resources():
+    """Thread budgets, inference slot usage and per-stage wait times"""
+    return scheduler.stats()
+
+# ---------- Admin: Quality of Service ----------
+@app.get("/admin/qos")
+async def admin_qos():
+    """
+    Degradation level, predicted latency inputs and how often each step was applied
+
+    QoS is decided per worker process (each has its own executor and queue),
+    so under backend.prefork this reports the worker that served the request.
+    """
+    return {"worker_pid": os.getpid(), **qos.stats()}
+
+# ---------- Admin: Profiling ----------
+@app.post("/admin/profile")
+async def admin_profile(
+    requests: int = 1,
+    mode: str = "sampling",
+    torch_trace: bool = True,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Profile the next N /report requests"""
+    if not authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Profiling disabled or not authorized")
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {PROFILE_MODES}")
+    profiler_control.arm(requests, mode, torch_trace)
+    return profiler_control.status()
+
+@app.get("/admin/profile")
+async def admin_profile_status(x_admin_token: Optional[str] = Header(None)):
+    if not authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Profiling disabled or not authorized")
+    return profiler_control.status()
+
+# ---------- Dashboard Statistics ----------
+@app.get("/stats")
+async def stats(
+    window: str = "6h",
+    region: Optional[str] = None,
+    event_type: Optional[str] = None,
+    series: bool = False
+):
+    """Alert counts, scores and max severity per coastal sector / event type, from the rollups"""
+    try:
+        return rollups.query(window, region=region, event_type=event_type, series=series)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ---------- Incidents ----------
+@app.get("/incidents")
+async def list_incidents(min_level: Optional[str] = None):
+    """Open incidents, most severe first"""
+    return {"incidents": incidents.open_incidents(min_level), "stats": incidents.stats()}
+
+@app.get("/incidents/alerts")
+async def incident_alerts(limit: int = 50):
+    """Most recent incident alerts (new incidents reaching "medium" and escalations)"""
+    return {"alerts": incidents.recent_alerts(limit)}
+
+@app.get("/incidents/{incident_id}")
+async def get_incident(incident_id: str):
+    incident = incidents.get(incident_id)
+    if incident is None:
+        raise HTTPException(status_code=404, detail="Unknown incident")
+    return incident
+
+# ---------- Deferred Results ----------
+@app.get("/reports/{report_id}/deferred")
+async def get_deferred(report_id: str):
+    """Updated stage results and decision of a report with deferred or late stages"""
+    result = deferred.get(report_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No deferred work for this report")
+    return result
+
 # ---------- API Endpoint ----------
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv']
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+# Photos / clips accepted in one report
+MAX_MEDIA_ITEMS = int(os.environ.get("COASTAL_MAX_MEDIA_ITEMS", "10"))
+
+def is_video_file(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in VIDEO_EXTENSIONS
+
 @app.post("/report")
-async def report(file: UploadFile, text: str = Form(...)):
-    # Determine file type
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv']
-    image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
-    
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # === 1. ASSESS IMAGE/VIDEO QUALITY ===
-    if file_ext in video_extensions:
-        quality_assessment = assess_video_quality(file_path, sample_frames=3)
+async def report(
+    text: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    files: Optional[List[UploadFile]] = File(None),
+    latitude: Optional[float] = Form(None),
+    longitude: Optional[float] = Form(None),
+    x_profile: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """One report with a single photo / clip (file) or several of the same event (files)"""
+    # The deadline covers the whole request: upload, queue wait and decoding included
+    received = time.perf_counter()
+    uploads = ([file] if file else []) + (files or [])
+    if not uploads:
+        raise HTTPException(status_code=400, detail="Attach at least one image or video")
+    if len(uploads) > MAX_MEDIA_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_MEDIA_ITEMS} media items per report")
+
+    report_id = uuid.uuid4().hex
+    timestamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    file_paths = []
+    for index, upload in enumerate(uploads):
+        # Items of one submission often share a name (e.g. "image.jpg")
+        name = upload.filename if len(uploads) == 1 else f"{report_id}_{index}_{os.path.basename(upload.filename)}"
+        file_path = os.path.join(UPLOAD_DIR, name)
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(upload.file, buffer)
+        file_paths.append(file_path)
+    media = file_paths[0] if len(file_paths) == 1 else file_paths
+
+    # Opt-in profiling (X-Profile header or armed through /admin/profile)
+    profiling = profiler_control.take(x_profile, x_admin_token)
+
+    # Queue wait counts toward the latency the degradation controller predicts
+    kind = "video" if any(is_video_file(path) for path in file_paths) else "image"
+    admitted = qos.admit()
+
+    def run_pipeline():
+        with qos.running(admitted, kind) as plan:
+            if profiling:
+                # Profilers follow one thread, so profiled pipelines run their stages inline.
+                # Requests do not queue for the profilers (that would tie up executor threads)
+                mode, torch_trace = profiling
+                with profile_request(report_id, mode, torch_trace, wait=False) as profile:
+                    if profile is not None:
+                        response = process_report(media, text, latitude, longitude, report_id, timestamp, plan)
+                if profile is not None:
+                    response["profile"] = profile
+                    return response
+
+            response = process_report(media, text, latitude, longitude, report_id, timestamp, plan,
+                                      deadline_s=deadline_for(kind), started=received)
+            if profiling:
+                response["profile"] = {"skipped": "another request was being profiled"}
+            return response
+
+    # Pipelines run on the bounded request executor, off the event loop
+    return await scheduler.run(run_pipeline)
+
+
+def process_report(file_path: Union[str, List[str]], text: str, latitude: Optional[float] = None,
+                   longitude: Optional[float] = None, report_id: str = None, timestamp: str = None,
+                   plan: dict = None, deadline_s: float = None, started: float = None) -> dict:
+    """
+    Full analysis pipeline for one uploaded file + report text
+
+    file_path: uploaded file, or a list of files (photos / clips of the same
+        event) analyzed in one batched vision pass and fused into one decision
+    plan: degradation plan from QoSController (None = full pipeline); the
+        steps that took effect are appended to plan["applied"]
+    deadline_s: latency bound for the pipeline (None = run every stage to
+        completion). Stages that overrun their budget are fused as missing
+        signals; when they finish the report is re-fused and the update is
+        served by GET /reports/{report_id}/deferred
+    started: time.perf_counter() when the request arrived; the deadline is
+        counted from it (None = from the call)
+
+    Returns the /report response body.
+    """
+
+    report_id = report_id or uuid.uuid4().hex
+    timestamp = timestamp or datetime.now(timezone.utc).isoformat(timespec="seconds")
+    plan = plan or {"level": 0, "steps": [], "applied": []}
+
+    # Determine file types
+    file_paths = [file_path] if isinstance(file_path, str) else list(file_path)
+    is_videos = [is_video_file(path) for path in file_paths]
+    multi = len(file_paths) > 1
+
+    # === 0. DECODE ONCE (images) ===
+    # The same reduced-size buffer feeds quality metrics, hashing, YOLO and CLIP
+    images = []
+    for path, is_video in zip(file_paths, is_videos):
+        image = None
+        if not is_video:
+            try:
+                image = load_image(path)
+            except Exception:
+                image = None  # Reported by the quality assessment / vision stage
+        images.append(image)
+
+    # Quality, vision and social validation run concurrently; each is waited
+    # for at most its share of the deadline
+    stages = StageRunner(deadline_s, scheduler.stage_executor, started=started)
+
+    # === 1. ASSESS IMAGE/VIDEO QUALITY (per item) ===
+    # === 2. VISION AI ANALYSIS (all items in one batched pass) ===
+    if multi:
+        stages.submit("quality", assess_items_quality, file_paths, is_videos, images)
+        stages.submit("vision", analyze_media_items, file_paths, is_videos, images, report_id, timestamp, plan)
+    else:
+        stages.submit("quality", assess_quality, file_paths[0], is_videos[0], images[0])
+        stages.submit("vision", analyze_media, file_paths[0], is_videos[0], images[0], report_id, timestamp, plan)
+
+    # In shared embedding mode the report text is encoded once (CLIP space)
+    # and reused by every text stage
+    text_embedding = encode_shared_texts([text])[0] if SHARED_EMBEDDINGS else None
+
+    # === 3. SOCIAL/TEXT VALIDATION ===
+    stages.submit("social", social_check, text, text_embedding=text_embedding)
+
+    item_qualities = stages.result("quality")
+    if multi:
+        quality_assessment = combine_quality(item_qualities)
     else:
-        quality_assessment = assess_image_quality(file_path)
-    
-    # === 2. VISION AI ANALYSIS ===
-    # Process based on file type
+        quality_assessment = item_qualities or missing_stage("quality")
+
+    duplicate_check = None
+    embedding = None
     try:
-        if file_ext in video_extensions:
-            vision = analyze_video(file_path)
-        elif file_ext in image_extensions or not file_ext:
-            vision = analyze_image(file_path)
-        else:
-            # Default to image for unknown types
-            vision = analyze_image(file_path)
+        analyzed = stages.result("vision")
     except Exception as e:
         return {
             "error": f"Processing failed: {str(e)}",
+            "report_id": report_id,
             "vision_ai": {"error": str(e), "event_type": "unknown"},
             "quality_assessment": quality_assessment,
             "satellite_verification": {"confidence": 0.0},
             "social_verification": {"confidence": 0.0},
             "final_decision": {"alert_level": "unknown", "confidence": 0.0, "action": "Error occurred"}
         }
-    
+
+    if analyzed is None:
+        # Text understanding still runs (text only); satellite verification
+        # needs the event type and waits for the late vision result
+        vision = missing_stage("vision", event_type="unknown", detected_objects=[])
+    else:
+        items = analyzed if multi else [analyzed]
+        applied = []
+        for (item_vision, _, item_duplicates), is_video in zip(items, is_videos):
+            if not (item_duplicates and item_duplicates.get("reused_vision_result")):
+                applied.extend(vision_degradations(plan, item_vision, is_video))
+        plan["applied"].extend(dict.fromkeys(applied))
+
+        if multi:
+            vision, quality_assessment, embedding, duplicate_check = combine_media_items(analyzed, item_qualities)
+        else:
+            vision, embedding, duplicate_check = analyzed
+
     # Add quality assessment to vision results
     vision["quality_assessment"] = quality_assessment
 
-    # === 3. SATELLITE VERIFICATION (with detected objects context) ===
-    satellite = satellite_check(
-        event_type=vision.get("event_type", "unknown"),
-        detected_objects=vision.get("detected_objects", []),
-        location=None  # Could extract from EXIF in production
-    )
-    
-    # === 4. SOCIAL/TEXT VALIDATION ===
-    social = social_check(text)
-    
+    # === 4. SATELLITE VERIFICATION (with detected objects context) ===
+    location = None
+    if latitude is not None and longitude is not None:
+        location = {"lat": latitude, "lon": longitude, "timestamp": timestamp}
+
+    if analyzed is not None:
+        stages.submit(
+            "satellite", satellite_check,
+            event_type=vision.get("event_type", "unknown"),
+            detected_objects=vision.get("detected_objects", []),
+            location=location
+        )
+
     # === 5. TEXT UNDERSTANDING - compare report with visual evidence ===
-    text_understanding = understand_report(
+    stages.submit(
+        "text_understanding", understand_report,
         report_text=text,
         vision_event=vision.get("event_type", "unknown"),
-        detected_objects=vision.get("detected_objects", [])
+        detected_objects=vision.get("detected_objects", []),
+        text_embedding=text_embedding,
+        image_embedding=embedding
     )
 
-    # === 6. MULTI-MODAL FUSION ===
+    if analyzed is None:
+        satellite = missing_stage("satellite", "skipped", reason="waiting for the vision result")
+    elif plan.get("defer_satellite") and location is not None:
+        # Under overload the response does not wait for the SAR lookup
+        satellite = stages.result("satellite", wait=False) or missing_stage("satellite", "deferred")
+        if is_missing(satellite):
+            plan["applied"].append("defer_satellite")
+    else:
+        satellite = stages.result("satellite") or missing_stage("satellite")
+
+    text_understanding = stages.result("text_understanding") or missing_stage("text_understanding")
+    social = stages.result("social") or missing_stage("social")
+
+    # === 6. MULTI-MODAL FUSION (missing signals are renormalized away) ===
     result = final_decision(
         vision=vision,
         satellite=satellite,
         social=social,
-        text_understanding=text_understanding
+        text_understanding=text_understanding,
+        # Poor image/video quality reduces confidence
+        quality_score=quality_assessment.get("quality_score")
     )
-    
-    # Apply quality penalty if image/video is poor
-    if quality_assessment.get("quality_score", 1.0) < 0.5:
-        result["confidence"] = result["confidence"] * 0.85
-        result["quality_warning"] = "Low media quality reduces confidence"
 
-    return {
+    # === 7-8. ROLLUPS AND INCIDENTS ===
+    # A report with late stages is recorded once, from its final decision,
+    # when they finish (complete_late_stages)
+    if stages.missed:
+        region, incident = region_for(latitude, longitude), None
+    else:
+        region, incident = record_report(
+            report_id, result, vision.get("event_type", "unknown"), latitude, longitude, timestamp
+        )
+
+    response = {
+        "report_id": report_id,
+        "timestamp": timestamp,
+        "region": region,
         "vision_ai": vision,
         "quality_assessment": quality_assessment,
+        "duplicate_check": duplicate_check,
         "text_understanding": text_understanding,
         "satellite_verification": satellite,
         "social_verification": social,
-        "final_decision": result
+        "final_decision": result,
+        "incident": incident,
+        "degradations_applied": plan["applied"]
+    }
+    if "slo_ms" in plan:
+        response["qos"] = {key: plan[key] for key in ["level", "pressure", "predicted_latency_ms", "slo_ms"]}
+    if deadline_s is not None:
+        response["deadline"] = stages.report()
+
+    # === 9. LATE RESULTS (stages that missed the deadline) ===
+    if stages.missed:
+        deferred.expect(report_id)
+        response["late_results"] = f"/reports/{report_id}/deferred"
+        context = {
+            "report_id": report_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "timestamp": timestamp,
+            "multi": multi,
+            "analyzed": analyzed if multi else None,
+            "item_qualities": item_qualities if multi else None,
+            "text": text,
+            "location": location,
+            "text_embedding": text_embedding,
+            "embedding": embedding,
+            "vision": vision,
+            "satellite": satellite,
+            "social": social,
+            "text_understanding": text_understanding,
+            "quality_assessment": quality_assessment,
+        }
+        stages.when_settled(lambda late: deferred.submit(report_id, complete_late_stages, context, late))
+
+    # Embeddings for downstream indexing
+    if SHARED_EMBEDDINGS:
+        response["embeddings"] = {
+            "space": EMBEDDING_SPACE,
+            "image": to_list(embedding),
+            "text": to_list(text_embedding)
+        }
+
+    return response
+
+
+def record_report(report_id: str, decision: dict, event_type: str, latitude: Optional[float],
+                  longitude: Optional[float], timestamp: str):
+    """Count a fused report in the regional rollups and cluster it into an incident"""
+
+    # === 7. REGIONAL ROLLUPS ===
+    region = rollups.record(
+        decision,
+        event_type=event_type,
+        latitude=latitude,
+        longitude=longitude,
+        timestamp=timestamp
+    )
+
+    # === 8. INCIDENT CLUSTERING (alerts are coalesced per incident) ===
+    incident = incidents.add_report(
+        report_id,
+        event_type=event_type,
+        decision=decision,
+        latitude=latitude,
+        longitude=longitude,
+        timestamp=timestamp
+    )
+    return region, incident
+
+
+def assess_quality(file_path: str, is_video: bool, image: dict = None) -> dict:
+    """Quality stage for one image or video"""
+    if is_video:
+        return assess_video_quality(file_path, sample_frames=3)
+    return assess_image_quality(file_path, image=image)
+
+
+def assess_items_quality(file_paths: List[str], is_videos: List[bool], images: List[dict]) -> List[dict]:
+    """Quality stage of a multi-media report (one assessment per item)"""
+    return [assess_quality(path, is_video, image) for path, is_video, image in zip(file_paths, is_videos, images)]
+
+
+def analyze_media(file_path: str, is_video: bool, image: dict = None, report_id: str = None,
+                  timestamp: str = None, plan: dict = None):
+    """
+    Vision stage: video analysis, or image analysis through the near-duplicate index
+
+    Returns:
+        (vision result, CLIP image embedding or None, duplicate check or None)
+    """
+
+    plan = plan or {}
+    vision_options = plan.get("vision_options") or {}
+
+    if is_video:
+        vision = analyze_video(file_path, sample_fps=plan.get("video_sample_fps"),
+                               vision_options=vision_options)
+        return vision, None, None
+
+    # Images (and unknown types, treated as images) go through the
+    # near-duplicate index so recycled photos are flagged and reuse
+    # the earlier vision result when close enough
+    if image is None:
+        image = load_image(file_path)
+    phash = perceptual_hash(image["rgb"])
+    matches = duplicate_index.find_near_duplicates(phash)
+    reused = duplicate_index.reusable_result(matches)
+
+    if reused:
+        vision = reused["vision_result"]
+        embedding = duplicate_index.embedding_of(reused["match"]["index"])
+    else:
+        vision = analyze_image(file_path, return_embedding=True, image=image, **vision_options)
+        embedding = vision.pop("image_embedding")
+        # Embedding lookup catches crops that moved the hash
+        matches = duplicate_index.find_near_duplicates(phash, embedding)
+
+    duplicate_check = summarize_matches(matches, reused)
+    index_image(report_id, phash, embedding, vision, timestamp)
+    return vision, embedding, duplicate_check
+
+
+def index_image(report_id: str, phash: int, embedding, vision: dict, timestamp: str = None):
+    """Add an analyzed image to the near-duplicate index"""
+    # Results of a degraded run are indexed but never reused
+    degraded = vision.get("yolo_skipped") or "yolo_model" in vision
+    duplicate_index.add(report_id, phash, embedding, None if degraded else dict(vision), timestamp)
+
+
+def analyze_media_items(file_paths: List[str], is_videos: List[bool], images: List[dict],
+                        report_id: str = None, timestamp: str = None, plan: dict = None) -> list:
+    """
+    Vision stage of a multi-media report
+
+    All photos that are not reused from the near-duplicate index, and the
+    sampled frames of the clips, go through one batched vision pass. Videos
+    long enough for map-reduce analysis (backend.video_mapreduce) are
+    analyzed on their own.
+
+    Returns:
+        Per item: (vision result, CLIP image embedding or None, duplicate check or None)
+    """
+
+    plan = plan or {}
+    vision_options = plan.get("vision_options") or {}
+    sample_fps = plan.get("video_sample_fps")
+
+    outputs = [None] * len(file_paths)
+    sources = []   # per batched item: (index, phash or video samples)
+    parallel_videos = []
+
+    def other_reports(matches):
+        # Photos of one submission are often near-duplicates of each other
+        return [m for m in matches if m["report_id"] != report_id]
+
+    for i, (path, is_video) in enumerate(zip(file_paths, is_videos)):
+        if is_video:
+            if should_parallelize(path):
+                parallel_videos.append(i)
+            else:
+                sources.append((i, new_samples()))
+            continue
+
+        try:
+            image = images[i] if images[i] is not None else load_image(path)
+            images[i] = image
+            phash = perceptual_hash(image["rgb"])
+        except Exception as e:
+            outputs[i] = ({"error": str(e), "event_type": "unknown"}, None, None)
+            continue
+
+        matches = other_reports(duplicate_index.find_near_duplicates(phash))
+        reused = duplicate_index.reusable_result(matches)
+        if reused:
+            embedding = duplicate_index.embedding_of(reused["match"]["index"])
+            outputs[i] = (reused["vision_result"], embedding, summarize_matches(matches, reused))
+        else:
+            sources.append((i, phash))
+
+    # One pass over every photo and sampled frame, in batches
+    batched = analyze_images(
+        itertools.chain.from_iterable(
+            iter_samples(file_paths[i], source, sample_fps=sample_fps) if is_videos[i] else [images[i]]
+            for i, source in sources
+        ),
+        return_embedding=True,
+        **vision_options
+    )
+
+    offset = 0
+    for i, source in sources:
+        if is_videos[i]:
+            count = len(source["frames"])
+            segment = segment_result(source, batched[offset:offset + count])
+            outputs[i] = (aggregate_video(segment), None, None)
+        else:
+            count = 1
+            vision = batched[offset]
+            embedding = vision.pop("image_embedding")
+            # Embedding lookup catches crops that moved the hash
+            matches = other_reports(duplicate_index.find_near_duplicates(source, embedding))
+            index_image(report_id, source, embedding, vision, timestamp)
+            outputs[i] = (vision, embedding, summarize_matches(matches))
+        offset += count
+
+    for i in parallel_videos:
+        vision = analyze_video(file_paths[i], parallel=True, sample_fps=sample_fps, vision_options=vision_options)
+        outputs[i] = (vision, None, None)
+
+    return outputs
+
+
+def combine_quality(item_qualities: Optional[List[dict]], supporting: List[int] = None) -> dict:
+    """
+    Quality section of a multi-media report
+
+    The report is as reliable as its best item supporting the detected
+    event (all items when the event is not known yet).
+    """
+
+    if item_qualities is None:
+        return missing_stage("quality")
+
+    indices = supporting if supporting else range(len(item_qualities))
+    scores = [item_qualities[i].get("quality_score") for i in indices]
+    scores = [score for score in scores if score is not None]
+    return {
+        "quality_score": max(scores) if scores else None,
+        "basis": "best item supporting the event" if supporting else "best item",
+        "items": item_qualities
+    }
+
+
+def combine_media_items(analyzed: list, item_qualities: Optional[List[dict]]):
+    """
+    Fuse the per-item results of a multi-media report (quality-weighted)
+
+    Returns:
+        (vision result, quality assessment, CLIP image embedding or None, duplicate check)
+    """
+
+    visions = [vision for vision, _, _ in analyzed]
+    quality_scores = [
+        None if item_qualities is None else item_qualities[i].get("quality_score")
+        for i in range(len(analyzed))
+    ]
+    vision = fuse_media_items(visions, quality_scores)
+    vision["item_results"] = visions
+
+    supporting = [i for i, item in enumerate(vision.get("items", [])) if item["supports_event"]]
+    quality_assessment = combine_quality(item_qualities, supporting)
+
+    # Text-to-image consistency uses the strongest supporting photo
+    candidates = [vision["best_item"]] + supporting if "best_item" in vision else []
+    embedding = next((analyzed[i][1] for i in candidates if analyzed[i][1] is not None), None)
+
+    checks = [check for _, _, check in analyzed]
+    duplicate_check = {
+        "is_near_duplicate": any(check and check["is_near_duplicate"] for check in checks),
+        "items": checks
+    }
+    return vision, quality_assessment, embedding, duplicate_check
+
+
+def complete_late_stages(context: dict, late: dict) -> dict:
+    """
+    Re-fuse a report once the stages that missed its deadline have finished
+
+    Args:
+        context: Stage results and inputs the response was fused from
+        late: Result (or exception) of each stage that missed the deadline
+
+    Returns:
+        Updated stage results and final decision, plus the region and
+        incident the report was recorded under
+    """
+
+    results = dict(context)
+    failed = {}
+    for stage, outcome in late.items():
+        if isinstance(outcome, Exception):
+            failed[stage] = str(outcome)
+        elif stage == "vision" and results["multi"]:
+            results["analyzed"] = outcome
+        elif stage == "vision":
+            results["vision"], results["embedding"], _ = outcome
+        elif stage == "quality" and results["multi"]:
+            results["item_qualities"] = outcome
+            results["quality_assessment"] = combine_quality(outcome)
+        elif stage == "quality":
+            results["quality_assessment"] = outcome
+        else:
+            results[stage] = outcome
+
+    if results["multi"] and results["analyzed"] is not None:
+        results["vision"], results["quality_assessment"], results["embedding"], _ = combine_media_items(
+            results["analyzed"], results["item_qualities"]
+        )
+
+    vision = results["vision"]
+    vision["quality_assessment"] = results["quality_assessment"]
+    if "vision" in late and not is_missing(vision):
+        # Stages that ran without the vision result are redone with it
+        results["satellite"] = satellite_check(
+            event_type=vision.get("event_type", "unknown"),
+            detected_objects=vision.get("detected_objects", []),
+            location=results["location"]
+        )
+        results["text_understanding"] = understand_report(
+            report_text=results["text"],
+            vision_event=vision.get("event_type", "unknown"),
+            detected_objects=vision.get("detected_objects", []),
+            text_embedding=results["text_embedding"],
+            image_embedding=results["embedding"]
+        )
+
+    decision = final_decision(
+        vision=vision,
+        satellite=results["satellite"],
+        social=results["social"],
+        text_understanding=results["text_understanding"],
+        quality_score=results["quality_assessment"].get("quality_score")
+    )
+
+    # The response skipped these, so the report is counted once, as finally fused
+    region, incident = record_report(
+        results["report_id"], decision, vision.get("event_type", "unknown"),
+        results["latitude"], results["longitude"], results["timestamp"]
+    )
+
+    return {
+        "late_stages": sorted(late),
+        "failed_stages": failed,
+        "vision_ai": vision,
+        "quality_assessment": results["quality_assessment"],
+        "satellite_verification": results["satellite"],
+        "social_verification": results["social"],
+        "text_understanding": results["text_understanding"],
+        "final_decision": decision,
+        "region": region,
+        "incident": incident
+    }
+
+
+# ---------- Bulk Text Triage (SMS / social texts without media) ----------
+class TriageRequest(BaseModel):
+    texts: List[str]
+
+
+@app.post("/triage")
+async def triage(request: TriageRequest):
+    texts = request.texts
+    if not texts:
+        return {"results": []}
+
+    return await scheduler.run(triage_texts, texts)
+
+
+def triage_texts(texts: List[str]) -> dict:
+    # In shared embedding mode both stages reuse one batch of CLIP embeddings
+    text_embeddings = encode_shared_texts(texts, batch_size=256) if SHARED_EMBEDDINGS else None
+
+    text_understanding = understand_reports(texts, text_embeddings=text_embeddings)
+    social = social_checks(texts, text_embeddings=text_embeddings)
+
+    return {
+        "results": [
+            {"text_understanding": understanding, "social_verification": social_result}
+            for understanding, social_result in zip(text_understanding, social)
+        ]
     }
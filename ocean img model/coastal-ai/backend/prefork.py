@@ -0,0 +1,158 @@
+"""
+Pre-forking multi-worker server with copy-on-write shared models
+
+The parent process imports backend.main once, which loads CLIP, YOLO and
+the sentence-transformers, then forks the workers. Model weights live in
+tensor storage that the workers only read, so the pages stay shared
+copy-on-write instead of every worker holding its own copy.
+
+Usage (Linux/macOS, CPU inference):
+
+    python -m backend.prefork --workers 4 --port 8000
+
+It listens on 127.0.0.1 by default: the /admin/memory, /admin/resources
+and /admin/qos endpoints are not authenticated, so expose the server
+(--host 0.0.0.0) only behind a proxy that keeps /admin/ private.
+
+Check sharing with GET /admin/memory (per-worker rss/uss/pss).
+
+State shared between workers lives on disk: the duplicate index (each
+worker picks up the others' appends), the alert rollups, incidents and
+deferred/late results (SQLite). Per-worker by design: /admin/qos and
+/admin/resources (each worker schedules its own requests) and
+/admin/profile (arms the worker that receives the call).
+"""
+
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from backend.utils import available_cores, worker_memory_report
+
+
+def _run_worker(app, sock, args):
+    """Worker body: serve on the inherited listening socket"""
+
+    # Re-apply this worker's thread budgets (its share of the cores)
+    from backend.resources import scheduler
+    scheduler.apply_thread_budgets()
+
+    # Connections / executors must be this process's own, not the parent's
+    from backend.main import init_worker
+    init_worker()
+
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=5)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    os._exit(0)
+
+
+def _fork_worker(app, sock, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        # Default signal handling in the child; uvicorn installs its own
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            _run_worker(app, sock, args)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coastal AI pre-fork server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Cores per worker for the resource scheduler (default: cores / workers)")
+    parser.add_argument("--memory-report-interval", type=float, default=0,
+                        help="Seconds between per-worker memory log lines (0 = off)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        sys.exit("Pre-fork serving needs os.fork (Linux/macOS); use uvicorn --workers on this platform")
+
+    if args.threads_per_worker is None:
+        args.threads_per_worker = max(1, available_cores() // args.workers)
+
+    # Workers report sibling memory through this
+    os.environ["COASTAL_PREFORK_PARENT"] = str(os.getpid())
+    # Each worker's resource scheduler partitions only its share of the cores
+    os.environ.setdefault("COASTAL_CPU_CORES", str(args.threads_per_worker))
+
+    # 1. Load every model once, in the parent. The parent must not run
+    #    inference before forking: torch's OpenMP / intra-op thread pools
+    #    start on the first forward pass, and a child forked after that
+    #    inherits their locks without the threads (see backend.video_mapreduce)
+    from backend.main import app
+
+    import torch
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        sys.exit("CUDA cannot be used across fork; pre-fork sharing is for CPU inference")
+
+    # 2. Move everything allocated so far out of the GC's reach, so collections
+    #    in the workers do not write to (and un-share) the parent's pages
+    gc.collect()
+    gc.freeze()
+
+    # 3. Bind once, share the listening socket with all workers
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    workers = {_fork_worker(app, sock, args) for _ in range(args.workers)}
+    print(f"[prefork] parent {os.getpid()} serving on {args.host}:{args.port} "
+          f"with {args.workers} workers, {args.threads_per_worker} threads each", flush=True)
+
+    shutting_down = False
+
+    def _shutdown(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    last_report = time.monotonic()
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+
+        if pid:
+            workers.discard(pid)
+            if not shutting_down:
+                # Replace crashed workers (the new one shares the same parent pages)
+                print(f"[prefork] worker {pid} exited ({status}), restarting", flush=True)
+                workers.add(_fork_worker(app, sock, args))
+            continue
+
+        if args.memory_report_interval and time.monotonic() - last_report >= args.memory_report_interval:
+            last_report = time.monotonic()
+            print("[prefork] memory " + json.dumps(worker_memory_report(os.getpid())), flush=True)
+
+        time.sleep(0.2)
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import cProfile
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+# ----------------------------
+# Opt-in request profiling
+# ----------------------------
+#
+# Disabled unless COASTAL_PROFILING=1, which also requires COASTAL_ADMIN_TOKEN:
+# the X-Profile header and the /admin/profile endpoints need a matching
+# X-Admin-Token header.
+#
+# The torch profiler (and cProfile) are process-wide, so profiled requests
+# run one at a time; a request that arrives while another is being profiled
+# runs unprofiled (see profile_request(wait=False)).
+#
+# Output per profiled request, under <COASTAL_DATA_DIR>/profiles/<report_id>/:
+#   pipeline.folded     collapsed stacks (flamegraph.pl, speedscope, inferno)
+#   pipeline.prof       cProfile stats (mode=cprofile; snakeviz, flameprof)
+#   torch_trace.json    torch profiler Chrome trace (chrome://tracing, Perfetto)
+#   torch_stacks.txt    torch op stacks by self CPU time, flamegraph-compatible
+
+PROFILING_ENABLED = os.environ.get("COASTAL_PROFILING", "0") == "1"
+ADMIN_TOKEN = os.environ.get("COASTAL_ADMIN_TOKEN")
+DATA_DIR = os.environ.get("COASTAL_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data"))
+PROFILE_DIR = os.environ.get("COASTAL_PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+
+PROFILE_MODES = ["sampling", "cprofile"]
+
+if PROFILING_ENABLED and not ADMIN_TOKEN:
+    raise RuntimeError("COASTAL_PROFILING=1 requires COASTAL_ADMIN_TOKEN to be set")
+
+# Held for the whole of a profiled request
+_profile_lock = threading.Lock()
+
+
+def authorized(token: Optional[str]) -> bool:
+    return PROFILING_ENABLED and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+class SamplingProfiler:
+    """
+    Low-overhead stack sampler for one thread
+
+    A background thread reads the target thread's current frame every
+    `interval` seconds and counts collapsed stacks, so the profiled code
+    runs unmodified (unlike cProfile, which instruments every call).
+    """
+
+    def __init__(self, thread_id: int = None, interval: float = 0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        if stack:
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilerControl:
+    """Arms profiling for the next N requests (set through the admin endpoint)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.remaining = 0
+        self.mode = "sampling"
+        self.torch_trace = True
+        self.recent = []
+
+    def arm(self, requests: int, mode: str = "sampling", torch_trace: bool = True):
+        with self._lock:
+            self.remaining = max(0, requests)
+            self.mode = mode
+            self.torch_trace = torch_trace
+
+    def take(self, header_value: Optional[str], token: Optional[str]):
+        """
+        Decide whether this request is profiled
+
+        Returns:
+            (mode, torch_trace) or None
+        """
+
+        if not PROFILING_ENABLED:
+            return None
+
+        if header_value and authorized(token):
+            mode = header_value if header_value in PROFILE_MODES else "sampling"
+            return mode, True
+
+        with self._lock:
+            if self.remaining > 0:
+                self.remaining -= 1
+                return self.mode, self.torch_trace
+        return None
+
+    def record(self, profile: dict):
+        with self._lock:
+            self.recent = ([profile] + self.recent)[:20]
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": PROFILING_ENABLED,
+                "armed_requests": self.remaining,
+                "mode": self.mode,
+                "torch_trace": self.torch_trace,
+                "recent": list(self.recent),
+            }
+
+
+profiler_control = ProfilerControl()
+
+
+def _torch_profiler():
+    import torch
+    from torch.profiler import ProfilerActivity, profile
+
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    return profile(activities=activities, with_stack=True, record_shapes=False)
+
+
+@contextmanager
+def profile_request(profile_id: str, mode: str = "sampling", torch_trace: bool = True, wait: bool = True):
+    """
+    Profile the code inside the block (Python pipeline + torch forward passes)
+
+    Only one request is profiled at a time (see _profile_lock).
+
+    Args:
+        profile_id: Name of the output directory (e.g. the report ID)
+        mode: "sampling" (low overhead) or "cprofile" (exact call counts)
+        torch_trace: Also capture a torch profiler trace
+        wait: Wait while another request is being profiled; False = yield
+            None right away instead (the block then runs unprofiled)
+
+    Yields:
+        Dictionary filled with output paths and timings when the block exits,
+        or None when not waiting and another request is being profiled
+    """
+
+    if not _profile_lock.acquire(blocking=wait):
+        yield None
+        return
+
+    try:
+        out_dir = os.path.join(PROFILE_DIR, profile_id)
+        os.makedirs(out_dir, exist_ok=True)
+        info = {"profile_id": profile_id, "mode": mode, "directory": out_dir, "files": []}
+
+        sampler = SamplingProfiler() if mode == "sampling" else None
+        python_profiler = cProfile.Profile() if mode == "cprofile" else None
+        torch_profiler = _torch_profiler() if torch_trace else nullcontext()
+
+        start = time.perf_counter()
+        with torch_profiler as prof:
+            if sampler:
+                sampler.start()
+            if python_profiler:
+                python_profiler.enable()
+            try:
+                yield info
+            finally:
+                if python_profiler:
+                    python_profiler.disable()
+                if sampler:
+                    sampler.stop()
+        info["wall_time_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        if sampler:
+            path = os.path.join(out_dir, "pipeline.folded")
+            sampler.write_folded(path)
+            info["samples"] = sampler.samples
+            info["files"].append(path)
+
+        if python_profiler:
+            path = os.path.join(out_dir, "pipeline.prof")
+            python_profiler.dump_stats(path)
+            info["files"].append(path)
+
+        if torch_trace:
+            trace_path = os.path.join(out_dir, "torch_trace.json")
+            stacks_path = os.path.join(out_dir, "torch_stacks.txt")
+            prof.export_chrome_trace(trace_path)
+            prof.export_stacks(stacks_path, "self_cpu_time_total")
+            info["files"] += [trace_path, stacks_path]
+
+        profiler_control.record({k: info[k] for k in ["profile_id", "mode", "wall_time_ms", "files"]})
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,309 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import numpy as np
+
+# ----------------------------
+# Load-adaptive quality of service
+# ----------------------------
+#
+# The controller watches queue wait and service times of /report requests
+# and predicts the latency of the next one. When that prediction threatens
+# the latency SLO it sheds cost step by step (each level keeps the earlier
+# ones):
+#
+#   1. reduce_video_frames          sample videos at a lower frame rate
+#   2. skip_yolo_when_clip_confident run CLIP first, skip YOLO when it is sure
+#   3. smaller_models               YOLO falls back to a smaller checkpoint
+#   4. defer_satellite              the response does not wait for satellite verification
+#
+# Environment overrides:
+#   COASTAL_QOS=0                   disable (always full pipeline)
+#   COASTAL_SLO_IMAGE_MS            latency SLO for image reports (default 5000)
+#   COASTAL_SLO_VIDEO_MS            latency SLO for video reports (default 60000)
+
+QOS_ENABLED = os.environ.get("COASTAL_QOS", "1") == "1"
+
+SLO_MS = {
+    "image": float(os.environ.get("COASTAL_SLO_IMAGE_MS", "5000")),
+    "video": float(os.environ.get("COASTAL_SLO_VIDEO_MS", "60000")),
+}
+
+DEGRADATION_STEPS = [
+    "reduce_video_frames",
+    "skip_yolo_when_clip_confident",
+    "smaller_models",
+    "defer_satellite",
+]
+
+# Predicted latency / SLO at which each step switches on
+LEVEL_PRESSURE = [0.6, 0.75, 0.9, 1.0]
+# Levels drop by at most one step per cooldown (avoids flapping)
+COOLDOWN_SECONDS = 5.0
+
+# Degraded settings
+REDUCED_VIDEO_SAMPLE_FPS = 0.5
+MINIMAL_VIDEO_SAMPLE_FPS = 0.25   # with smaller_models
+CLIP_CONFIDENT_SCORE = 0.6
+
+# Timings considered when predicting latency
+WINDOW_SECONDS = 60.0
+WINDOW_SIZE = 200
+
+
+class QoSController:
+    """Tracks queueing/service times and decides the degradation level per request"""
+
+    def __init__(self, executor_threads: int = 1, enabled: bool = QOS_ENABLED):
+        self.executor_threads = max(1, executor_threads)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._waits = deque(maxlen=WINDOW_SIZE)       # (time, wait_s)
+        self._service = {"image": None, "video": None}  # EWMA seconds per kind
+        self._level = 0
+        self._level_changed = 0.0
+        self._applied = {step: 0 for step in DEGRADATION_STEPS}
+        self.requests = 0
+
+    # ---------- Request lifecycle ----------
+
+    def admit(self) -> float:
+        """Called when a request arrives (before it waits for the executor)"""
+        with self._lock:
+            self._queued += 1
+        return time.perf_counter()
+
+    @contextmanager
+    def running(self, admitted_at: float, kind: str = "image"):
+        """
+        Wrap the pipeline run of one admitted request
+
+        Yields:
+            Degradation plan for this request (see plan())
+        """
+
+        started = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._waits.append((time.monotonic(), started - admitted_at))
+            self.requests += 1
+
+        plan = self.plan(kind, wait_s=started - admitted_at)
+        try:
+            yield plan
+        finally:
+            service = time.perf_counter() - started
+            with self._lock:
+                self._running -= 1
+                previous = self._service.get(kind)
+                self._service[kind] = service if previous is None else 0.8 * previous + 0.2 * service
+                for step in plan.get("applied", []):
+                    self._applied[step] = self._applied.get(step, 0) + 1
+
+    # ---------- Decisions ----------
+
+    def _recent_wait_p90(self) -> float:
+        cutoff = time.monotonic() - WINDOW_SECONDS
+        waits = [w for t, w in self._waits if t >= cutoff]
+        return float(np.percentile(waits, 90)) if waits else 0.0
+
+    def predicted_latency(self, kind: str, wait_s: float = 0.0) -> float:
+        """Expected seconds until a `kind` request that waited `wait_s` completes"""
+        with self._lock:
+            service = self._service.get(kind) or 0.0
+            backlog = self._queued / self.executor_threads * (self._service.get("image") or service)
+            return max(wait_s, self._recent_wait_p90(), backlog) + service
+
+    def plan(self, kind: str = "image", wait_s: float = 0.0) -> Dict:
+        """
+        Degradation plan for a request
+
+        Returns:
+            Dictionary with level, pressure, active steps and the settings
+            the pipeline stages read (video_sample_fps, vision_options, defer_satellite)
+        """
+
+        if not self.enabled:
+            return {"level": 0, "pressure": 0.0, "steps": [], "applied": []}
+
+        slo = SLO_MS.get(kind, SLO_MS["image"]) / 1000
+        predicted = self.predicted_latency(kind, wait_s)
+        pressure = predicted / slo
+        target = sum(pressure >= threshold for threshold in LEVEL_PRESSURE)
+
+        with self._lock:
+            now = time.monotonic()
+            if target > self._level:
+                self._level, self._level_changed = target, now
+            elif target < self._level and now - self._level_changed >= COOLDOWN_SECONDS:
+                self._level, self._level_changed = self._level - 1, now
+            level = self._level
+
+        steps = DEGRADATION_STEPS[:level]
+        return {
+            "level": level,
+            "pressure": round(pressure, 2),
+            "predicted_latency_ms": round(predicted * 1000),
+            "slo_ms": round(slo * 1000),
+            "steps": steps,
+            "applied": [],
+            "video_sample_fps": (
+                MINIMAL_VIDEO_SAMPLE_FPS if "smaller_models" in steps
+                else REDUCED_VIDEO_SAMPLE_FPS if "reduce_video_frames" in steps
+                else None
+            ),
+            "vision_options": {
+                "skip_yolo_above": CLIP_CONFIDENT_SCORE if "skip_yolo_when_clip_confident" in steps else None,
+                "small_yolo": "smaller_models" in steps,
+            },
+            "defer_satellite": "defer_satellite" in steps,
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "level": self._level,
+                "active_steps": DEGRADATION_STEPS[:self._level],
+                "queued": self._queued,
+                "running": self._running,
+                "recent_wait_p90_ms": round(self._recent_wait_p90() * 1000),
+                "service_ewma_ms": {k: round(v * 1000) if v is not None else None for k, v in self._service.items()},
+                "slo_ms": SLO_MS,
+                "requests": self.requests,
+                "degradations_applied": dict(self._applied),
+            }
+
+
+# ----------------------------
+# Deferred work (runs after the response)
+# ----------------------------
+
+def _json_value(value):
+    # numpy scalars / arrays left in stage results
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class DeferredResults:
+    """
+    Background single-thread executor plus a bounded store of finished results
+
+    With `db_path` the store is a SQLite table, so under backend.prefork the
+    worker that finishes a report's deferred work and the worker that serves
+    GET /reports/{id}/deferred do not have to be the same process.
+    """
+
+    def __init__(self, max_results: int = 1000, db_path: str = None):
+        self.max_results = max_results
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="coastal-deferred")
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            # Connections are opened per thread on first use; this one is closed
+            # again so none is carried into forked workers
+            conn = sqlite3.connect(db_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS deferred_results ("
+                "report_id TEXT PRIMARY KEY, result TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.commit()
+            conn.close()
+
+    def after_fork(self):
+        """Fresh executor and connections in a forked worker"""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="coastal-deferred")
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _store(self, report_id: str, result: Dict):
+        if not self.db_path:
+            with self._lock:
+                self._results[report_id] = result
+                self._trim()
+            return
+
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO deferred_results VALUES (?, ?, ?)",
+                (report_id, json.dumps(result, default=_json_value), time.time())
+            )
+            conn.execute(
+                "DELETE FROM deferred_results WHERE report_id IN (SELECT report_id FROM deferred_results "
+                "ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                (self.max_results,)
+            )
+
+    def expect(self, report_id: str):
+        """Mark a result as pending before its work is submitted"""
+        self._store(report_id, {"status": "pending"})
+
+    def submit(self, report_id: str, fn, *args):
+        self.expect(report_id)
+        self._executor.submit(self._run, report_id, fn, *args)
+
+    def _run(self, report_id: str, fn, *args):
+        try:
+            result = {"status": "done", **fn(*args)}
+        except Exception as e:
+            result = {"status": "failed", "error": str(e)}
+        self._store(report_id, result)
+
+    def _trim(self):
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    def get(self, report_id: str) -> Optional[Dict]:
+        if not self.db_path:
+            with self._lock:
+                return self._results.get(report_id)
+
+        row = self._connection().execute(
+            "SELECT result FROM deferred_results WHERE report_id = ?", (report_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def vision_degradations(plan: Dict, vision: Dict, is_video: bool) -> list:
+    """Which of the plan's vision-stage degradations actually took effect"""
+
+    applied = []
+    if is_video and plan.get("video_sample_fps"):
+        applied.append("reduce_video_frames")
+
+    if is_video:
+        skipped = vision.get("yolo_skipped_frames", 0)
+        ran_yolo = vision.get("frames_analyzed", 0) > skipped
+    else:
+        skipped = vision.get("yolo_skipped", False)
+        ran_yolo = not skipped
+
+    if skipped:
+        applied.append("skip_yolo_when_clip_confident")
+    if (plan.get("vision_options") or {}).get("small_yolo") and ran_yolo:
+        applied.append("smaller_models")
+    return applied
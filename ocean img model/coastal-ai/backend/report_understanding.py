@@ -1,8 +1,14 @@
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
+from torch.profiler import record_function
+import numpy as np
 import re
 
+from backend.resources import scheduler
+from backend.embeddings import SHARED_EMBEDDINGS, cached_embeddings, calibrate_similarity, encode_shared_texts
+
 # Lightweight semantic model for text understanding
-text_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+# (not needed when all stages share CLIP embeddings)
+text_model = None if SHARED_EMBEDDINGS else SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
 
 # Canonical event descriptions for matching
 KNOWN_EVENTS = {
@@ -21,14 +27,80 @@ SEVERITY_LOW = ["mild", "slight", "small", "minor"]
 # Uncertainty indicators
 UNCERTAINTY_WORDS = ["maybe", "might", "could be", "i think", "possibly", "perhaps", "not sure"]
 
-def extract_severity(text: str) -> dict:
-    """Extract severity level from text"""
-    text_lower = text.lower()
-    
-    high_count = sum(1 for word in SEVERITY_HIGH if word in text_lower)
-    medium_count = sum(1 for word in SEVERITY_MEDIUM if word in text_lower)
-    low_count = sum(1 for word in SEVERITY_LOW if word in text_lower)
-    
+# Object mentions
+OBJECT_MENTIONS = {
+    "boat": ["boat", "ship", "vessel"],
+    "person": ["person", "people", "swimmer"],
+    "garbage": ["garbage", "trash", "plastic", "debris"],
+}
+
+# All keyword families, scanned together in one pass
+KEYWORD_FAMILIES = {
+    "severity_high": SEVERITY_HIGH,
+    "severity_medium": SEVERITY_MEDIUM,
+    "severity_low": SEVERITY_LOW,
+    "uncertainty": UNCERTAINTY_WORDS,
+    **{f"object_{item}": words for item, words in OBJECT_MENTIONS.items()},
+}
+
+
+def _build_keyword_matcher(families: dict):
+    """
+    Compile every keyword into a single regex
+
+    Keywords match as plain substrings (like `word in text`). The pattern
+    is a zero-width lookahead so overlapping keywords are all found; when
+    one keyword is a prefix of another starting at the same position, the
+    longer one matches and implies the shorter.
+    """
+
+    keywords = sorted({kw for words in families.values() for kw in words}, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(re.escape(kw) for kw in keywords) + "))")
+
+    implied = {kw: [other for other in keywords if kw.startswith(other)] for kw in keywords}
+
+    keyword_families = {}
+    for family, words in families.items():
+        for kw in words:
+            keyword_families.setdefault(kw, []).append(family)
+
+    return pattern, implied, keyword_families
+
+
+_KEYWORD_PATTERN, _IMPLIED_KEYWORDS, _KEYWORD_FAMILIES = _build_keyword_matcher(KEYWORD_FAMILIES)
+
+
+def scan_keywords(text: str) -> dict:
+    """
+    Find all keyword families in one pass over the text
+
+    Returns:
+        Dictionary mapping family name -> set of distinct keywords present
+    """
+
+    found = {family: set() for family in KEYWORD_FAMILIES}
+    for match in _KEYWORD_PATTERN.finditer(text.lower()):
+        for kw in _IMPLIED_KEYWORDS[match.group(1)]:
+            for family in _KEYWORD_FAMILIES[kw]:
+                found[family].add(kw)
+    return found
+
+
+def encode_texts(texts, batch_size: int = 64):
+    """Normalized embeddings in the space this stage scores in"""
+    if SHARED_EMBEDDINGS:
+        return encode_shared_texts(texts, batch_size=batch_size)
+    with scheduler.inference_slot("sentence_transformer"), record_function("report_minilm_encode"):
+        return text_model.encode(list(texts), batch_size=batch_size, normalize_embeddings=True)
+
+def extract_severity(text: str, keywords: dict = None) -> dict:
+    """Extract severity level from text (keywords: precomputed scan_keywords result)"""
+    keywords = keywords or scan_keywords(text)
+
+    high_count = len(keywords["severity_high"])
+    medium_count = len(keywords["severity_medium"])
+    low_count = len(keywords["severity_low"])
+
     if high_count > 0:
         return {"level": "HIGH", "confidence": 0.9}
     elif medium_count > 0:
@@ -38,67 +110,132 @@ def extract_severity(text: str) -> dict:
     else:
         return {"level": "MEDIUM", "confidence": 0.6}
 
-def detect_uncertainty(text: str) -> float:
+def detect_uncertainty(text: str, keywords: dict = None) -> float:
     """Detect uncertainty in language (0-1 where 1 = very uncertain)"""
-    text_lower = text.lower()
-    uncertainty_count = sum(1 for word in UNCERTAINTY_WORDS if word in text_lower)
+    keywords = keywords or scan_keywords(text)
+    uncertainty_count = len(keywords["uncertainty"])
     return min(uncertainty_count * 0.3, 1.0)
 
-def understand_report(report_text: str, vision_event: str, detected_objects: list = None) -> dict:
+def understand_report(report_text: str, vision_event: str, detected_objects: list = None,
+                      text_embedding=None, image_embedding=None) -> dict:
     """
     Understand user text and compare with vision output
-    
+
     Args:
         report_text: Natural language report from citizen
         vision_event: Event type detected by vision AI
         detected_objects: List of objects detected by YOLO
-    
+        text_embedding: Precomputed normalized text embedding (optional,
+            must come from encode_texts, i.e. CLIP space in shared mode)
+        image_embedding: CLIP image embedding, used for text-to-image
+            consistency in shared embedding mode (optional)
+
     Returns:
         Dictionary with text understanding results
     """
-    
-    if not report_text or len(report_text.strip()) < 3:
-        return {
-            "text_event": "insufficient_text",
-            "text_confidence": 0.0,
-            "consistency": "NO_TEXT",
-            "consistency_score": 0.0,
-            "severity": {"level": "UNKNOWN", "confidence": 0.0},
-            "uncertainty": 0.0,
-            "explanation": "Report text too short for analysis"
-        }
-    
+
+    return understand_reports(
+        [report_text],
+        vision_events=[vision_event],
+        detected_objects=[detected_objects],
+        text_embeddings=None if text_embedding is None else [text_embedding],
+        image_embeddings=[image_embedding]
+    )[0]
+
+def understand_reports(report_texts, vision_events=None, detected_objects=None,
+                       text_embeddings=None, image_embeddings=None, batch_size: int = 256) -> list:
+    """
+    Batch text understanding (e.g. SMS / social texts without media)
+
+    Keyword families are matched in one compiled pass per text and all texts
+    are encoded in large batches; each result has the same structure as
+    understand_report().
+
+    Args:
+        report_texts: List of report texts
+        vision_events: Per-text vision event types (default "unknown" = no media)
+        detected_objects: Per-text YOLO object lists (default none)
+        text_embeddings: Precomputed normalized text embeddings (optional)
+        image_embeddings: Per-text CLIP image embeddings (optional, shared mode)
+        batch_size: Encoder batch size
+
+    Returns:
+        List of text understanding dictionaries
+    """
+
+    n = len(report_texts)
+    vision_events = vision_events or ["unknown"] * n
+    detected_objects = detected_objects or [None] * n
+    image_embeddings = image_embeddings or [None] * n
+
+    results = [None] * n
+    valid = []
+
+    for i, report_text in enumerate(report_texts):
+        if not report_text or len(report_text.strip()) < 3:
+            results[i] = {
+                "text_event": "insufficient_text",
+                "text_confidence": 0.0,
+                "consistency": "NO_TEXT",
+                "consistency_score": 0.0,
+                "severity": {"level": "UNKNOWN", "confidence": 0.0},
+                "uncertainty": 0.0,
+                "explanation": "Report text too short for analysis"
+            }
+        else:
+            valid.append(i)
+
+    if not valid:
+        return results
+
     # Clean text
-    text_clean = report_text.lower().strip()
-    
+    texts_clean = [report_texts[i].lower().strip() for i in valid]
+
+    # Encode all texts at once
+    if text_embeddings is None:
+        embeddings = np.asarray(encode_texts(texts_clean, batch_size=batch_size))
+    else:
+        embeddings = np.asarray([text_embeddings[i] for i in valid])
+
+    # Compare with known events (event descriptions are encoded once)
+    event_embeddings = cached_embeddings("known_events", KNOWN_EVENTS.values(), encode_texts)
+    similarity_matrix = calibrate_similarity(embeddings @ event_embeddings.T)
+
+    for row, i in enumerate(valid):
+        scores = {event: float(sim) for event, sim in zip(KNOWN_EVENTS, similarity_matrix[row])}
+        results[i] = _interpret_report(
+            texts_clean[row], scores, vision_events[i], detected_objects[i] or [],
+            embeddings[row], image_embeddings[i]
+        )
+
+    return results
+
+def _interpret_report(text_clean: str, scores: dict, vision_event: str, detected_objects: list,
+                      text_embedding, image_embedding) -> dict:
+    """Build the understanding result for one text from its event similarity scores"""
+
+    # One keyword pass feeds severity, uncertainty and object mentions
+    keywords = scan_keywords(text_clean)
+
     # Extract severity
-    severity = extract_severity(text_clean)
-    
+    severity = extract_severity(text_clean, keywords)
+
     # Detect uncertainty
-    uncertainty = detect_uncertainty(text_clean)
-    
-    # Encode text
-    text_embedding = text_model.encode(text_clean, convert_to_tensor=True)
-    
-    # Compare with known events
-    scores = {}
-    for event, description in KNOWN_EVENTS.items():
-        event_embedding = text_model.encode(description, convert_to_tensor=True)
-        scores[event] = float(util.cos_sim(text_embedding, event_embedding).item())
-    
+    uncertainty = detect_uncertainty(text_clean, keywords)
+
     # Best matched event from text
     text_event = max(scores, key=scores.get)
     text_confidence = scores[text_event]
-    
+
     # Adjust confidence based on uncertainty language
     if uncertainty > 0.3:
         text_confidence *= (1 - uncertainty * 0.5)
-    
+
     # Consistency check between text and vision
     consistency_score = 0.0
     consistency = "UNKNOWN"
     explanation = ""
-    
+
     if vision_event == "normal" or vision_event == "unknown":
         if text_event in ["abnormal_wave", "rough_sea", "marine_garbage"]:
             consistency = "MISMATCH"
@@ -128,15 +265,15 @@ def understand_report(report_text: str, vision_event: str, detected_objects: lis
             consistency = "UNCERTAIN"
             consistency_score = 0.5
             explanation = "Unable to determine consistency between report and visuals."
-    
+
     # Check for specific object mentions vs detections
-    object_consistency = check_object_consistency(text_clean, detected_objects or [])
-    
+    object_consistency = check_object_consistency(text_clean, detected_objects, keywords)
+
     # Combine explanations
     if object_consistency["has_mismatch"]:
         explanation += f" {object_consistency['note']}"
-    
-    return {
+
+    result = {
         "text_event": text_event,
         "text_confidence": round(text_confidence, 2),
         "consistency": consistency,
@@ -148,40 +285,44 @@ def understand_report(report_text: str, vision_event: str, detected_objects: lis
         "object_consistency": object_consistency
     }
 
-def check_object_consistency(text: str, detected_objects: list) -> dict:
+    # Text-to-image consistency (only meaningful when both live in CLIP space)
+    if SHARED_EMBEDDINGS and image_embedding is not None:
+        result["text_image_similarity"] = round(float(np.dot(image_embedding, text_embedding)), 3)
+
+    return result
+
+def check_object_consistency(text: str, detected_objects: list, keywords: dict = None) -> dict:
     """Check if mentioned objects match detected objects"""
-    text_lower = text.lower()
-    
+    keywords = keywords or scan_keywords(text)
+
     # Common mentions
     mentioned_items = {
-        "boat": "boat" in text_lower or "ship" in text_lower or "vessel" in text_lower,
-        "person": "person" in text_lower or "people" in text_lower or "swimmer" in text_lower,
-        "garbage": "garbage" in text_lower or "trash" in text_lower or "plastic" in text_lower or "debris" in text_lower,
+        item: len(keywords[f"object_{item}"]) > 0 for item in OBJECT_MENTIONS
     }
-    
+
     detected_items = {
         "boat": any(obj in ["boat", "ship"] for obj in detected_objects),
         "person": "person" in detected_objects,
         "garbage": False  # YOLO might not detect garbage well
     }
-    
+
     mismatches = []
     matches = []
-    
+
     for item, is_mentioned in mentioned_items.items():
         if is_mentioned and not detected_items[item]:
             if item != "garbage":  # Garbage detection is weak, don't penalize
                 mismatches.append(f"'{item}' mentioned but not detected visually")
         elif is_mentioned and detected_items[item]:
             matches.append(f"'{item}' confirmed")
-    
+
     has_mismatch = len(mismatches) > 0
     note = ""
     if matches:
         note = "Visual confirmation: " + ", ".join(matches) + "."
     if mismatches:
         note += " Missing visual evidence: " + ", ".join(mismatches) + "."
-    
+
     return {
         "has_mismatch": has_mismatch,
         "matches": matches,
@@ -0,0 +1,232 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from backend.utils import available_cores
+
+# ----------------------------
+# CPU partitioning for concurrent inference
+# ----------------------------
+#
+# torch, OpenCV and BLAS each size their thread pools to the whole machine
+# by default, so a few concurrent requests oversubscribe the cores. The
+# scheduler splits the cores between:
+#
+#   - inference slots: how many heavy model calls (YOLO, CLIP, sentence
+#     transformers) may run at once, each with `torch_threads` intra-op threads
+#   - the request executor that runs the pipelines off the event loop
+#   - the stage executor that runs the stages of a pipeline concurrently
+#     under the request deadline (see backend.deadlines)
+#   - OpenCV / BLAS threads for the light per-request numeric work
+#
+# Environment overrides:
+#   COASTAL_CPU_CORES          cores this process may use (default: affinity / cgroup quota)
+#   COASTAL_INFERENCE_SLOTS    concurrent heavy inference calls
+#   COASTAL_TORCH_THREADS      torch intra-op threads per call
+#   COASTAL_TORCH_INTEROP_THREADS
+#   COASTAL_OPENCV_THREADS     OpenCV + BLAS threads
+#   COASTAL_EXECUTOR_THREADS   request executor size
+#   COASTAL_STAGE_THREADS      stage executor size
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return max(1, int(value)) if value else default
+
+
+class _CountingExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that counts its queued and running tasks"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._count_lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+
+    def submit(self, fn, *args, **kwargs):
+        def counted():
+            with self._count_lock:
+                self.queued -= 1
+                self.running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._count_lock:
+                    self.running -= 1
+
+        with self._count_lock:
+            self.queued += 1
+        try:
+            future = super().submit(counted)
+        except BaseException:
+            with self._count_lock:
+                self.queued -= 1
+            raise
+        future.add_done_callback(self._cancelled)
+        return future
+
+    def _cancelled(self, future):
+        # Cancelled tasks leave the queue without running
+        if future.cancelled():
+            with self._count_lock:
+                self.queued -= 1
+
+    def counts(self) -> tuple:
+        with self._count_lock:
+            return self.queued, self.running
+
+
+class ResourceScheduler:
+    """Thread budgets plus a limiter for heavy inference calls"""
+
+    def __init__(self):
+        self.cores = _env_int("COASTAL_CPU_CORES", available_cores())
+        self.inference_slots = _env_int("COASTAL_INFERENCE_SLOTS", 1 if self.cores < 4 else 2)
+        self.torch_threads = _env_int("COASTAL_TORCH_THREADS", max(1, self.cores // self.inference_slots))
+        self.torch_interop_threads = _env_int("COASTAL_TORCH_INTEROP_THREADS", 1)
+        self.executor_threads = _env_int("COASTAL_EXECUTOR_THREADS", 2 * self.inference_slots)
+        # Headroom for stages that overran their deadline and still hold a thread
+        self.stage_threads = _env_int("COASTAL_STAGE_THREADS", 4 * self.executor_threads)
+        self.opencv_threads = _env_int("COASTAL_OPENCV_THREADS", max(1, self.cores // self.executor_threads))
+
+        self._semaphore = threading.BoundedSemaphore(self.inference_slots)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        self._stages = {}
+        self._executor = None
+        self._stage_executor = None
+        self._applied = False
+        self._blas_limits = None
+
+    # ---------- Thread budgets ----------
+
+    def apply_thread_budgets(self):
+        """Apply thread budgets to torch, OpenCV and BLAS (before models run)"""
+
+        import cv2
+        import torch
+
+        torch.set_num_threads(self.torch_threads)
+        try:
+            # Only allowed before any inter-op parallel work has started
+            torch.set_num_interop_threads(self.torch_interop_threads)
+        except RuntimeError:
+            pass
+
+        cv2.setNumThreads(self.opencv_threads)
+
+        try:
+            from threadpoolctl import threadpool_limits
+            self._blas_limits = threadpool_limits(limits=self.opencv_threads, user_api="blas")
+        except ImportError:
+            pass
+
+        self._applied = True
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = _CountingExecutor(max_workers=self.executor_threads, thread_name_prefix="coastal-request")
+        return self._executor
+
+    @property
+    def stage_executor(self) -> ThreadPoolExecutor:
+        if self._stage_executor is None:
+            self._stage_executor = _CountingExecutor(max_workers=self.stage_threads, thread_name_prefix="coastal-stage")
+        return self._stage_executor
+
+    async def run(self, fn, *args):
+        """Run a blocking pipeline function on the request executor"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    # ---------- Inference limiter ----------
+
+    @contextmanager
+    def inference_slot(self, stage: str):
+        """
+        Hold one of the inference slots while running a heavy model call
+
+        Re-entrant per thread: nested calls (e.g. label embeddings computed
+        inside a CLIP call) reuse the slot already held.
+        """
+
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        with self._lock:
+            self._waiting += 1
+        wait_start = time.perf_counter()
+        self._semaphore.acquire()
+        waited = time.perf_counter() - wait_start
+
+        with self._lock:
+            self._waiting -= 1
+            self._active += 1
+        self._local.depth = 1
+        run_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            ran = time.perf_counter() - run_start
+            self._local.depth = 0
+            self._semaphore.release()
+            with self._lock:
+                self._active -= 1
+                stats = self._stages.setdefault(stage, {"calls": 0, "wait_s": 0.0, "max_wait_s": 0.0, "run_s": 0.0})
+                stats["calls"] += 1
+                stats["wait_s"] += waited
+                stats["max_wait_s"] = max(stats["max_wait_s"], waited)
+                stats["run_s"] += ran
+
+    # ---------- Observability ----------
+
+    def stats(self) -> dict:
+        with self._lock:
+            stages = {
+                stage: {
+                    "calls": s["calls"],
+                    "avg_wait_ms": round(1000 * s["wait_s"] / s["calls"], 1),
+                    "max_wait_ms": round(1000 * s["max_wait_s"], 1),
+                    "avg_run_ms": round(1000 * s["run_s"] / s["calls"], 1)
+                }
+                for stage, s in self._stages.items()
+            }
+            active, waiting = self._active, self._waiting
+
+        queued, running = self._executor.counts() if self._executor else (0, 0)
+        queued_stages, running_stages = self._stage_executor.counts() if self._stage_executor else (0, 0)
+
+        return {
+            "budgets": {
+                "cores": self.cores,
+                "inference_slots": self.inference_slots,
+                "torch_threads": self.torch_threads,
+                "torch_interop_threads": self.torch_interop_threads,
+                "opencv_threads": self.opencv_threads,
+                "executor_threads": self.executor_threads,
+                "stage_threads": self.stage_threads,
+                "applied": self._applied
+            },
+            "inference": {"active": active, "waiting": waiting},
+            "executor": {
+                "queued_requests": queued,
+                "running_requests": running,
+                "queued_stages": queued_stages,
+                "running_stages": running_stages
+            },
+            "stages": stages
+        }
+
+
+scheduler = ResourceScheduler()
@@ -0,0 +1,328 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from backend.fusion import ALERT_LEVELS
+
+# ----------------------------
+# Regional alert rollups
+# ----------------------------
+#
+# Every final decision is folded into time-bucketed aggregates (minute, hour
+# and day buckets) per coastal sector and event type. Dashboard queries read
+# a bounded number of buckets instead of scanning raw reports, so their cost
+# does not grow with report volume.
+#
+# Storage is a single SQLite database in WAL mode, so the workers of a
+# multi-process server can write concurrently while readers never block.
+
+# Sectors are cells of a regular lat/lon grid (degrees)
+SECTOR_DEGREES = float(os.environ.get("COASTAL_SECTOR_DEGREES", "0.25"))
+UNLOCATED_REGION = "unlocated"
+
+# Bucket width (seconds) and retention (seconds, None = keep forever)
+GRANULARITIES = {
+    "minute": {"seconds": 60, "retention": 2 * 86400},
+    "hour": {"seconds": 3600, "retention": 90 * 86400},
+    "day": {"seconds": 86400, "retention": None},
+}
+
+# Queries never read more than this many buckets per region/event type:
+# the finest granularity that covers the window within the limit is used
+MAX_QUERY_BUCKETS = 180
+MAX_WINDOW_SECONDS = 366 * 86400
+
+# Expired buckets are pruned by a background thread this often (seconds)
+PRUNE_INTERVAL = 600
+
+LEVEL_NAMES = [str(level) for level in ALERT_LEVELS]
+
+_WINDOW_PATTERN = re.compile(r"^(\d+)\s*([mhd])$")
+_WINDOW_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def region_for(lat: Optional[float], lon: Optional[float]) -> str:
+    """Coastal sector ID for a location, e.g. "13.00,80.25" (south-west corner)"""
+    if lat is None or lon is None:
+        return UNLOCATED_REGION
+    cell_lat = math.floor(lat / SECTOR_DEGREES) * SECTOR_DEGREES
+    cell_lon = math.floor(lon / SECTOR_DEGREES) * SECTOR_DEGREES
+    return f"{cell_lat:.2f},{cell_lon:.2f}"
+
+
+def parse_window(window: str) -> int:
+    """Parse "30m", "6h", "7d" into seconds"""
+    match = _WINDOW_PATTERN.match(window.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid window '{window}', expected e.g. 30m, 6h or 7d")
+    seconds = int(match.group(1)) * _WINDOW_UNITS[match.group(2)]
+    if not 0 < seconds <= MAX_WINDOW_SECONDS:
+        raise ValueError(f"Window must be between 1m and {MAX_WINDOW_SECONDS // 86400}d")
+    return seconds
+
+
+def granularity_for(window_seconds: int) -> str:
+    """Finest granularity that answers the window within MAX_QUERY_BUCKETS"""
+    for name, spec in GRANULARITIES.items():
+        retention = spec["retention"]
+        if window_seconds / spec["seconds"] <= MAX_QUERY_BUCKETS and (retention is None or window_seconds <= retention):
+            return name
+    return "day"
+
+
+def _epoch(timestamp: Optional[str]) -> int:
+    if not timestamp:
+        return int(time.time())
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def _iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec="seconds")
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    granularity TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    region TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    reports INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    confidence_sum REAL NOT NULL,
+    max_level INTEGER NOT NULL,
+    minimal INTEGER NOT NULL,
+    low INTEGER NOT NULL,
+    medium INTEGER NOT NULL,
+    high INTEGER NOT NULL,
+    PRIMARY KEY (granularity, bucket, region, event_type)
+) WITHOUT ROWID
+"""
+
+_UPSERT = """
+INSERT INTO rollups VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (granularity, bucket, region, event_type) DO UPDATE SET
+    reports = reports + 1,
+    score_sum = score_sum + excluded.score_sum,
+    confidence_sum = confidence_sum + excluded.confidence_sum,
+    max_level = MAX(max_level, excluded.max_level),
+    minimal = minimal + excluded.minimal,
+    low = low + excluded.low,
+    medium = medium + excluded.medium,
+    high = high + excluded.high
+"""
+
+
+class AlertRollups:
+    """
+    Incrementally maintained alert aggregates
+
+    Each record() is one small upsert per granularity; each query reads at
+    most MAX_QUERY_BUCKETS buckets per (region, event type) through the
+    primary key, independent of how many reports were recorded.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._pruner_lock = threading.Lock()
+        self._pruner_pid = None
+        self._stop = threading.Event()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Not kept: a connection must not be carried into forked workers
+        conn = sqlite3.connect(db_path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(_SCHEMA)
+        conn.commit()
+        conn.close()
+
+    def after_fork(self):
+        """Drop connections inherited from the parent process (never use them)"""
+        self._local = threading.local()
+        self._pruner_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread (the request executor runs several)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- Write ----------
+
+    def record(self, decision: dict, event_type: str, latitude: float = None,
+               longitude: float = None, timestamp: str = None) -> str:
+        """
+        Fold one final decision into the rollups
+
+        Args:
+            decision: Result of fusion.final_decision()
+            event_type: Event type from the vision stage
+            latitude, longitude: Report location (optional)
+            timestamp: ISO timestamp of the report (defaults to now)
+
+        Returns:
+            Region (sector) ID the report was counted under
+        """
+
+        region = region_for(latitude, longitude)
+        epoch = _epoch(timestamp)
+        level = LEVEL_NAMES.index(decision["alert_level"]) if decision.get("alert_level") in LEVEL_NAMES else 0
+        level_counts = [int(level == i) for i in range(len(LEVEL_NAMES))]
+
+        rows = [
+            (name, epoch - epoch % spec["seconds"], region, event_type or "unknown",
+             float(decision.get("final_score", 0.0)), float(decision.get("confidence", 0.0)), level, *level_counts)
+            for name, spec in GRANULARITIES.items()
+        ]
+
+        conn = self._connection()
+        with conn:
+            conn.executemany(_UPSERT, rows)
+
+        self._start_pruner()
+        return region
+
+    def _start_pruner(self):
+        # Threads do not survive fork, so each process that records starts its own
+        if self._pruner_pid == os.getpid():
+            return
+        with self._pruner_lock:
+            if self._pruner_pid != os.getpid():
+                self._pruner_pid = os.getpid()
+                threading.Thread(target=self._prune_loop, name="coastal-rollup-prune", daemon=True).start()
+
+    def _prune_loop(self):
+        # Off the request path: expired buckets never delay a record()
+        while True:
+            try:
+                self.prune()
+            except sqlite3.Error:
+                pass  # e.g. the database is locked; retried next interval
+            if self._stop.wait(PRUNE_INTERVAL):
+                return
+
+    def close(self):
+        """Stop this process's pruning thread"""
+        self._stop.set()
+
+    def prune(self, now: int = None):
+        """Drop buckets older than their granularity's retention"""
+        now = now or int(time.time())
+        conn = self._connection()
+        with conn:
+            for name, spec in GRANULARITIES.items():
+                if spec["retention"] is not None:
+                    conn.execute(
+                        "DELETE FROM rollups WHERE granularity = ? AND bucket < ?",
+                        (name, now - spec["retention"])
+                    )
+
+    # ---------- Query ----------
+
+    def query(self, window: str = "6h", region: str = None, event_type: str = None,
+              series: bool = False, now: int = None) -> Dict:
+        """
+        Aggregate statistics over the last `window`
+
+        The window is aligned to the bucket width of the chosen granularity
+        (e.g. "6h" covers the current hour and the five before it).
+
+        Args:
+            window: Look-back window such as "30m", "6h" or "7d"
+            region: Restrict to one sector ID (optional)
+            event_type: Restrict to one event type (optional)
+            series: Also return per-bucket totals (for charts)
+            now: Reference time as epoch seconds (defaults to now)
+
+        Returns:
+            Dictionary with totals, per-region and per-event breakdowns
+        """
+
+        window_seconds = parse_window(window)
+        granularity = granularity_for(window_seconds)
+        width = GRANULARITIES[granularity]["seconds"]
+
+        now = now or int(time.time())
+        end = now - now % width + width
+        start = end - math.ceil(window_seconds / width) * width
+
+        sql = ("SELECT bucket, region, event_type, reports, score_sum, confidence_sum, max_level, "
+               "minimal, low, medium, high FROM rollups "
+               "WHERE granularity = ? AND bucket >= ? AND bucket < ?")
+        params = [granularity, start, end]
+        if region:
+            sql += " AND region = ?"
+            params.append(region)
+        if event_type:
+            sql += " AND event_type = ?"
+            params.append(event_type)
+
+        rows = self._connection().execute(sql, params).fetchall()
+
+        totals = _empty_group()
+        regions, events, buckets = {}, {}, {}
+        for bucket, row_region, row_event, *values in rows:
+            _accumulate(totals, values)
+            _accumulate(regions.setdefault(row_region, _empty_group()), values)
+            _accumulate(events.setdefault(row_event, _empty_group()), values)
+            if series:
+                _accumulate(buckets.setdefault(bucket, _empty_group()), values)
+
+        result = {
+            "window": window,
+            "granularity": granularity,
+            "from": _iso(start),
+            "to": _iso(end),
+            "filters": {"region": region, "event_type": event_type},
+            "totals": _summarize(totals),
+            "regions": sorted(
+                ({"region": name, **_summarize(group)} for name, group in regions.items()),
+                key=lambda r: (-r["by_level"]["high"], -r["reports"])
+            ),
+            "event_types": {name: _summarize(group) for name, group in events.items()},
+        }
+
+        if series:
+            result["series"] = [
+                {"bucket": _iso(b), **_summarize(buckets.get(b, _empty_group()))}
+                for b in range(start, end, width)
+            ]
+
+        return result
+
+
+def _empty_group() -> List:
+    # reports, score_sum, confidence_sum, max_level, minimal, low, medium, high
+    return [0, 0.0, 0.0, -1, 0, 0, 0, 0]
+
+
+def _accumulate(group: List, values):
+    reports, score_sum, confidence_sum, max_level, *level_counts = values
+    group[0] += reports
+    group[1] += score_sum
+    group[2] += confidence_sum
+    group[3] = max(group[3], max_level)
+    for i, count in enumerate(level_counts):
+        group[4 + i] += count
+
+
+def _summarize(group: List) -> Dict:
+    reports, score_sum, confidence_sum, max_level, *level_counts = group
+    return {
+        "reports": reports,
+        "avg_score": round(score_sum / reports, 3) if reports else None,
+        "avg_confidence": round(confidence_sum / reports, 3) if reports else None,
+        "max_level": LEVEL_NAMES[max_level] if max_level >= 0 else None,
+        "by_level": dict(zip(LEVEL_NAMES, level_counts)),
+    }
@@ -0,0 +1,331 @@
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+# ----------------------------
+# Local Sentinel-1 style SAR tile store
+# ----------------------------
+#
+# Layout of a tile store directory:
+#
+#   index.json   {"tiles": [{"tile_id": "...", "path": "tile.npy",
+#                            "bounds": [min_lon, min_lat, max_lon, max_lat],
+#                            "acquired": "2026-01-01T06:00:00+00:00"}, ...]}
+#   *.npy        float32 sigma0 backscatter in dB (memory-mapped)
+#   *.tif        single-band GeoTIFF with the same contents (needs rasterio)
+#
+# Tiles are north-up: row 0 is max_lat, column 0 is min_lon.
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_MAPPED_TILES = 128
+DEFAULT_WINDOW_PX = 128
+DEFAULT_MAX_AGE_HOURS = 72
+
+
+def _parse_time(value) -> datetime:
+    if value is None:
+        return datetime.now(timezone.utc)
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    parsed = datetime.fromisoformat(str(value))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class TileCache:
+    """
+    LRU cache of decoded tiles
+
+    Decoded GeoTIFFs live on the heap and count against `max_bytes`.
+    Memory-mapped .npy tiles do not: only the pages read_window() touches
+    become resident, and those sit in the OS page cache, which reclaims them
+    under pressure. Counting them at their full size would evict maps after
+    a couple of large tiles, so they are bounded by `max_mapped` instead
+    (each one holds a mapping and a file descriptor).
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES, max_mapped: int = DEFAULT_MAX_MAPPED_TILES):
+        self.max_bytes = max_bytes
+        self.max_mapped = max_mapped
+        self._tiles = OrderedDict()
+        self._bytes = 0
+        self._mapped = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is None:
+                self.misses += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+
+    def _account(self, tile: np.ndarray, sign: int):
+        if isinstance(tile, np.memmap):
+            self._mapped += sign
+        else:
+            self._bytes += sign * tile.nbytes
+
+    def put(self, key, tile: np.ndarray):
+        with self._lock:
+            if key in self._tiles:
+                self._account(self._tiles.pop(key), -1)
+            self._tiles[key] = tile
+            self._account(tile, 1)
+
+            # Always keep the newest tile, even if it alone exceeds the budget
+            while (self._bytes > self.max_bytes or self._mapped > self.max_mapped) and len(self._tiles) > 1:
+                _, evicted = self._tiles.popitem(last=False)
+                self._account(evicted, -1)
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "tiles": len(self._tiles),
+                "mapped_tiles": self._mapped,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class SARTileStore:
+    """
+    Local store of SAR tiles with spatial/temporal tile selection
+
+    Args:
+        root: Directory containing index.json and the tile files
+        cache_bytes: Byte budget for decoded (non memory-mapped) tiles
+    """
+
+    def __init__(self, root: str, cache_bytes: int = DEFAULT_CACHE_BYTES):
+        self.root = root
+        self.cache = TileCache(cache_bytes)
+        self.tiles = {}
+        self._grid = {}
+        self.reload()
+
+    def reload(self):
+        """Re-read index.json (e.g. after new tiles were added)"""
+
+        self.tiles = {}
+        self._grid = {}
+        index_path = os.path.join(self.root, "index.json")
+        if not os.path.exists(index_path):
+            return
+
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+        for tile in index.get("tiles", []):
+            tile = dict(tile)
+            tile["acquired_dt"] = _parse_time(tile.get("acquired"))
+            self.tiles[tile["tile_id"]] = tile
+
+            # 1-degree grid so selection does not scan every tile
+            min_lon, min_lat, max_lon, max_lat = tile["bounds"]
+            for lat_cell in range(math.floor(min_lat), math.floor(max_lat) + 1):
+                for lon_cell in range(math.floor(min_lon), math.floor(max_lon) + 1):
+                    self._grid.setdefault((lat_cell, lon_cell), []).append(tile["tile_id"])
+
+    def select_tiles(self, lat: float, lon: float, when=None, max_age_hours: float = DEFAULT_MAX_AGE_HOURS) -> List[Dict]:
+        """
+        Tiles covering (lat, lon), most relevant acquisition first
+
+        Acquisitions before `when` are preferred (the SAR pass that could
+        have seen the event), then later ones, all within `max_age_hours`.
+        """
+
+        when = _parse_time(when)
+        max_age = timedelta(hours=max_age_hours)
+
+        candidates = []
+        for tile_id in self._grid.get((math.floor(lat), math.floor(lon)), []):
+            tile = self.tiles[tile_id]
+            min_lon, min_lat, max_lon, max_lat = tile["bounds"]
+            if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+                continue
+            delta = when - tile["acquired_dt"]
+            if abs(delta) > max_age:
+                continue
+            candidates.append((delta < timedelta(0), abs(delta), tile))
+
+        candidates.sort(key=lambda c: (c[0], c[1]))
+        return [c[2] for c in candidates]
+
+    def load_tile(self, tile_id: str) -> np.ndarray:
+        """Decoded tile array (dB), served from the LRU cache when possible"""
+
+        tile = self.cache.get(tile_id)
+        if tile is not None:
+            return tile
+
+        path = os.path.join(self.root, self.tiles[tile_id]["path"])
+        if path.endswith(".npy"):
+            tile = np.load(path, mmap_mode="r")
+        else:
+            import rasterio
+
+            with rasterio.open(path) as src:
+                tile = src.read(1).astype(np.float32)
+
+        self.cache.put(tile_id, tile)
+        return tile
+
+    def read_window(self, tile_id: str, lat: float, lon: float, half_size: int = DEFAULT_WINDOW_PX) -> np.ndarray:
+        """Window of the tile centred on (lat, lon), clipped to the tile edges"""
+
+        tile = self.load_tile(tile_id)
+        min_lon, min_lat, max_lon, max_lat = self.tiles[tile_id]["bounds"]
+        height, width = tile.shape[:2]
+
+        row = int((max_lat - lat) / (max_lat - min_lat) * (height - 1))
+        col = int((lon - min_lon) / (max_lon - min_lon) * (width - 1))
+
+        r0, r1 = max(0, row - half_size), min(height, row + half_size)
+        c0, c1 = max(0, col - half_size), min(width, col + half_size)
+
+        # Only the window is paged in / copied out of the memory map
+        return np.asarray(tile[r0:r1, c0:c1], dtype=np.float32)
+
+
+# ----------------------------
+# Windowed backscatter statistics
+# ----------------------------
+
+def compute_sar_statistics(window_db: np.ndarray) -> dict:
+    """
+    Sea-surface statistics for a SAR window (sigma0 in dB)
+
+    All local statistics use box filters (integral-image cost, independent
+    of window size), so a window costs a few passes over its pixels.
+
+    Returns:
+        mean/variance of backscatter, texture (local std), dark-spot
+        fraction and count, bright-target (vessel candidate) count
+    """
+
+    x = np.ascontiguousarray(window_db, dtype=np.float32)
+
+    # Local mean / std over 9x9 neighbourhoods -> surface texture
+    local_mean = cv2.blur(x, (9, 9), borderType=cv2.BORDER_REFLECT)
+    local_sq = cv2.blur(x * x, (9, 9), borderType=cv2.BORDER_REFLECT)
+    local_std = np.sqrt(np.maximum(local_sq - local_mean * local_mean, 0.0))
+
+    # Wide background estimate for anomaly detection
+    background = cv2.blur(x, (63, 63), borderType=cv2.BORDER_REFLECT)
+    background_sq = cv2.blur(x * x, (63, 63), borderType=cv2.BORDER_REFLECT)
+    background_std = np.sqrt(np.maximum(background_sq - background * background, 0.0))
+
+    # Dark spots: damped surface (slicks, dense debris) well below background
+    dark_mask = (local_mean < background - 4.0).astype(np.uint8)
+    dark_count, _, dark_stats, _ = cv2.connectedComponentsWithStats(dark_mask, connectivity=8)
+    dark_spots = int(np.sum(dark_stats[1:, cv2.CC_STAT_AREA] >= 16)) if dark_count > 1 else 0
+
+    # Bright targets: CFAR-style threshold over the local background
+    bright_mask = (x > background + np.maximum(5.0 * background_std, 6.0)).astype(np.uint8)
+    bright_count, _, bright_stats, _ = cv2.connectedComponentsWithStats(bright_mask, connectivity=8)
+    bright_targets = int(np.sum(bright_stats[1:, cv2.CC_STAT_AREA] >= 2)) if bright_count > 1 else 0
+
+    return {
+        "mean_backscatter_db": round(float(x.mean()), 2),
+        "backscatter_variance": round(float(x.var()), 3),
+        "texture_db": round(float(np.median(local_std)), 3),
+        "dark_spot_fraction": round(float(dark_mask.mean()), 4),
+        "dark_spots": dark_spots,
+        "bright_targets": bright_targets,
+        "pixels": int(x.size),
+    }
+
+
+def roughness_index(stats: dict) -> float:
+    """0-1 sea roughness from mean backscatter and surface texture"""
+
+    brightness = np.clip((stats["mean_backscatter_db"] + 22.0) / 10.0, 0.0, 1.0)
+    texture = np.clip((stats["texture_db"] - 0.8) / 2.0, 0.0, 1.0)
+    return float(0.5 * brightness + 0.5 * texture)
+
+
+# ----------------------------
+# Synthetic tiles (offline testing / demos)
+# ----------------------------
+
+def generate_synthetic_tile(
+    shape=(1024, 1024),
+    sea_state: str = "calm",
+    ships: int = 0,
+    dark_spots: int = 0,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Synthetic sigma0 tile in dB
+
+    Args:
+        shape: Tile shape in pixels
+        sea_state: "calm" or "rough" (brighter, swell-modulated surface)
+        ships: Number of bright point targets
+        dark_spots: Number of damped elliptical patches
+        seed: Random seed
+    """
+
+    rng = np.random.default_rng(seed)
+    rows, cols = np.mgrid[0:shape[0], 0:shape[1]].astype(np.float32)
+
+    if sea_state == "rough":
+        tile = -14.0 + 2.5 * np.sin(rows / 9.0 + cols / 13.0) + rng.normal(0.0, 1.5, shape)
+    else:
+        tile = -21.0 + rng.normal(0.0, 0.6, shape)
+    tile = tile.astype(np.float32)
+
+    for _ in range(ships):
+        r, c = rng.integers(8, shape[0] - 8), rng.integers(8, shape[1] - 8)
+        tile[r - 1:r + 2, c - 1:c + 2] = 5.0
+
+    for _ in range(dark_spots):
+        r, c = rng.integers(40, shape[0] - 40), rng.integers(40, shape[1] - 40)
+        mask = ((rows - r) / 25.0) ** 2 + ((cols - c) / 12.0) ** 2 <= 1.0
+        tile[mask] -= 8.0
+
+    return tile
+
+
+def write_synthetic_tile(root: str, tile_id: str, bounds, acquired=None, **kwargs) -> str:
+    """
+    Write a synthetic .npy tile into a tile store and register it in index.json
+
+    Extra keyword arguments are passed to generate_synthetic_tile().
+    """
+
+    os.makedirs(root, exist_ok=True)
+    path = f"{tile_id}.npy"
+    np.save(os.path.join(root, path), generate_synthetic_tile(**kwargs))
+
+    index_path = os.path.join(root, "index.json")
+    index = {"tiles": []}
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+    index["tiles"] = [t for t in index["tiles"] if t["tile_id"] != tile_id]
+    index["tiles"].append({
+        "tile_id": tile_id,
+        "path": path,
+        "bounds": list(bounds),
+        "acquired": _parse_time(acquired).isoformat(timespec="seconds"),
+    })
+
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+
+    return os.path.join(root, path)
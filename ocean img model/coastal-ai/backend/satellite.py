@@ -1,7 +1,90 @@
+import os
 import random
 from typing import Optional
 from datetime import datetime
 
+from backend.sar_tiles import SARTileStore, compute_sar_statistics, roughness_index
+
+# Local SAR tile store (see backend/sar_tiles.py for the layout)
+SAR_TILE_DIR = os.environ.get(
+    "SAR_TILE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "sar_tiles")
+)
+
+_tile_store = None
+
+
+def get_tile_store() -> Optional[SARTileStore]:
+    """Shared tile store (created on first use), or None if no store exists"""
+    global _tile_store
+    if _tile_store is None and os.path.exists(os.path.join(SAR_TILE_DIR, "index.json")):
+        _tile_store = SARTileStore(SAR_TILE_DIR)
+    return _tile_store
+
+
+def sar_tile_check(event_type: str, detected_objects: list, location: dict, store: SARTileStore = None):
+    """
+    Verify a report against real SAR tiles from the local tile store
+
+    Args:
+        event_type: Detected event from vision AI
+        detected_objects: Objects detected by YOLO
+        location: Dict with "lat", "lon" and optional "timestamp" (ISO)
+        store: Tile store to use (defaults to the shared store)
+
+    Returns:
+        Same structure as satellite_check(), or None if no tile covers the location
+    """
+
+    store = store or get_tile_store()
+    if store is None:
+        return None
+
+    tiles = store.select_tiles(location["lat"], location["lon"], location.get("timestamp"))
+    if not tiles:
+        return None
+
+    tile = tiles[0]
+    window = store.read_window(tile["tile_id"], location["lat"], location["lon"])
+    stats = compute_sar_statistics(window)
+    roughness = roughness_index(stats)
+    has_vessels = event_type == "ship" or any(obj in ["boat", "ship"] for obj in (detected_objects or []))
+
+    if event_type in ["abnormal_wave", "rough_sea"]:
+        confidence = 0.35 + 0.6 * roughness
+        evidence = f"SAR roughness index {roughness:.2f} (texture {stats['texture_db']} dB, mean backscatter {stats['mean_backscatter_db']} dB)."
+    elif has_vessels:
+        confidence = 0.75 + min(0.2, 0.02 * stats["bright_targets"]) if stats["bright_targets"] > 0 else 0.4
+        evidence = f"{stats['bright_targets']} bright point target(s) consistent with vessels in SAR window."
+    elif event_type == "marine_garbage":
+        confidence = 0.55 + min(0.35, 10 * stats["dark_spot_fraction"]) if stats["dark_spots"] > 0 else 0.4
+        evidence = f"{stats['dark_spots']} dark spot(s) covering {stats['dark_spot_fraction'] * 100:.1f}% of the SAR window."
+    elif event_type == "normal":
+        confidence = 0.4 + 0.5 * (1.0 - roughness)
+        evidence = f"SAR roughness index {roughness:.2f}; surface {'calm' if roughness < 0.4 else 'disturbed'}."
+    else:
+        confidence = 0.45
+        evidence = "SAR statistics available but event classification unclear."
+
+    confidence = max(0.0, min(1.0, confidence))
+
+    return {
+        "satellite_confidence": round(confidence, 2),
+        "confidence": round(confidence, 2),
+        "verified": confidence > 0.70,
+        "source": "Sentinel-1 SAR (local tile store)",
+        "evidence": evidence,
+        "sar_features": {
+            **stats,
+            "roughness_index": round(roughness, 2),
+            "tile_id": tile["tile_id"],
+            "geo_tagged": "YES"
+        },
+        "timestamp": tile["acquired_dt"].strftime("%Y-%m-%d %H:%M UTC"),
+        "note": "Sentinel-1 SAR provides all-weather, day/night coverage. Updates every ~6 hours."
+    }
+
+
 def satellite_check(event_type: Optional[str] = None, detected_objects: list = None, location: dict = None):
     """
     Near-real-time satellite verification using Sentinel-1 SAR logic
@@ -12,12 +95,14 @@ def satellite_check(event_type: Optional[str] = None, detected_objects: list = N
     - Detect ship signatures
     - Check for surface anomalies
     
-    For demo: Simulates realistic SAR-based verification with detailed evidence
+    When a geo-tagged report is covered by the local SAR tile store, the
+    verification runs on real tile statistics (sar_tile_check). Otherwise
+    it simulates realistic SAR-based verification with detailed evidence.
     
     Args:
         event_type: Detected event from vision AI
         detected_objects: Objects detected by YOLO
-        location: Optional lat/lon coordinates
+        location: Optional dict with "lat", "lon" and "timestamp"
     
     Returns:
         Dictionary with satellite confidence and evidence
@@ -25,6 +110,11 @@ def satellite_check(event_type: Optional[str] = None, detected_objects: list = N
     
     if event_type is None:
         event_type = "unknown"
+
+    if location and "lat" in location and "lon" in location:
+        tile_result = sar_tile_check(event_type, detected_objects, location)
+        if tile_result is not None:
+            return tile_result
     
     # Base confidence levels for different events
     confidence = 0.5
@@ -1,33 +1,78 @@
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
+from torch.profiler import record_function
+import numpy as np
 
-# Load model once
-text_model = SentenceTransformer(
+from backend.resources import scheduler
+from backend.embeddings import SHARED_EMBEDDINGS, cached_embeddings, calibrate_similarity, encode_shared_texts
+
+# Load model once (not needed when all stages share CLIP embeddings)
+text_model = None if SHARED_EMBEDDINGS else SentenceTransformer(
     "sentence-transformers/all-mpnet-base-v2"
 )
 
-def social_check(report_text: str, known_posts=None):
+DEFAULT_POSTS = [
+    "huge waves near coast",
+    "storm approaching shoreline",
+    "rough sea conditions reported"
+]
+
+
+def encode_texts(texts, batch_size: int = 64):
+    """Normalized embeddings in the space this stage scores in"""
+    if SHARED_EMBEDDINGS:
+        return encode_shared_texts(texts, batch_size=batch_size)
+    with scheduler.inference_slot("sentence_transformer"), record_function("social_mpnet_encode"):
+        return text_model.encode(list(texts), batch_size=batch_size, normalize_embeddings=True)
+
+
+def social_check(report_text: str, known_posts=None, text_embedding=None):
     """
     report_text: citizen input text
     known_posts: list of known / recent social posts
+    text_embedding: precomputed normalized embedding of report_text (optional,
+        must come from encode_texts, i.e. CLIP space in shared mode)
     """
 
     if known_posts is None:
-        known_posts = [
-            "huge waves near coast",
-            "storm approaching shoreline",
-            "rough sea conditions reported"
-        ]
+        known_posts = DEFAULT_POSTS
 
-    emb1 = text_model.encode(report_text)
+    # Reference posts are encoded once, not on every report
+    post_embeddings = cached_embeddings("social", known_posts, encode_texts)
 
-    similarities = [
-        util.cos_sim(emb1, text_model.encode(p)).item()
-        for p in known_posts
-    ]
+    if text_embedding is None:
+        text_embedding = encode_texts([report_text])[0]
+
+    similarities = calibrate_similarity(post_embeddings @ text_embedding)
 
-    max_sim = max(similarities)
+    max_sim = float(similarities.max())
 
     return {
         "social_confidence": round(max_sim, 2),
         "verified": max_sim > 0.6
     }
+
+
+def social_checks(report_texts, known_posts=None, text_embeddings=None, batch_size: int = 256):
+    """
+    Batch version of social_check() for bulk text triage
+
+    All texts are encoded in batches and scored with one matrix product.
+    """
+
+    if known_posts is None:
+        known_posts = DEFAULT_POSTS
+
+    post_embeddings = cached_embeddings("social", known_posts, encode_texts)
+
+    if text_embeddings is None:
+        text_embeddings = encode_texts(report_texts, batch_size=batch_size)
+
+    max_sims = calibrate_similarity((np.asarray(text_embeddings) @ post_embeddings.T).max(axis=1))
+
+    return [
+        {
+            "social_confidence": round(float(max_sim), 2),
+            "verified": bool(max_sim > 0.6)
+        }
+        for max_sim in max_sims
+    ]
@@ -99,14 +99,193 @@ def analyze_temporal_trends(frame_results: List[Dict]) -> Dict:
     }
 
 
-def assess_video_consistency(frame_results: List[Dict]) -> Dict:
+# ----------------------------
+# Video consistency (loops, repeated segments, hard cuts)
+# ----------------------------
+
+# Two sampled frames "repeat" when their CLIP embeddings are this similar...
+REPEAT_SIMILARITY = 0.985
+# ...and, when frame signatures (pHash) are available, this close in Hamming distance
+REPEAT_HASH_DISTANCE = 6
+# Minimum run of consecutive repeated samples before it counts as a repeated segment
+MIN_REPEAT_RUN = 3
+# Ignore repeats closer than this many samples (normal slow motion)
+MIN_REPEAT_LAG = 2
+
+# Adjacent samples below this similarity, and far below the video's own
+# typical adjacent similarity, are hard cuts
+CUT_SIMILARITY = 0.85
+CUT_ROBUST_Z = 6.0
+CUT_HASH_DISTANCE = 24
+
+# Median adjacent similarity above which the video is effectively static
+# (repeats are then expected and not evidence of a loop)
+STATIC_SIMILARITY = 0.995
+
+# Above this many samples the all-pairs search compares 64-bit sketches
+# instead of exact cosine similarities (still every pair: cheaper, not
+# fewer, comparisons); BLOCK_ROWS bounds the memory per block
+EXACT_MAX_FRAMES = 1024
+BLOCK_ROWS = 256
+SKETCH_BITS = 64
+
+
+def _as_hashes(signatures) -> np.ndarray:
+    return np.array([int(h) for h in signatures], dtype=np.uint64)
+
+
+def embedding_sketches(embeddings: np.ndarray, seed: int = 0) -> np.ndarray:
+    """
+    64-bit random-hyperplane sketches of normalized embeddings
+
+    The Hamming distance between two sketches estimates the angle between
+    the embeddings (distance / 64 ~= angle / pi), so all-pairs search can
+    run on single uint64 XOR/popcounts instead of full dot products.
+    """
+
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((embeddings.shape[1], SKETCH_BITS)).astype(np.float32)
+    bits = (embeddings @ planes) > 0
+    return np.packbits(bits, axis=1).view(">u8")[:, 0].astype(np.uint64)
+
+
+def _repeat_pairs(embeddings: np.ndarray, hashes: np.ndarray, threshold: float):
+    """
+    All sample pairs (i, j), j - i >= MIN_REPEAT_LAG, that look like the same frame
+
+    Rows are processed in blocks so memory stays at BLOCK_ROWS x n. Short
+    videos compare exact cosine similarities; long ones compare embedding
+    sketches first and verify only the candidate pairs exactly.
+
+    Either way every pair is compared, so the cost is O(n^2): the sketch
+    path makes each comparison one XOR/popcount instead of a dot product,
+    it does not skip pairs. At 1 sample/s an hour of video is ~3600
+    samples, i.e. ~6.5M popcounts.
+
+    Returns:
+        (i, j, similarity) arrays and the method used
+    """
+
+    n = len(embeddings) if embeddings is not None else len(hashes)
+    exact = embeddings is not None and n <= EXACT_MAX_FRAMES
+
+    if embeddings is None:
+        method = "signature"
+        sketches = None
+    elif exact:
+        method = "exact"
+        sketches = None
+    else:
+        method = "sketch"
+        sketches = embedding_sketches(embeddings)
+        # Hamming radius matching the cosine threshold (with some slack)
+        sketch_radius = int(np.ceil(SKETCH_BITS * np.arccos(threshold) / np.pi)) + 4
+
+    cols = np.arange(n)
+    rows_i, rows_j, sims = [], [], []
+
+    for r0 in range(0, n, BLOCK_ROWS):
+        r1 = min(n, r0 + BLOCK_ROWS)
+        rows = np.arange(r0, r1)
+        mask = cols[None, :] - rows[:, None] >= MIN_REPEAT_LAG
+
+        if hashes is not None:
+            mask &= np.bitwise_count(hashes[r0:r1, None] ^ hashes[None, :]) <= REPEAT_HASH_DISTANCE
+
+        if exact:
+            block = embeddings[r0:r1] @ embeddings.T
+            mask &= block >= threshold
+            i, j = np.nonzero(mask)
+            sim = block[i, j]
+        elif sketches is not None:
+            mask &= np.bitwise_count(sketches[r0:r1, None] ^ sketches[None, :]) <= sketch_radius
+            i, j = np.nonzero(mask)
+            sim = np.einsum("ij,ij->i", embeddings[r0 + i], embeddings[j])
+            keep = sim >= threshold
+            i, j, sim = i[keep], j[keep], sim[keep]
+        else:
+            i, j = np.nonzero(mask)
+            sim = np.ones(len(i), dtype=np.float32)
+
+        rows_i.append(i + r0)
+        rows_j.append(j)
+        sims.append(sim)
+
+    return np.concatenate(rows_i), np.concatenate(rows_j), np.concatenate(sims), method
+
+
+def _repeated_segments(i: np.ndarray, j: np.ndarray, sim: np.ndarray, n: int) -> List[Dict]:
+    """
+    Group repeated pairs into segments along diagonals of the similarity matrix
+
+    A segment is a run of consecutive samples i..i+k that match j..j+k at
+    the same lag; a segment whose repeat reaches the last sample is a loop.
+    """
+
+    if len(i) == 0:
+        return []
+
+    lag = j - i
+    order = np.lexsort((i, lag))
+    i, lag, sim = i[order], lag[order], sim[order]
+
+    # New run wherever the lag changes or the diagonal has a gap
+    breaks = np.flatnonzero((np.diff(lag) != 0) | (np.diff(i) != 1)) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(i)]])
+
+    segments = []
+    for s, e in zip(starts, ends):
+        length = e - s
+        if length < MIN_REPEAT_RUN:
+            continue
+        src_start, src_end, d = int(i[s]), int(i[e - 1]), int(lag[s])
+        segments.append({
+            "kind": "loop" if src_end + d == n - 1 else "repeated_segment",
+            "source": (src_start, src_end),
+            "repeat": (src_start + d, src_end + d),
+            "length": int(length),
+            "similarity": round(float(sim[s:e].mean()), 3)
+        })
+
+    # Keep the longest segment per overlapping region (a loop also matches at 2x lag, ...)
+    segments.sort(key=lambda seg: -seg["length"])
+    kept, covered = [], np.zeros(n, dtype=bool)
+    for seg in segments:
+        a, b = seg["repeat"]
+        if covered[a:b + 1].mean() < 0.5:
+            covered[a:b + 1] = True
+            kept.append(seg)
+    return sorted(kept, key=lambda seg: seg["repeat"][0])
+
+
+def _hard_cuts(adjacent: np.ndarray, adjacent_hash: np.ndarray) -> np.ndarray:
+    """Indices k where the cut lies between sample k and k+1"""
+
+    if adjacent is not None:
+        median = np.median(adjacent)
+        mad = 1.4826 * np.median(np.abs(adjacent - median)) + 1e-3
+        robust_z = (median - adjacent) / mad
+        return np.flatnonzero((adjacent < CUT_SIMILARITY) & (robust_z > CUT_ROBUST_Z))
+    # Signatures only: far beyond this video's usual frame-to-frame distance
+    return np.flatnonzero(adjacent_hash >= max(CUT_HASH_DISTANCE, 2 * np.median(adjacent_hash)))
+
+
+def assess_video_consistency(frame_results: List[Dict], embeddings=None, signatures=None,
+                             frame_indices: List[int] = None) -> Dict:
     """
     Check if video shows consistent event across frames
     
-    Helps detect edited/spliced videos
+    Helps detect edited/spliced videos. With per-frame CLIP embeddings
+    and/or frame signatures (pHash), also finds loops, repeated segments
+    and hard cuts from the frame-to-frame similarity matrix.
     
     Args:
         frame_results: List of vision AI results
+        embeddings: Normalized CLIP image embeddings, one per frame (optional)
+        signatures: 64-bit perceptual hashes, one per frame (optional)
+        frame_indices: Video frame number of each sampled frame (optional,
+            defaults to the sample index)
     
     Returns:
         Consistency assessment
@@ -119,6 +298,9 @@ def assess_video_consistency(frame_results: List[Dict]) -> Dict:
             "note": "Single frame, no consistency check"
         }
     
+    n = len(frame_results)
+    frame_indices = list(frame_indices) if frame_indices is not None else list(range(n))
+    
     # Extract event types
     event_types = [r.get("event_type", "unknown") for r in frame_results]
     
@@ -137,9 +319,83 @@ def assess_video_consistency(frame_results: List[Dict]) -> Dict:
     if switches > len(event_types) * 0.5:
         suspicious_patterns.append("Excessive event type switching detected")
     
-    # Pattern 2: All frames exactly identical (possible loop)
-    if len(set(str(r) for r in frame_results)) == 1:
-        suspicious_patterns.append("All frames identical - possible video loop")
+    if embeddings is None and signatures is None:
+        # Pattern 2: All frames identical (possible loop), from the result fields only
+        keys = {(r.get("event_type"), r.get("clip_score"), r.get("vision_confidence"),
+                 tuple(r.get("detected_objects", []))) for r in frame_results}
+        if len(keys) == 1:
+            suspicious_patterns.append("All frames identical - possible video loop")
+        
+        is_consistent = consistency_ratio > 0.6 and len(suspicious_patterns) == 0
+        
+        return {
+            "is_consistent": is_consistent,
+            "confidence": round(consistency_ratio, 2),
+            "dominant_event": most_common_event,
+            "event_distribution": dict(event_counts),
+            "suspicious_patterns": suspicious_patterns,
+            "assessment": "Video shows consistent event" if is_consistent else "Video may be edited or contains multiple scenes"
+        }
+    
+    # Frame-level analysis on embeddings / signatures
+    E = np.asarray(embeddings, dtype=np.float32) if embeddings is not None else None
+    hashes = _as_hashes(signatures) if signatures is not None else None
+    
+    adjacent = np.einsum("ij,ij->i", E[1:], E[:-1]) if E is not None else None
+    adjacent_hash = np.bitwise_count(hashes[1:] ^ hashes[:-1]) if hashes is not None else None
+    
+    # Pattern 2: (Near-)static video - every sample looks the same
+    if adjacent is not None:
+        is_static = bool(np.median(adjacent) >= STATIC_SIMILARITY)
+    else:
+        is_static = bool(np.median(adjacent_hash) <= 2)
+    
+    # Pattern 3: Hard cuts between consecutive samples
+    cuts = _hard_cuts(adjacent, adjacent_hash)
+    
+    # Pattern 4: Loops / repeated segments (skipped for static footage,
+    # where every frame repeats every other)
+    segments, method = [], None
+    if not is_static:
+        threshold = REPEAT_SIMILARITY
+        if adjacent is not None:
+            # Repeats must be closer than neighbouring samples usually are
+            threshold = max(REPEAT_SIMILARITY, float(np.median(adjacent)) + 0.005)
+        i, j, sim, method = _repeat_pairs(E, hashes, threshold)
+        segments = _repeated_segments(i, j, sim, n)
+    
+    if is_static:
+        suspicious_patterns.append("All frames near-identical - possible still image or frozen loop")
+    if len(cuts):
+        suspicious_patterns.append(f"{len(cuts)} hard cut(s) between frames - possible splice")
+    if any(seg["kind"] == "loop" for seg in segments):
+        suspicious_patterns.append("Video loops back to earlier footage")
+    if any(seg["kind"] == "repeated_segment" for seg in segments):
+        suspicious_patterns.append("Repeated segment(s) inside the video")
+    
+    # Offending frames (video frame numbers)
+    offending = set()
+    hard_cuts = []
+    for k in cuts:
+        offending.add(frame_indices[k + 1])
+        hard_cuts.append({
+            "frame": frame_indices[k + 1],
+            "previous_frame": frame_indices[k],
+            "similarity": round(float(adjacent[k]), 3) if adjacent is not None else None,
+            "hash_distance": int(adjacent_hash[k]) if adjacent_hash is not None else None
+        })
+    
+    repeated = []
+    for seg in segments:
+        a, b = seg["repeat"]
+        offending.update(frame_indices[a:b + 1])
+        repeated.append({
+            "kind": seg["kind"],
+            "source_frames": [frame_indices[seg["source"][0]], frame_indices[seg["source"][1]]],
+            "repeat_frames": [frame_indices[a], frame_indices[b]],
+            "samples": seg["length"],
+            "similarity": seg["similarity"]
+        })
     
     is_consistent = consistency_ratio > 0.6 and len(suspicious_patterns) == 0
     
@@ -149,5 +405,14 @@ def assess_video_consistency(frame_results: List[Dict]) -> Dict:
         "dominant_event": most_common_event,
         "event_distribution": dict(event_counts),
         "suspicious_patterns": suspicious_patterns,
-        "assessment": "Video shows consistent event" if is_consistent else "Video may be edited or contains multiple scenes"
+        "assessment": "Video shows consistent event" if is_consistent else "Video may be edited or contains multiple scenes",
+        "frame_similarity": {
+            "method": method or ("static" if is_static else None),
+            "adjacent_mean": round(float(adjacent.mean()), 3) if adjacent is not None else None,
+            "adjacent_min": round(float(adjacent.min()), 3) if adjacent is not None else None,
+            "is_static": is_static
+        },
+        "hard_cuts": hard_cuts,
+        "repeated_segments": repeated,
+        "offending_frames": sorted(offending)
     }
@@ -0,0 +1,91 @@
+import math
+import os
+
+import psutil
+
+MB = 1024 * 1024
+
+
+def _cgroup_cpu_limit():
+    """CPU quota of this process's cgroup in cores (None = unlimited)"""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cores() -> int:
+    """Cores this process may run on: CPU affinity, capped by a cgroup CPU quota"""
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cores = min(cores, max(1, math.ceil(limit)))
+    return cores
+
+
+def process_memory(pid: int = None) -> dict:
+    """
+    Memory usage of a process
+
+    rss counts every resident page, including pages shared copy-on-write
+    with the parent; uss is memory private to the process and pss splits
+    shared pages evenly between the processes using them. With prefork
+    serving, model weights should show up in shared_mb, not uss_mb.
+
+    Args:
+        pid: Process ID (defaults to the current process)
+    """
+
+    proc = psutil.Process(pid or os.getpid())
+    try:
+        info = proc.memory_full_info()
+    except (psutil.AccessDenied, psutil.ZombieProcess):
+        info = proc.memory_info()
+
+    uss = getattr(info, "uss", None)
+    pss = getattr(info, "pss", None)
+
+    return {
+        "pid": proc.pid,
+        "rss_mb": round(info.rss / MB, 1),
+        "uss_mb": round(uss / MB, 1) if uss is not None else None,
+        "pss_mb": round(pss / MB, 1) if pss is not None else None,
+        "shared_mb": round((info.rss - uss) / MB, 1) if uss is not None else None
+    }
+
+
+def worker_memory_report(parent_pid: int) -> dict:
+    """Per-worker memory for all children of a prefork parent, plus totals"""
+
+    parent = psutil.Process(parent_pid)
+    workers = []
+    for child in parent.children():
+        try:
+            workers.append(process_memory(child.pid))
+        except psutil.NoSuchProcess:
+            continue
+
+    return {
+        "parent": process_memory(parent_pid),
+        "workers": workers,
+        "total_rss_mb": round(sum(w["rss_mb"] for w in workers), 1),
+        "total_pss_mb": round(sum(w["pss_mb"] or 0 for w in workers), 1)
+    }
@@ -0,0 +1,302 @@
+"""
+Map-reduce video analysis across worker processes
+
+A long video is split into time segments; each worker decodes and analyzes
+only its own frame range (backend.vision_video.analyze_segment), and the
+per-segment frame results are merged in order into one aggregate, with the
+same temporal_analysis and consistency_check as a sequential pass.
+
+Two backends:
+
+- Local process pool (COASTAL_VIDEO_WORKERS=N): N spawned processes on this
+  machine, each loading the vision models once.
+- Broker (COASTAL_VIDEO_BROKER=host:port): a multiprocessing manager holding
+  a task queue; worker processes on any node pull segments from it. The
+  video path must be readable by every worker node (shared storage).
+
+    export COASTAL_VIDEO_BROKER_AUTHKEY=<long random secret>
+    python -m backend.video_mapreduce broker --address 127.0.0.1:50000
+    python -m backend.video_mapreduce worker --address 127.0.0.1:50000
+
+The broker speaks pickle to anyone holding the authkey, so there is no
+default key: the broker, its workers and the server refuse to start
+without COASTAL_VIDEO_BROKER_AUTHKEY (or --authkey). It binds to
+localhost by default; for multi-node use bind it to a private interface
+only (e.g. --address 10.0.0.5:50000), never a public one.
+
+Each pool or node worker holds its own copy of the models, so size N to
+the memory available; under backend.prefork prefer the broker, so the
+server workers do not each start a pool.
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.managers import BaseManager
+from typing import List, Optional, Tuple
+
+from backend.resources import available_cores
+
+VIDEO_WORKERS = int(os.environ.get("COASTAL_VIDEO_WORKERS", "0"))
+VIDEO_BROKER = os.environ.get("COASTAL_VIDEO_BROKER")
+BROKER_AUTHKEY = os.environ.get("COASTAL_VIDEO_BROKER_AUTHKEY")
+
+# Segment length, and the shortest video worth splitting (seconds)
+SEGMENT_SECONDS = float(os.environ.get("COASTAL_VIDEO_SEGMENT_SECONDS", "60"))
+MIN_PARALLEL_SECONDS = float(os.environ.get("COASTAL_VIDEO_PARALLEL_MIN_SECONDS", "120"))
+
+# Give up on a broker job if a segment result takes longer than this (seconds)
+BROKER_RESULT_TIMEOUT = 1800
+
+
+def plan_segments(frame_count: int, fps: float, segment_seconds: float = SEGMENT_SECONDS,
+                  step: int = None) -> List[Tuple[int, Optional[int]]]:
+    """
+    Split a video into (start_frame, end_frame) ranges
+
+    Boundaries fall on multiples of the sampling step (default: one frame
+    per second), so the segments together sample exactly the frames of a
+    sequential pass. The last segment is open-ended (container frame counts
+    are estimates).
+    """
+
+    step = step or max(1, int(fps))
+    segment_frames = max(step, int(round(segment_seconds * fps / step)) * step)
+
+    starts = list(range(0, max(frame_count, 1), segment_frames))
+    ends = starts[1:] + [None]
+    return list(zip(starts, ends))
+
+
+def should_parallelize(video_path: str) -> bool:
+    """True when a pool/broker is configured and the video is long enough to split"""
+    if not (VIDEO_WORKERS or VIDEO_BROKER):
+        return False
+
+    from backend.vision_video import video_info
+    info = video_info(video_path)
+    return info["frame_count"] / info["fps"] >= MIN_PARALLEL_SECONDS
+
+
+# ----------------------------
+# Local process pool
+# ----------------------------
+
+_pool = None
+
+
+def _init_pool_worker(cores: int):
+    # Each worker gets its share of the cores, then loads the models once
+    os.environ["COASTAL_CPU_CORES"] = str(cores)
+    import backend.vision_video  # noqa: F401
+
+
+def _run_segment(video_path: str, start_frame: int, end_frame: Optional[int],
+                 sample_fps: float = None, vision_options: dict = None) -> dict:
+    from backend.vision_video import analyze_segment
+    return analyze_segment(video_path, start_frame, end_frame, sample_fps, vision_options)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Shared pool of COASTAL_VIDEO_WORKERS processes (started on first use)"""
+    global _pool
+    if _pool is None:
+        workers = max(1, VIDEO_WORKERS)
+        cores = max(1, available_cores() // workers)
+        # Spawned (not forked) workers: the pool starts inside a server
+        # process that has already run inference, so torch's OpenMP /
+        # intra-op thread pools exist, and a forked child would inherit their
+        # locks without the threads (deadlock). backend.prefork can fork
+        # because its parent only loads the models and never runs them.
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_pool_worker,
+            initargs=(cores,)
+        )
+    return _pool
+
+
+def _map_pool(video_path: str, segments, sample_fps: float = None, vision_options: dict = None) -> List[dict]:
+    pool = get_pool()
+    futures = [
+        pool.submit(_run_segment, video_path, start, end, sample_fps, vision_options)
+        for start, end in segments
+    ]
+    return [future.result() for future in futures]
+
+
+# ----------------------------
+# Broker (multi-node)
+# ----------------------------
+
+class VideoBroker(BaseManager):
+    """Task queue plus one result queue per job, served by `broker`"""
+
+
+_tasks = queue.Queue()
+_results = {}
+
+
+def _task_queue():
+    return _tasks
+
+
+def _result_queue(job_id: str):
+    """Result queue of a job, created by the server that submits it"""
+    return _results.setdefault(job_id, queue.Queue())
+
+
+def _put_result(job_id: str, item: tuple):
+    # Segments of a job that was already dropped (timed out or failed) are
+    # discarded instead of re-creating its queue
+    results = _results.get(job_id)
+    if results is not None:
+        results.put(item)
+
+
+def _drop_results(job_id: str):
+    _results.pop(job_id, None)
+
+
+VideoBroker.register("task_queue", callable=_task_queue)
+VideoBroker.register("result_queue", callable=_result_queue)
+VideoBroker.register("put_result", callable=_put_result)
+VideoBroker.register("drop_results", callable=_drop_results)
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def broker_authkey(authkey: bytes = None) -> bytes:
+    """The explicit authkey, else COASTAL_VIDEO_BROKER_AUTHKEY (there is no default)"""
+    authkey = authkey or (BROKER_AUTHKEY.encode() if BROKER_AUTHKEY else None)
+    if not authkey:
+        raise RuntimeError("The video broker needs a shared secret: set COASTAL_VIDEO_BROKER_AUTHKEY or pass --authkey")
+    return authkey
+
+
+def connect_broker(address: str = None, authkey: bytes = None) -> VideoBroker:
+    manager = VideoBroker(address=parse_address(address or VIDEO_BROKER), authkey=broker_authkey(authkey))
+    manager.connect()
+    return manager
+
+
+def serve_broker(address: str, authkey: bytes = None):
+    """Run the broker (blocks)"""
+    manager = VideoBroker(address=parse_address(address), authkey=broker_authkey(authkey))
+    print(f"[video-broker] serving on {address}", flush=True)
+    manager.get_server().serve_forever()
+
+
+def run_worker(address: str, authkey: bytes = None):
+    """Pull segments from the broker and analyze them (blocks)"""
+    from backend.vision_video import analyze_segment
+
+    manager = connect_broker(address, authkey)
+    tasks = manager.task_queue()
+    print(f"[video-worker] {os.getpid()} connected to {address}", flush=True)
+
+    while True:
+        job_id, index, video_path, start_frame, end_frame, sample_fps, vision_options = tasks.get()
+        try:
+            result, error = analyze_segment(video_path, start_frame, end_frame, sample_fps, vision_options), None
+        except Exception as e:
+            result, error = None, str(e)
+        manager.put_result(job_id, (index, result, error))
+
+
+def _map_broker(video_path: str, segments, sample_fps: float = None, vision_options: dict = None) -> List[dict]:
+    manager = connect_broker()
+    job_id = uuid.uuid4().hex
+    results = manager.result_queue(job_id)
+    tasks = manager.task_queue()
+
+    for index, (start, end) in enumerate(segments):
+        tasks.put((job_id, index, os.path.abspath(video_path), start, end, sample_fps, vision_options))
+
+    outputs = [None] * len(segments)
+    try:
+        for _ in segments:
+            index, result, error = results.get(timeout=BROKER_RESULT_TIMEOUT)
+            if error:
+                raise RuntimeError(f"Segment {index} failed on worker: {error}")
+            outputs[index] = result
+    finally:
+        manager.drop_results(job_id)
+    return outputs
+
+
+# ----------------------------
+# Map-reduce entry point
+# ----------------------------
+
+def analyze_video_parallel(video_path: str, segment_seconds: float = SEGMENT_SECONDS,
+                           sample_fps: float = None, vision_options: dict = None) -> dict:
+    """
+    Analyze a video as parallel segments and merge the results
+
+    Args:
+        video_path: Path to the video (readable by every worker)
+        segment_seconds: Length of each segment
+        sample_fps: Frames analyzed per second (default VIDEO_SAMPLE_FPS)
+        vision_options: Extra analyze_image() arguments per frame
+
+    Returns:
+        Same structure as vision_video.analyze_video(), plus "parallel_analysis"
+    """
+
+    from backend.vision_video import VIDEO_SAMPLE_FPS, aggregate_video, merge_segments, video_info
+
+    start = time.perf_counter()
+    # Segments are planned with this process's sampling rate; workers on
+    # other nodes (or spawned with another environment) get it with each task
+    sample_fps = sample_fps or VIDEO_SAMPLE_FPS
+    info = video_info(video_path, sample_fps)
+    segments = plan_segments(info["frame_count"], info["fps"], segment_seconds, step=info["sample_step"])
+
+    if VIDEO_BROKER:
+        backend, outputs = "broker", _map_broker(video_path, segments, sample_fps, vision_options)
+    else:
+        backend, outputs = "process_pool", _map_pool(video_path, segments, sample_fps, vision_options)
+
+    result = aggregate_video(merge_segments(outputs))
+    result["parallel_analysis"] = {
+        "backend": backend,
+        "segments": len(segments),
+        "segment_seconds": segment_seconds,
+        "workers": None if VIDEO_BROKER else max(1, VIDEO_WORKERS),
+        "wall_time_s": round(time.perf_counter() - start, 2)
+    }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coastal AI video map-reduce broker / worker")
+    parser.add_argument("role", choices=["broker", "worker"])
+    parser.add_argument("--address", default=VIDEO_BROKER or "127.0.0.1:50000",
+                        help="host:port of the broker")
+    parser.add_argument("--authkey", default=None, help="Shared secret (required, or set COASTAL_VIDEO_BROKER_AUTHKEY)")
+    args = parser.parse_args(argv)
+
+    authkey = args.authkey.encode() if args.authkey else None
+    try:
+        authkey = broker_authkey(authkey)
+    except RuntimeError as e:
+        sys.exit(str(e))
+
+    if args.role == "broker":
+        serve_broker(args.address, authkey)
+    else:
+        run_worker(args.address, authkey)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,206 @@
+import itertools
+import os
+import threading
 from ultralytics import YOLO
 from transformers import CLIPProcessor, CLIPModel
-from PIL import Image
 import torch
+from torch.profiler import record_function
 import warnings
 
 # Suppress warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 
+from backend.ingest import load_image, bgr_view
+from backend.resources import scheduler
+from backend.embeddings import CLIP_MODEL_NAME
+
 # ----------------------------
 # Load models (once at startup)
 # ----------------------------
 
-yolo = YOLO("yolov8m.pt")
+# Thread budgets must be in place before torch starts its pools
+scheduler.apply_thread_budgets()
+
+# Checkpoints can be swapped for faster ones (see backend/evaluate.py)
+YOLO_MODEL_NAME = os.environ.get("COASTAL_YOLO_MODEL", "yolov8m.pt")
+
+YOLO_FALLBACK_MODEL_NAME = os.environ.get("COASTAL_YOLO_FALLBACK_MODEL", "yolov8n.pt")
+
+yolo = YOLO(YOLO_MODEL_NAME)
 
 clip_model = CLIPModel.from_pretrained(
-    "openai/clip-vit-large-patch14"
+    CLIP_MODEL_NAME
 )
 clip_processor = CLIPProcessor.from_pretrained(
-    "openai/clip-vit-large-patch14",
+    CLIP_MODEL_NAME,
     use_fast=True  # Suppress the slow processor warning
 )
 
+# Size of the image embeddings (768 for ViT-L/14, 512 for ViT-B)
+IMAGE_EMBEDDING_DIM = clip_model.config.projection_dim
+
 device = "cuda" if torch.cuda.is_available() else "cpu"
 clip_model = clip_model.to(device)
 
+# CLIP labels for sea waves + marine conditions
+LABELS = [
+    "calm sea",
+    "rough sea waves",
+    "stormy ocean",
+    "tsunami like waves",
+    "floating garbage in ocean",
+    "marine debris",
+    "ship at sea",
+    "normal ocean"
+]
+
+_label_embeddings = None
+
+# Smaller detector used under load (loaded on first use)
+_fallback_yolo = None
+_fallback_lock = threading.Lock()
+
+def get_fallback_yolo():
+    global _fallback_yolo
+    with _fallback_lock:
+        if _fallback_yolo is None:
+            _fallback_yolo = YOLO(YOLO_FALLBACK_MODEL_NAME)
+    return _fallback_yolo
+
+# ----------------------------
+# CLIP Embeddings
+# ----------------------------
+
+def encode_texts(texts):
+    """
+    texts: list of strings
+    returns: L2-normalized CLIP text embeddings as a (len(texts), dim) numpy array
+    """
+
+    inputs = clip_processor(
+        text=list(texts),
+        return_tensors="pt",
+        padding=True,
+        truncation=True
+    )
+    inputs = {k: v.to(device) for k, v in inputs.items()}
+
+    with torch.no_grad(), scheduler.inference_slot("clip_text"), record_function("clip_text_forward"):
+        text_embeds = clip_model.get_text_features(**inputs)
+
+    text_embeds = text_embeds / text_embeds.norm(dim=-1, keepdim=True)
+    return text_embeds.cpu().numpy()
+
+
+def get_label_embeddings():
+    """CLIP text embeddings of LABELS, computed once and kept on device"""
+    global _label_embeddings
+    if _label_embeddings is None:
+        _label_embeddings = torch.from_numpy(encode_texts(LABELS)).to(device)
+    return _label_embeddings
+
 # ----------------------------
 # Vision Analysis Function
 # ----------------------------
 
-def analyze_image(image_path: str):
+# Images per CLIP / YOLO forward pass in batched analysis
+VISION_BATCH_SIZE = int(os.environ.get("COASTAL_VISION_BATCH_SIZE", "16"))
+
+def analyze_image(image_path: str = None, return_embedding: bool = False, image: dict = None,
+                  skip_yolo_above: float = None, small_yolo: bool = False):
     """
     image_path: path to uploaded image
+    return_embedding: also return the normalized CLIP image embedding (numpy array)
+    image: already-decoded image from backend.ingest (the same buffer feeds YOLO and CLIP)
+    skip_yolo_above: skip YOLO when the CLIP label score reaches this and the
+        label alone decides the event type; used under load, see backend/qos.py
+    small_yolo: run the smaller fallback YOLO checkpoint (under load)
     returns: vision confidence, marine score, event type, detected objects, wave analysis
     """
 
-    # ---------- YOLO OBJECT DETECTION ----------
-    yolo_result = yolo(image_path)[0]
+    # Decode once, at the resolution the models need
+    if image is None:
+        image = load_image(image_path)
 
-    if yolo_result.boxes is not None and len(yolo_result.boxes) > 0:
-        vision_confidence = float(yolo_result.boxes.conf.mean())
-        detected_objects = [yolo.names[int(cls)] for cls in yolo_result.boxes.cls]
-    else:
-        vision_confidence = 0.0
-        detected_objects = []
+    return analyze_images([image], return_embedding, skip_yolo_above, small_yolo)[0]
 
-    # ---------- CLIP (SEA WAVES + MARINE CONDITIONS) ----------
-    image = Image.open(image_path).convert("RGB")
-
-    labels = [
-        "calm sea",
-        "rough sea waves",
-        "stormy ocean",
-        "tsunami like waves",
-        "floating garbage in ocean",
-        "marine debris",
-        "ship at sea",
-        "normal ocean"
-    ]
+def analyze_images(images, return_embedding: bool = False, skip_yolo_above: float = None,
+                   small_yolo: bool = False, batch_size: int = VISION_BATCH_SIZE) -> list:
+    """
+    Batched analyze_image() over already-decoded images
 
-    inputs = clip_processor(
-        text=labels,
-        images=image,
-        return_tensors="pt",
-        padding=True
-    )
+    CLIP and YOLO each run once per batch instead of once per image.
+    `images` may be any iterable (e.g. a generator decoding video frames);
+    it is consumed one batch at a time, so only one batch of pixels is held.
 
-    inputs = {k: v.to(device) for k, v in inputs.items()}
+    returns: list of analyze_image() results, in input order
+    """
+
+    images = iter(images)
+    results = []
+    while True:
+        batch = list(itertools.islice(images, batch_size))
+        if not batch:
+            return results
+        results.extend(_analyze_batch(batch, return_embedding, skip_yolo_above, small_yolo))
+
+def _analyze_batch(batch: list, return_embedding: bool, skip_yolo_above: float, small_yolo: bool) -> list:
+    # ---------- CLIP (SEA WAVES + MARINE CONDITIONS) ----------
+    # Only the image tower runs per call; label embeddings are cached
+    inputs = clip_processor(images=[image["rgb"] for image in batch], return_tensors="pt")
+    pixel_values = inputs["pixel_values"].to(device)
+
+    with torch.no_grad(), scheduler.inference_slot("clip_image"), record_function("clip_image_forward"):
+        image_embeds = clip_model.get_image_features(pixel_values=pixel_values)
+        image_embeds = image_embeds / image_embeds.norm(dim=-1, keepdim=True)
+        logits_per_image = clip_model.logit_scale.exp() * image_embeds @ get_label_embeddings().T
 
-    with torch.no_grad():
-        outputs = clip_model(**inputs)
+    probs = logits_per_image.softmax(dim=1)
+    marine_scores, label_indices = probs.max(dim=1)
+    marine_scores = marine_scores.tolist()
+    predicted_labels = [LABELS[index] for index in label_indices.tolist()]
 
-    probs = outputs.logits_per_image.softmax(dim=1)
-    marine_score = probs.max().item()
-    predicted_label = labels[probs.argmax().item()]
+    # ---------- YOLO OBJECT DETECTION ----------
+    # Only skippable when the CLIP label alone decides the event type below
+    # (detections can still turn "calm"/"normal" labels into "ship")
+    yolo_skipped = [
+        skip_yolo_above is not None and marine_score >= skip_yolo_above
+        and any(word in label for word in ["tsunami", "stormy", "garbage", "debris", "rough"])
+        for marine_score, label in zip(marine_scores, predicted_labels)
+    ]
+    detector = get_fallback_yolo() if small_yolo else yolo
+
+    yolo_results = [None] * len(batch)
+    detect = [i for i, skipped in enumerate(yolo_skipped) if not skipped]
+    if detect:
+        with scheduler.inference_slot("yolo"), record_function("yolo_forward"):
+            detections = detector([bgr_view(batch[i]) for i in detect], verbose=False)
+        for i, detection in zip(detect, detections):
+            yolo_results[i] = detection
+
+    embeddings = image_embeds.cpu().numpy() if return_embedding else None
+    results = []
+    for i in range(len(batch)):
+        result = _vision_result(predicted_labels[i], marine_scores[i], yolo_results[i], detector.names)
+
+        # Degradations under load (backend/qos.py)
+        if yolo_skipped[i]:
+            result["yolo_skipped"] = True
+        elif small_yolo:
+            result["yolo_model"] = YOLO_FALLBACK_MODEL_NAME
+
+        if return_embedding:
+            result["image_embedding"] = embeddings[i]
+        results.append(result)
+    return results
+
+def _vision_result(predicted_label: str, marine_score: float, yolo_result, names: dict) -> dict:
+    if yolo_result is not None and yolo_result.boxes is not None and len(yolo_result.boxes) > 0:
+        vision_confidence = float(yolo_result.boxes.conf.mean())
+        detected_objects = [names[int(cls)] for cls in yolo_result.boxes.cls]
+    else:
+        vision_confidence = 0.0
+        detected_objects = []
 
     # ---- EVENT TYPE LOGIC ----
     if "tsunami" in predicted_label or "stormy" in predicted_label:
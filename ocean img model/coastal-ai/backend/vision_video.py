@@ -1,54 +1,157 @@
-import cv2
-import tempfile
 import os
-import time
-from backend.vision import analyze_image
+import cv2
+from backend.vision import analyze_images
+from backend.ingest import from_bgr
+from backend.duplicate_index import perceptual_hash
 from backend.temporal_analysis import analyze_temporal_trends, assess_video_consistency
 
-def analyze_video(video_path: str):
+# Frames analyzed per second of video
+VIDEO_SAMPLE_FPS = float(os.environ.get("COASTAL_VIDEO_SAMPLE_FPS", "1.0"))
+
+def sample_step(fps: float, sample_fps: float = None) -> int:
+    """Analyze every Nth frame to get `sample_fps` samples per second"""
+    return max(1, int(fps / (sample_fps or VIDEO_SAMPLE_FPS)))
+
+def video_info(video_path: str, sample_fps: float = None) -> dict:
+    """Frame rate, (container-reported) frame count and sampling step of a video"""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+    return {"fps": fps, "frame_count": frame_count, "sample_step": sample_step(fps, sample_fps)}
+
+def iter_samples(video_path: str, samples: dict, start_frame: int = 0, end_frame: int = None,
+                 sample_fps: float = None):
     """
-    Analyze video by sampling frames and aggregating results with temporal analysis
-    video_path: path to uploaded video
-    returns: aggregated analysis results with temporal trends
+    Decode the sampled frames of one range of a video, one at a time
+
+    Frames are sampled on the global frame index (1 per second by default),
+    so segments that start on a multiple of the sampling step see exactly
+    the frames a sequential pass would.
+
+    Args:
+        video_path: path to the video
+        samples: dict from new_samples(); frame indices and pHash signatures
+            of the yielded frames, and the frame where decoding stopped, are
+            recorded in it
+        start_frame: first frame of the range (decoding seeks here)
+        end_frame: frame after the range (None = until the end of the video)
+        sample_fps: frames analyzed per second (default VIDEO_SAMPLE_FPS)
+
+    Yields:
+        Ingested frames (backend.ingest images), ready for analyze_images()
     """
     cap = cv2.VideoCapture(video_path)
-    frame_count = 0
-    scores = []
-    temp_files = []
     fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    step = sample_step(fps, sample_fps)
+    samples["fps"] = fps
+
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frame_count = start_frame
+
+    try:
+        while cap.isOpened() and (end_frame is None or frame_count < end_frame):
+            # Sample every `step` frames; skipped frames are grabbed but not decoded
+            if frame_count % step != 0:
+                if not cap.grab():
+                    break
+                frame_count += 1
+                continue
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            frame_index = frame_count
+            frame_count += 1
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Sample 1 frame per second
-        if frame_count % int(fps) == 0:
-            # Create temp file and close handle immediately (Windows fix)
-            tmp = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
-            tmp_path = tmp.name
-            tmp.close()  # Close file handle before cv2 uses it
-            
-            cv2.imwrite(tmp_path, frame)
-            
+            # Decoded frames go straight to the models (no temp JPEG round-trip)
             try:
-                result = analyze_image(tmp_path)
-                scores.append(result)
-                temp_files.append(tmp_path)
+                image = from_bgr(frame)
+                signature = perceptual_hash(image["rgb"])
             except Exception as e:
-                print(f"Error analyzing frame {frame_count}: {e}")
+                print(f"Error decoding frame {frame_index}: {e}")
+                continue
 
-        frame_count += 1
+            samples["signatures"].append(signature)
+            samples["frames"].append(frame_index)
+            yield image
+    finally:
+        cap.release()
+        samples["end_frame"] = frame_count
 
-    cap.release()
-    
-    # Clean up temp files AFTER processing (Windows-safe)
-    for temp_file in temp_files:
-        try:
-            time.sleep(0.01)  # Brief delay for Windows file handles
-            os.remove(temp_file)
-        except PermissionError:
-            pass  # Ignore if still locked
+def new_samples(start_frame: int = 0) -> dict:
+    """Empty sample record for iter_samples()"""
+    return {"start_frame": start_frame, "end_frame": start_frame, "fps": 30, "signatures": [], "frames": []}
+
+def segment_result(samples: dict, results: list) -> dict:
+    """
+    Combine the sample record of a range with the analyze_images() results of its frames
+
+    Returns:
+        Per-sample results, CLIP embeddings, pHash signatures and frame indices,
+        plus the frame index where decoding stopped
+    """
+    return {
+        "start_frame": samples["start_frame"],
+        "end_frame": samples["end_frame"],
+        "fps": samples["fps"],
+        "results": results,
+        "embeddings": [result.pop("image_embedding") for result in results],
+        "signatures": samples["signatures"],
+        "frames": samples["frames"]
+    }
+
+def analyze_segment(video_path: str, start_frame: int = 0, end_frame: int = None,
+                    sample_fps: float = None, vision_options: dict = None) -> dict:
+    """
+    Analyze the sampled frames of one range of a video
+
+    Sampled frames go through analyze_images() in batches as they are decoded.
+
+    Args:
+        video_path: path to the video
+        start_frame: first frame of the segment (decoding seeks here)
+        end_frame: frame after the segment (None = until the end of the video)
+        sample_fps: frames analyzed per second (default VIDEO_SAMPLE_FPS)
+        vision_options: extra analyze_image() arguments (e.g. load degradations)
+
+    Returns:
+        See segment_result()
+    """
+    samples = new_samples(start_frame)
+    frames = iter_samples(video_path, samples, start_frame, end_frame, sample_fps)
+    results = analyze_images(frames, return_embedding=True, **(vision_options or {}))
+    return segment_result(samples, results)
+
+def merge_segments(segments: list) -> dict:
+    """Concatenate segment outputs in frame order (the result of one sequential pass)"""
+    segments = sorted(segments, key=lambda s: s["start_frame"])
+    merged = {
+        "start_frame": segments[0]["start_frame"] if segments else 0,
+        "end_frame": max((s["end_frame"] for s in segments), default=0),
+        "fps": segments[0]["fps"] if segments else 30,
+        "results": [],
+        "embeddings": [],
+        "signatures": [],
+        "frames": []
+    }
+    for segment in segments:
+        for key in ["results", "embeddings", "signatures", "frames"]:
+            merged[key].extend(segment[key])
+    return merged
+
+def aggregate_video(frames: dict) -> dict:
+    """
+    Aggregate per-sample frame results into the video-level vision result
+
+    frames: output of analyze_segment() or merge_segments()
+    returns: aggregated analysis results with temporal trends
+    """
+    scores = frames["results"]
+    frame_count = frames["end_frame"]
+    fps = frames["fps"]
 
     if not scores:
         return {
@@ -75,10 +178,13 @@ def analyze_video(video_path: str):
     # Get most common wave label
     wave_labels = [r.get("wave_label", "normal ocean") for r in scores]
     final_wave_label = max(set(wave_labels), key=wave_labels.count)
-    
+
     # === NEW: Temporal Analysis ===
     temporal_analysis = analyze_temporal_trends(scores)
-    consistency_check = assess_video_consistency(scores)
+    consistency_check = assess_video_consistency(
+        scores, embeddings=frames["embeddings"], signatures=frames["signatures"],
+        frame_indices=frames["frames"]
+    )
 
     return {
         "clip_score": round(avg_clip_score, 2),
@@ -88,6 +194,7 @@ def analyze_video(video_path: str):
         "detected_objects": unique_objects,
         "wave_label": final_wave_label,
         "frames_analyzed": len(scores),
+        "yolo_skipped_frames": sum(1 for r in scores if r.get("yolo_skipped")),
         "is_video": True,
         # Temporal intelligence
         "temporal_analysis": temporal_analysis,
@@ -98,3 +205,27 @@ def analyze_video(video_path: str):
             "duration_seconds": round(frame_count / fps, 1)
         }
     }
+
+def analyze_video(video_path: str, parallel: bool = None, sample_fps: float = None,
+                  vision_options: dict = None):
+    """
+    Analyze video by sampling frames and aggregating results with temporal analysis
+    video_path: path to uploaded video
+    parallel: split into segments analyzed by worker processes (see
+        backend.video_mapreduce); None = automatic for long videos when
+        a worker pool or broker is configured
+    sample_fps: frames analyzed per second (default VIDEO_SAMPLE_FPS)
+    vision_options: extra analyze_image() arguments per frame
+    returns: aggregated analysis results with temporal trends
+    """
+    from backend import video_mapreduce
+
+    if parallel is None:
+        parallel = video_mapreduce.should_parallelize(video_path)
+
+    if parallel:
+        return video_mapreduce.analyze_video_parallel(
+            video_path, sample_fps=sample_fps, vision_options=vision_options
+        )
+
+    return aggregate_video(analyze_segment(video_path, sample_fps=sample_fps, vision_options=vision_options))
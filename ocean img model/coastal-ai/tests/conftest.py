@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the service modules as `backend.*`, like the server does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
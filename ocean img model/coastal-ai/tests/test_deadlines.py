@@ -0,0 +1,94 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend import deadlines
+from backend.deadlines import StageRunner, deadline_for, missing_stage
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        yield pool
+
+
+def slow(value, seconds):
+    time.sleep(seconds)
+    return value
+
+
+def fail():
+    raise ValueError("stage failed")
+
+
+def test_without_deadline_stages_run_inline():
+    stages = StageRunner()
+    stages.submit("vision", threading.get_ident)
+    stages.submit("social", fail)
+
+    assert stages.result("vision") == threading.get_ident()
+    with pytest.raises(ValueError):
+        stages.result("social")
+    assert stages.missed == [] and stages.report()["deadline_ms"] is None
+
+
+def test_stage_over_budget_is_missed_and_settles_later(executor):
+    stages = StageRunner(1.0, executor, budgets={"fast": 0.5, "slow": 0.1})
+    stages.submit("fast", slow, "fast", 0.0)
+    stages.submit("slow", slow, "slow", 0.4)
+
+    assert stages.result("fast") == "fast"
+    assert stages.result("slow") is None
+    assert stages.missed == ["slow"]
+
+    report = stages.report()
+    assert report["deadline_ms"] == 1000 and report["missed"] == ["slow"]
+    assert report["stages_ms"]["slow"] is None and report["stages_ms"]["fast"] is not None
+
+    settled = []
+    done = threading.Event()
+    stages.when_settled(lambda late: (settled.append(late), done.set()))
+    assert done.wait(2)
+    assert settled == [{"slow": "slow"}]
+
+
+def test_late_exception_is_passed_to_the_callback(executor):
+    stages = StageRunner(1.0, executor, budgets={"vision": 0.05})
+    stages.submit("vision", lambda: (time.sleep(0.2), fail()))
+    assert stages.result("vision") is None
+
+    done = threading.Event()
+    late = {}
+    stages.when_settled(lambda outcome: (late.update(outcome), done.set()))
+    assert done.wait(2)
+    assert isinstance(late["vision"], ValueError)
+
+
+def test_deadline_counts_from_request_arrival(executor):
+    # Most of the deadline went to queueing and decoding before the first stage
+    started = time.perf_counter() - 0.9
+    stages = StageRunner(1.0, executor, started=started)
+    stages.submit("vision", slow, "vision", 0.3)
+
+    waited = time.perf_counter()
+    assert stages.result("vision") is None
+    assert time.perf_counter() - waited < 0.2
+    assert stages.report()["elapsed_ms"] >= 900
+
+
+def test_no_wait_takes_only_finished_results(executor):
+    stages = StageRunner(5.0, executor)
+    stages.submit("satellite", slow, "sar", 0.3)
+    assert stages.result("satellite", wait=False) is None
+    assert stages.missed == ["satellite"]
+
+
+def test_deadline_for(monkeypatch):
+    monkeypatch.setitem(deadlines.DEADLINE_MS, "video", 0.0)
+    assert deadline_for("video") is None
+    assert deadline_for("image") == deadlines.DEADLINE_MS["image"] / 1000
+    assert missing_stage("satellite", "deferred", reason="load") == {
+        "status": "deferred", "stage": "satellite", "reason": "load"
+    }
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+
+from backend.duplicate_index import DuplicateIndex, summarize_matches
+
+
+def unit(rng, dim):
+    vector = rng.normal(size=dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_lookup_by_hash_and_embedding():
+    rng = np.random.default_rng(0)
+    index = DuplicateIndex(embedding_dim=16)
+    embeddings = [unit(rng, 16) for _ in range(50)]
+    for i, embedding in enumerate(embeddings):
+        index.add(f"r{i}", int(rng.integers(0, 2**63)), embedding, {"event_type": "normal"})
+
+    # Same embedding, unrelated hash
+    matches = index.find_near_duplicates(12345, embeddings[7])
+    assert matches[0]["report_id"] == "r7"
+    assert matches[0]["cosine_similarity"] == 1.0
+
+    # Hash within a few bits, no embedding
+    phash = int(index._hashes[3]) ^ 0b101
+    matches = index.find_near_duplicates(phash)
+    assert [m["report_id"] for m in matches] == ["r3"]
+    assert matches[0]["hamming_distance"] == 2
+    assert index.reusable_result(matches)["vision_result"] == {"event_type": "normal"}
+
+
+def test_partial_append_is_repaired_on_load(tmp_path):
+    storage = str(tmp_path)
+    index = DuplicateIndex(embedding_dim=4, storage_dir=storage)
+    for i in range(3):
+        index.add(f"r{i}", i + 1, np.eye(4, dtype=np.float32)[i])
+
+    # A crash after the hash / embedding records but before the entry line
+    with open(os.path.join(storage, "hashes.u64"), "ab") as f:
+        f.write(np.array([99], dtype=np.uint64).tobytes())
+    with open(os.path.join(storage, "embeddings.f32"), "ab") as f:
+        f.write(np.ones(2, dtype=np.float32).tobytes())
+    with open(os.path.join(storage, "entries.jsonl"), "a") as f:
+        f.write('{"report_id": "torn"')
+
+    reloaded = DuplicateIndex(embedding_dim=4, storage_dir=storage)
+    assert len(reloaded) == 3
+    assert os.path.getsize(os.path.join(storage, "hashes.u64")) == 3 * 8
+    assert os.path.getsize(os.path.join(storage, "embeddings.f32")) == 3 * 4 * 4
+
+    # The next append lines up with its entry again
+    reloaded.add("r3", 1234, np.full(4, 0.5, dtype=np.float32))
+    again = DuplicateIndex(embedding_dim=4, storage_dir=storage)
+    assert len(again) == 4
+    assert again.find_near_duplicates(1234)[0]["report_id"] == "r3"
+    assert again.embedding_of(3).tolist() == [0.5, 0.5, 0.5, 0.5]
+
+
+def test_workers_see_each_others_appends(tmp_path):
+    # Two instances on one storage directory stand in for two forked workers
+    first = DuplicateIndex(embedding_dim=4, storage_dir=str(tmp_path))
+    second = DuplicateIndex(embedding_dim=4, storage_dir=str(tmp_path))
+
+    first.add("a", 0xFFFF, np.array([1, 0, 0, 0], dtype=np.float32), {"event_type": "ship"})
+    assert [m["report_id"] for m in second.find_near_duplicates(0xFFFF)] == ["a"]
+
+    second.add("b", 0xFFFF0000, np.array([0, 1, 0, 0], dtype=np.float32))
+    first.add("c", 0xFF00FF00, np.array([0, 0, 1, 0], dtype=np.float32))
+
+    # Both keep the file order, so indexes agree across workers
+    for index in (first, second):
+        index.find_near_duplicates(0)
+        assert [e["report_id"] for e in index._entries] == ["a", "b", "c"]
+    assert len(DuplicateIndex(embedding_dim=4, storage_dir=str(tmp_path))) == 3
+
+
+def test_reuse_can_be_switched_off(monkeypatch):
+    from backend import duplicate_index
+
+    index = DuplicateIndex(embedding_dim=4)
+    index.add("a", 42, None, {"event_type": "ship"})
+    matches = index.find_near_duplicates(42)
+    assert index.reusable_result(matches) is not None
+
+    monkeypatch.setattr(duplicate_index, "REUSE_RESULTS", False)
+    assert index.reusable_result(matches) is None
+    assert summarize_matches(matches)["is_near_duplicate"]
+
+
+def test_stored_embeddings_are_memory_mapped(tmp_path):
+    rng = np.random.default_rng(1)
+    first = DuplicateIndex(embedding_dim=8, storage_dir=str(tmp_path))
+    second = DuplicateIndex(embedding_dim=8, storage_dir=str(tmp_path))
+    embeddings = [unit(rng, 8) for _ in range(1500)]  # past the initial capacity of 1024
+    for i, embedding in enumerate(embeddings):
+        (first if i % 2 else second).add(f"r{i}", int(rng.integers(0, 2**63)), embedding)
+
+    for index in (first, second):
+        matches = index.find_near_duplicates(0, embeddings[1234])
+        assert matches[0]["report_id"] == "r1234"
+        assert isinstance(index._embeddings, np.memmap)
+        assert index._embeddings.filename == os.path.join(str(tmp_path), "embeddings.f32")
+        assert len(index._embeddings) == 1500
+    assert np.allclose(first.embedding_of(1499), embeddings[1499])
@@ -0,0 +1,26 @@
+import numpy as np
+
+from backend.embeddings import SHARED_SIMILARITY_FLOOR, calibrate_similarity
+
+
+def test_sentence_transformer_scores_are_unchanged():
+    similarities = np.array([0.1, 0.55, 0.61, 0.9], dtype=np.float32)
+    assert calibrate_similarity(similarities, shared=False) is similarities
+    assert calibrate_similarity(0.61, shared=False) == 0.61
+
+
+def test_clip_scores_are_rescaled_to_the_thresholds():
+    floor = SHARED_SIMILARITY_FLOOR
+    calibrated = calibrate_similarity(np.array([0.0, floor, 1.0]), shared=True)
+    assert calibrated.tolist() == [0.0, 0.0, 1.0]
+
+    # Unrelated sentences sit around the floor in CLIP text space and must
+    # stay below the social ("verified" > 0.6) and partial-match (> 0.5) cuts
+    assert calibrate_similarity(floor + 0.1, shared=True) < 0.5
+    # Close paraphrases still pass them
+    assert calibrate_similarity(0.95, shared=True) > 0.6
+
+    # Rescaling keeps the order, so the best-matching event does not change
+    raw = np.random.default_rng(0).uniform(0.3, 1.0, size=100)
+    calibrated = calibrate_similarity(raw, shared=True)
+    assert np.all(np.diff(calibrated[np.argsort(raw)]) >= 0)
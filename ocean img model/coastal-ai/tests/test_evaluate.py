@@ -0,0 +1,40 @@
+import json
+import random
+import sys
+import types
+
+from backend import evaluate
+
+
+def fake_pipeline():
+    """Stands in for backend.main: the score depends on `random` like satellite_check()"""
+
+    def process_report(path, text, latitude=None, longitude=None):
+        score = round(random.uniform(0.0, 1.0), 6)
+        return {"vision_ai": {"event_type": "rough_sea"},
+                "final_decision": {"final_score": score, "confidence": score, "alert_level": "low"}}
+
+    return types.SimpleNamespace(process_report=process_report)
+
+
+def run(tmp_path, monkeypatch, manifest, name, draws_before=0):
+    monkeypatch.setitem(sys.modules, "backend.main", fake_pipeline())
+    monkeypatch.setattr(sys.modules["backend"], "main", sys.modules["backend.main"], raising=False)
+    for _ in range(draws_before):
+        random.random()
+    output = tmp_path / f"{name}.json"
+    evaluate.run_items(str(manifest), str(output), warmup=False)
+    return [item["outcome"]["final_score"] for item in json.loads(output.read_text())["items"]]
+
+
+def test_every_configuration_sees_the_same_random_draws(tmp_path, monkeypatch):
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text("\n".join(
+        json.dumps({"id": f"item-{i}", "file": f"media/{i}.jpg"}) for i in range(5)
+    ))
+
+    first = run(tmp_path, monkeypatch, manifest, "a")
+    # A configuration that consumed other draws first (e.g. during warm-up)
+    second = run(tmp_path, monkeypatch, manifest, "b", draws_before=17)
+    assert first == second
+    assert len(set(first)) == 5
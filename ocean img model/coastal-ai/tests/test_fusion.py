@@ -0,0 +1,161 @@
+import numpy as np
+import pytest
+
+from backend.fusion import (
+    MIN_ITEM_WEIGHT, _round2, final_decision, fuse_batch, fuse_media_items, rows_to_signals, signal_row
+)
+
+
+def scalar_final_decision(vision, satellite, social, text_understanding=None, quality_score=None):
+    """The per-report fusion formula fuse_batch() replaced (plus the quality penalty from main)"""
+
+    clip_score = vision.get("clip_score", 0) or vision.get("average_clip_score", 0) or vision.get("marine_score", 0)
+    score = (
+        0.35 * clip_score +
+        0.25 * satellite.get("satellite_confidence", 0.5) +
+        0.15 * social.get("social_confidence", 0.5)
+    )
+
+    if text_understanding:
+        score += 0.15 * text_understanding.get("text_confidence", 0.5)
+        if text_understanding.get("consistency") == "MISMATCH":
+            score -= 0.15
+        elif text_understanding.get("consistency") == "STRONG_MATCH":
+            score += 0.10
+        if text_understanding.get("uncertainty", 0.0) > 0.5:
+            score *= 0.9
+    else:
+        score *= 0.95
+
+    score = round(max(0.0, min(1.0, score)), 2)
+    if score > 0.75:
+        alert_level = "high"
+    elif score > 0.55:
+        alert_level = "medium"
+    elif score > 0.35:
+        alert_level = "low"
+    else:
+        alert_level = "minimal"
+
+    confidence = score
+    if quality_score is not None and quality_score < 0.5:
+        confidence = confidence * 0.85
+    return {"final_score": score, "confidence": confidence, "alert_level": alert_level}
+
+
+def random_reports(n, seed=0):
+    """Reports with signals on a coarse grid, so rounding ties and threshold hits are frequent"""
+    rng = np.random.default_rng(seed)
+    grid = lambda: round(float(rng.integers(0, 21)) * 0.05, 2)
+    consistencies = ["MISMATCH", "STRONG_MATCH", "MATCH", "PARTIAL_MATCH", "UNCERTAIN", "NO_TEXT"]
+
+    for _ in range(n):
+        text = None
+        if rng.random() < 0.8:
+            text = {
+                "text_confidence": grid(),
+                "consistency": consistencies[rng.integers(len(consistencies))],
+                "consistency_score": grid(),
+                "uncertainty": grid(),
+            }
+        quality = None if rng.random() < 0.2 else grid()
+        yield {"clip_score": grid()}, {"satellite_confidence": grid()}, {"social_confidence": grid()}, text, quality
+
+
+def test_final_decision_matches_scalar_formula():
+    for vision, satellite, social, text, quality in random_reports(20000):
+        expected = scalar_final_decision(vision, satellite, social, text, quality)
+        result = final_decision(vision, satellite, social, text, quality)
+        assert result["final_score"] == expected["final_score"]
+        assert result["confidence"] == expected["confidence"]
+        assert result["alert_level"] == expected["alert_level"]
+        assert "missing_signals" not in result
+
+
+def test_fuse_batch_matches_scalar_formula():
+    reports = list(random_reports(20000, seed=1))
+    fused = fuse_batch(rows_to_signals([signal_row(*report) for report in reports]))
+
+    expected = [scalar_final_decision(*report) for report in reports]
+    assert fused["final_score"].tolist() == [e["final_score"] for e in expected]
+    assert fused["alert_level"].tolist() == [e["alert_level"] for e in expected]
+    assert np.all(fused["coverage"] == 1.0)
+
+
+def test_rounding_follows_python_round():
+    # 0.35 * 0.5 + 0.25 * 0.2 + 0.15 * 0.0 = 0.225 -> 0.23 (np.round gives 0.22)
+    fused = fuse_batch({"clip_score": [0.5], "satellite": [0.2], "social": [0.0], "has_text": [True],
+                        "text_confidence": [0.0]})
+    assert fused["final_score"][0] == round(0.35 * 0.5 + 0.25 * 0.2, 2)
+
+
+def test_rounding_matches_round_on_ties():
+    values = np.concatenate([np.arange(0, 100001) / 100000, np.random.default_rng(0).random(10000)])
+    assert _round2(values).tolist() == [round(value, 2) for value in values.tolist()]
+
+
+def test_missing_signals_are_renormalized():
+    vision, social = {"clip_score": 0.8}, {"social_confidence": 0.7}
+    text = {"text_confidence": 0.8, "consistency": "MATCH", "consistency_score": 0.7, "uncertainty": 0.1}
+
+    result = final_decision(vision, {"status": "timeout", "stage": "satellite"}, social, text)
+    available = 0.35 * 0.8 + 0.15 * 0.7 + 0.15 * 0.8
+    assert result["final_score"] == round(available * 0.9 / 0.65, 2)
+    assert result["missing_signals"] == ["satellite"]
+    assert result["signal_coverage"] == pytest.approx(0.72, abs=0.01)
+
+
+def test_missing_signals_can_fall_back_to_defaults():
+    signals = {"clip_score": [0.8], "satellite": [np.nan], "social": [0.7], "has_text": [False]}
+    fused = fuse_batch(signals, renormalize=False)
+    assert fused["final_score"][0] == round((0.35 * 0.8 + 0.25 * 0.5 + 0.15 * 0.7) * 0.95, 2)
+
+
+def item(event_type, clip_score, vision_confidence=0.5, objects=(), label="calm sea"):
+    return {"event_type": event_type, "clip_score": clip_score, "vision_confidence": vision_confidence,
+            "detected_objects": list(objects), "wave_label": label}
+
+
+def test_single_media_item_fuses_like_the_item():
+    vision = item("rough_sea", 0.83, 0.41, ["boat"], "rough sea waves")
+    fused = fuse_media_items([vision], [0.7])
+
+    assert fused["event_type"] == "rough_sea" and fused["clip_score"] == 0.83
+    assert fused["agreement"] == 1.0 and fused["evidence_quality"] == 0.7 and fused["best_item"] == 0
+    signals = {"satellite": {"satellite_confidence": 0.6}, "social": {"social_confidence": 0.4}}
+    assert final_decision(fused, **signals) == final_decision(vision, **signals)
+
+
+def test_sharp_items_outweigh_blurry_ones():
+    visions = [item("abnormal_wave", 0.9, label="stormy ocean"), item("normal", 0.6), item("normal", 0.5)]
+
+    # Equal quality: two "normal" items outvote one confident wave (1.1 vs 0.9)
+    assert fuse_media_items(visions)["event_type"] == "normal"
+
+    fused = fuse_media_items(visions, [0.9, 0.3, 0.1])
+    assert fused["event_type"] == "abnormal_wave" and fused["wave_label"] == "stormy ocean"
+    assert fused["clip_score"] == 0.9 and fused["evidence_quality"] == 0.9
+    # Votes: 0.81 for the wave, 0.3 * 0.6 + MIN_ITEM_WEIGHT * 0.5 for "normal"
+    assert fused["agreement"] == round(0.81 / (0.81 + 0.18 + MIN_ITEM_WEIGHT * 0.5), 2)
+    assert [entry["supports_event"] for entry in fused["items"]] == [True, False, False]
+
+
+def test_clip_score_is_quality_weighted_over_supporting_items():
+    fused = fuse_media_items(
+        [item("marine_garbage", 0.9, 0.8, ["bottle"]), item("marine_garbage", 0.5, 0.2, ["bottle", "bag"])],
+        [1.0, 0.5]
+    )
+    assert fused["clip_score"] == round((0.9 + 0.5 * 0.5) / 1.5, 2)
+    assert fused["vision_confidence"] == round((0.8 + 0.5 * 0.2) / 1.5, 2)
+    assert fused["detected_objects"] == ["bottle", "bag"]
+    assert fused["best_item"] == 0
+
+
+def test_failed_items_are_ignored():
+    fused = fuse_media_items([{"error": "unreadable"}, item("ship", 0.7)], [None, None])
+    assert fused["event_type"] == "ship" and fused["media_items"] == 2 and fused["best_item"] == 1
+    assert fused["evidence_quality"] is None
+    assert fused["items"][0]["error"] == "unreadable"
+
+    fused = fuse_media_items([{"error": "unreadable"}])
+    assert fused["event_type"] == "unknown" and "error" in fused
@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+import pytest
+
+from backend.image_quality import assess_image_quality
+from backend.ingest import load_image
+
+
+@pytest.fixture
+def large_photo(tmp_path):
+    """Textured 3000x2000 JPEG, large enough for a draft (reduced) decode"""
+    rng = np.random.default_rng(0)
+    texture = cv2.resize(rng.integers(0, 256, (250, 375), dtype=np.uint8), (3000, 2000), interpolation=cv2.INTER_CUBIC)
+    noise = rng.normal(0, 6, texture.shape)
+    gray = np.clip(texture * 0.6 + 60 + noise, 0, 255).astype(np.uint8)
+    path = str(tmp_path / "photo.jpg")
+    cv2.imwrite(path, cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR), [cv2.IMWRITE_JPEG_QUALITY, 95])
+    return path
+
+
+def test_quality_does_not_depend_on_decode_resolution(large_photo):
+    image = load_image(large_photo)
+    assert image["decoded_size"][0] < 3000
+
+    full = assess_image_quality(large_photo)
+    draft = assess_image_quality(image=image)
+
+    assert draft["resolution"] == full["resolution"] == "3000x2000"
+    for metric in ("sharpness", "noise", "contrast", "brightness"):
+        assert draft["metrics"][metric] == pytest.approx(full["metrics"][metric], abs=0.05)
+    assert draft["quality_score"] == pytest.approx(full["quality_score"], abs=0.03)
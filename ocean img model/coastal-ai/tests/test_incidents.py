@@ -0,0 +1,90 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.incidents import INCIDENT_RADIUS_KM, IncidentEngine, _project
+
+START = datetime(2026, 3, 1, 6, 0, tzinfo=timezone.utc)
+
+
+def at(minutes: float) -> str:
+    return (START + timedelta(minutes=minutes)).isoformat()
+
+
+def decision(confidence: float) -> dict:
+    return {"final_score": confidence, "confidence": confidence}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return IncidentEngine(str(tmp_path / "rollups.db"))
+
+
+def test_nearby_reports_share_one_incident_and_one_alert(engine):
+    first = engine.add_report("r1", "abnormal_wave", decision(0.6), 13.0, 80.3, at(0))
+    assert first["new_incident"] and first["alert"]["alert_level"] == "medium"
+
+    second = engine.add_report("r2", "rough_sea", decision(0.6), 13.002, 80.301, at(5))
+    assert second["incident_id"] == first["incident_id"]
+    assert second["alert"] is None and second["coalesced"]
+
+    # Corroboration escalates the incident, which alerts again
+    for i in range(3, 8):
+        result = engine.add_report(f"r{i}", "abnormal_wave", decision(0.7), 13.001, 80.302, at(5 + i))
+    assert result["alert_level"] == "high"
+    alerts = engine.recent_alerts()
+    assert [a["alert_level"] for a in alerts] == ["high", "medium"]
+    assert alerts[0]["escalation"]
+
+    # A different event family at the same spot is its own incident
+    other = engine.add_report("g1", "marine_garbage", decision(0.6), 13.0, 80.3, at(20))
+    assert other["incident_id"] != first["incident_id"]
+
+    stats = engine.stats()
+    assert stats["open_incidents"] == 2 and stats["reports_clustered"] == 8 and stats["alerts_emitted"] == 3
+
+
+def test_incidents_do_not_chain_along_the_coast(engine):
+    # Reports 0.8 km apart in a line: each is close to the previous one
+    step_deg = 0.8 / 111.32 / math.cos(math.radians(13.0))
+    members = {}
+    for i in range(40):
+        lon = 80.0 + i * step_deg
+        result = engine.add_report(f"r{i}", "abnormal_wave", decision(0.5), 13.0, lon, at(i))
+        members.setdefault(result["incident_id"], []).append(_project(13.0, lon))
+
+    assert len(members) > 5
+    for incident in engine.open_incidents():
+        centroid = _project(incident["centroid"]["lat"], incident["centroid"]["lon"])
+        for x, y in members[incident["incident_id"]]:
+            assert math.hypot(x - centroid[0], y - centroid[1]) <= INCIDENT_RADIUS_KM + 1e-3
+
+
+def test_workers_share_incidents_and_alert_once(tmp_path):
+    db_path = str(tmp_path / "rollups.db")
+    worker, other_worker = IncidentEngine(db_path), IncidentEngine(db_path)
+
+    first = worker.add_report("r1", "ship", decision(0.6), 13.0, 80.3, at(0))
+    second = other_worker.add_report("r2", "ship", decision(0.6), 13.001, 80.3, at(1))
+
+    assert second["incident_id"] == first["incident_id"]
+    assert second["reports"] == 2 and second["alert"] is None
+    assert len(worker.recent_alerts()) == 1
+    assert worker.get(first["incident_id"])["reports"] == 2
+
+
+def test_quiet_incidents_close(engine):
+    first = engine.add_report("r1", "ship", decision(0.6), 13.0, 80.3, at(0))
+    later = engine.add_report("r2", "ship", decision(0.6), 13.0, 80.3, at(120))
+
+    assert later["new_incident"]
+    assert [i["incident_id"] for i in engine.open_incidents()] == [later["incident_id"]]
+    # Closed incidents stay retrievable
+    assert engine.get(first["incident_id"])["reports"] == 1
+    assert engine.get("INC-999999") is None and engine.get("nonsense") is None
+
+
+def test_reports_without_location_or_incident_type_are_skipped(engine):
+    assert engine.add_report("r1", "abnormal_wave", decision(0.9)) is None
+    assert engine.add_report("r2", "normal", decision(0.9), 13.0, 80.3) is None
@@ -0,0 +1,41 @@
+import json
+import os
+from datetime import datetime
+
+from backend import loadtest
+
+
+def test_started_server_uses_scratch_data_and_no_reuse(tmp_path, monkeypatch):
+    calls = {}
+
+    class Server:
+        pid = None
+
+    def start_server(port, prefork_workers=0, env=None):
+        calls["env"] = dict(env)
+        assert os.path.isdir(env["COASTAL_DATA_DIR"])
+        return Server()
+
+    def run_step(url, concurrency, seconds, *args, **kwargs):
+        calls.setdefault("step_times", []).append(datetime.now())
+        return loadtest.summarize_step(concurrency, 1.0, [("image", 0.1, True, None)], {})
+
+    monkeypatch.setattr(loadtest, "generate_media", lambda *args: {"image": [], "video": []})
+    monkeypatch.setattr(loadtest, "start_server", start_server)
+    monkeypatch.setattr(loadtest, "wait_for_server", lambda url, proc=None: None)
+    monkeypatch.setattr(loadtest, "stop_server", lambda proc: None)
+    monkeypatch.setattr(loadtest, "run_step", run_step)
+
+    output = str(tmp_path / "results.json")
+    loadtest.main(["--concurrency", "1,2", "--warmup-seconds", "0", "--output", output])
+
+    env = calls["env"]
+    assert env["COASTAL_DUPLICATE_REUSE"] == "0"
+    assert not env["COASTAL_DATA_DIR"].startswith(loadtest.BASE_DIR)
+    assert not os.path.exists(env["COASTAL_DATA_DIR"])
+
+    with open(output, encoding="utf-8") as f:
+        results = json.load(f)
+    assert datetime.fromisoformat(results["started"]) <= calls["step_times"][0].replace(microsecond=0)
+    assert results["duplicate_reuse"] is False
+    assert [step["concurrency"] for step in results["steps"]] == [1, 2]
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from backend import profiling
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profiling(**env):
+    env = {k: v for k, v in os.environ.items() if not k.startswith("COASTAL_")} | env
+    return subprocess.run([sys.executable, "-c", "import backend.profiling"], cwd=BASE_DIR, env=env,
+                          capture_output=True, text=True)
+
+
+def test_profiling_requires_an_admin_token():
+    result = import_profiling(COASTAL_PROFILING="1")
+    assert result.returncode != 0
+    assert "COASTAL_ADMIN_TOKEN" in result.stderr
+    assert import_profiling(COASTAL_PROFILING="1", COASTAL_ADMIN_TOKEN="secret").returncode == 0
+    assert import_profiling().returncode == 0
+
+
+def test_authorized_needs_the_matching_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    assert profiling.authorized("secret")
+    assert not profiling.authorized("wrong")
+    assert not profiling.authorized(None)
+
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", False)
+    assert not profiling.authorized("secret")
+
+
+def test_profiled_requests_run_one_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    spans = []
+
+    def profiled(profile_id):
+        with profiling.profile_request(profile_id, mode="sampling", torch_trace=False):
+            start = time.perf_counter()
+            time.sleep(0.05)
+            spans.append((start, time.perf_counter()))
+
+    threads = [threading.Thread(target=profiled, args=(f"r{i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    spans.sort()
+    assert all(end <= next_start for (_, end), (next_start, _) in zip(spans, spans[1:]))
+    assert sorted(os.listdir(tmp_path)) == ["r0", "r1", "r2"]
+
+
+def test_busy_profiler_does_not_make_requests_wait(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+
+    with profiling.profile_request("first", mode="sampling", torch_trace=False) as first:
+        with profiling.profile_request("second", mode="sampling", torch_trace=False, wait=False) as second:
+            assert second is None
+        assert first is not None
+
+    with profiling.profile_request("third", mode="sampling", torch_trace=False, wait=False) as third:
+        assert third is not None
+    assert sorted(os.listdir(tmp_path)) == ["first", "third"]
+
+
+def test_profiles_are_written_under_the_data_dir(tmp_path):
+    env = {k: v for k, v in os.environ.items() if not k.startswith("COASTAL_")}
+    env["COASTAL_DATA_DIR"] = str(tmp_path)
+    result = subprocess.run([sys.executable, "-c", "import backend.profiling as p; print(p.PROFILE_DIR)"],
+                            cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    assert result.stdout.strip() == os.path.join(str(tmp_path), "profiles")
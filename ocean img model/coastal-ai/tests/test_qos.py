@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+
+from backend import qos
+from backend.qos import DEGRADATION_STEPS, DeferredResults, QoSController, vision_degradations
+
+
+def test_level_follows_predicted_latency_pressure():
+    controller = QoSController(executor_threads=2, enabled=True)
+    slo = qos.SLO_MS["image"] / 1000
+
+    assert controller.plan("image", wait_s=0.1 * slo)["level"] == 0
+
+    plan = controller.plan("image", wait_s=0.8 * slo)
+    assert plan["level"] == 2 and plan["steps"] == DEGRADATION_STEPS[:2]
+    assert plan["vision_options"] == {"skip_yolo_above": qos.CLIP_CONFIDENT_SCORE, "small_yolo": False}
+    assert plan["video_sample_fps"] == qos.REDUCED_VIDEO_SAMPLE_FPS
+    assert not plan["defer_satellite"]
+
+    plan = controller.plan("image", wait_s=1.2 * slo)
+    assert plan["level"] == 4 and plan["defer_satellite"]
+    assert plan["vision_options"]["small_yolo"] and plan["video_sample_fps"] == qos.MINIMAL_VIDEO_SAMPLE_FPS
+
+
+def test_level_steps_down_one_step_per_cooldown(monkeypatch):
+    controller = QoSController(enabled=True)
+    slo = qos.SLO_MS["image"] / 1000
+    assert controller.plan("image", wait_s=1.2 * slo)["level"] == 4
+
+    # Still inside the cooldown: no change
+    assert controller.plan("image")["level"] == 4
+
+    monkeypatch.setattr(qos, "COOLDOWN_SECONDS", 0.0)
+    assert [controller.plan("image")["level"] for _ in range(5)] == [3, 2, 1, 0, 0]
+
+
+def test_backlog_and_service_times_raise_the_prediction():
+    controller = QoSController(executor_threads=1, enabled=True)
+    with controller.running(controller.admit(), "image") as plan:
+        time.sleep(0.05)
+    assert plan["level"] == 0
+    baseline = controller.predicted_latency("image")
+    assert baseline >= 0.05
+
+    for _ in range(10):
+        controller.admit()
+    assert controller.predicted_latency("image") >= baseline + 10 * 0.05 * 0.9
+    assert controller.stats()["queued"] == 10
+
+
+def test_disabled_controller_never_degrades():
+    controller = QoSController(enabled=False)
+    assert controller.plan("video", wait_s=1e6) == {"level": 0, "pressure": 0.0, "steps": [], "applied": []}
+
+
+def test_applied_degradations_are_counted():
+    controller = QoSController(enabled=True)
+    with controller.running(controller.admit(), "image") as plan:
+        plan["applied"] = ["skip_yolo_when_clip_confident"]
+    assert controller.stats()["degradations_applied"]["skip_yolo_when_clip_confident"] == 1
+
+
+def test_vision_degradations_report_only_what_took_effect():
+    plan = {"video_sample_fps": 0.5, "vision_options": {"small_yolo": True}}
+    assert vision_degradations(plan, {"yolo_skipped": True}, is_video=False) == ["skip_yolo_when_clip_confident"]
+    assert vision_degradations(plan, {}, is_video=False) == ["smaller_models"]
+    assert vision_degradations(plan, {"frames_analyzed": 4, "yolo_skipped_frames": 4}, is_video=True) == [
+        "reduce_video_frames", "skip_yolo_when_clip_confident"
+    ]
+
+
+def wait_for(results, report_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = results.get(report_id)
+        if result and result["status"] != "pending":
+            return result
+        time.sleep(0.01)
+    raise AssertionError(f"{report_id} did not finish")
+
+
+def test_deferred_results_in_memory():
+    results = DeferredResults(max_results=2)
+    results.expect("r1")
+    assert results.get("r1") == {"status": "pending"}
+
+    results.submit("r2", lambda x: {"value": x}, 3)
+    assert wait_for(results, "r2") == {"status": "done", "value": 3}
+
+    results.submit("r3", lambda: 1 / 0)
+    assert wait_for(results, "r3")["status"] == "failed"
+    assert results.get("r1") is None
+
+
+def test_deferred_results_are_shared_through_sqlite(tmp_path):
+    db_path = str(tmp_path / "deferred.db")
+    worker, other_worker = DeferredResults(db_path=db_path), DeferredResults(db_path=db_path)
+
+    worker.submit("r1", lambda: {"score": np.float64(0.5), "levels": np.arange(2)})
+    assert wait_for(other_worker, "r1") == {"status": "done", "score": 0.5, "levels": [0, 1]}
+    assert other_worker.get("missing") is None
+
+
+def test_deferred_results_are_bounded(tmp_path):
+    results = DeferredResults(max_results=3, db_path=str(tmp_path / "deferred.db"))
+    for i in range(5):
+        results.expect(f"r{i}")
+        time.sleep(0.002)
+    assert results.get("r0") is None and results.get("r1") is None
+    assert results.get("r4") == {"status": "pending"}
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from backend.report_understanding import (
+    OBJECT_MENTIONS, SEVERITY_HIGH, SEVERITY_LOW, SEVERITY_MEDIUM, UNCERTAINTY_WORDS,
+    check_object_consistency, detect_uncertainty, extract_severity, scan_keywords,
+)
+
+
+# Substring checks the single-pass keyword regex replaced
+
+def substring_severity(text: str) -> dict:
+    text_lower = text.lower()
+    high_count = sum(1 for word in SEVERITY_HIGH if word in text_lower)
+    medium_count = sum(1 for word in SEVERITY_MEDIUM if word in text_lower)
+    low_count = sum(1 for word in SEVERITY_LOW if word in text_lower)
+
+    if high_count > 0:
+        return {"level": "HIGH", "confidence": 0.9}
+    elif medium_count > 0:
+        return {"level": "MEDIUM", "confidence": 0.7}
+    elif low_count > 0:
+        return {"level": "LOW", "confidence": 0.5}
+    else:
+        return {"level": "MEDIUM", "confidence": 0.6}
+
+
+def substring_uncertainty(text: str) -> float:
+    text_lower = text.lower()
+    return min(sum(1 for word in UNCERTAINTY_WORDS if word in text_lower) * 0.3, 1.0)
+
+
+def substring_mentions(text: str) -> dict:
+    text_lower = text.lower()
+    return {item: any(word in text_lower for word in words) for item, words in OBJECT_MENTIONS.items()}
+
+
+def random_texts(n, seed=0):
+    """Texts glued from keywords, keyword fragments and filler, often without spaces"""
+    keywords = SEVERITY_HIGH + SEVERITY_MEDIUM + SEVERITY_LOW + UNCERTAINTY_WORDS + [
+        word for words in OBJECT_MENTIONS.values() for word in words
+    ]
+    pieces = keywords + [kw[:3] for kw in keywords] + ["sea", "the", "WAVES", "Ship", "MIGHT", " ", "!", "s"]
+    rng = random.Random(seed)
+    for _ in range(n):
+        separator = rng.choice(["", " ", " "])
+        yield separator.join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+
+
+def test_keyword_scan_matches_substring_checks():
+    for text in random_texts(5000):
+        keywords = scan_keywords(text)
+        assert extract_severity(text, keywords) == substring_severity(text), text
+        assert detect_uncertainty(text, keywords) == substring_uncertainty(text), text
+        mentions = {item: bool(keywords[f"object_{item}"]) for item in OBJECT_MENTIONS}
+        assert mentions == substring_mentions(text), text
+
+
+def test_overlapping_and_nested_keywords():
+    keywords = scan_keywords("Not sure, MIGHT be shipwreck debris; could be plastic")
+    assert keywords["uncertainty"] == {"not sure", "might", "could be"}
+    assert keywords["object_boat"] == {"ship"}
+    assert keywords["object_garbage"] == {"debris", "plastic"}
+
+    # Each distinct keyword counts once, however often it appears
+    assert detect_uncertainty("maybe maybe maybe") == 0.3
+    assert check_object_consistency("a boat and a swimmer", ["boat"])["mismatches"] == [
+        "'person' mentioned but not detected visually"
+    ]
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from backend import utils
+from backend.resources import ResourceScheduler
+
+BUDGET_VARIABLES = [
+    "COASTAL_CPU_CORES", "COASTAL_INFERENCE_SLOTS", "COASTAL_TORCH_THREADS", "COASTAL_TORCH_INTEROP_THREADS",
+    "COASTAL_OPENCV_THREADS", "COASTAL_EXECUTOR_THREADS", "COASTAL_STAGE_THREADS",
+]
+
+
+@pytest.fixture
+def make_scheduler(monkeypatch):
+    for name in BUDGET_VARIABLES:
+        monkeypatch.delenv(name, raising=False)
+
+    def make(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        return ResourceScheduler()
+    return make
+
+
+def test_available_cores_respects_the_cgroup_quota(monkeypatch):
+    monkeypatch.setattr(utils.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+
+    monkeypatch.setattr(utils, "_cgroup_cpu_limit", lambda: None)
+    assert utils.available_cores() == 8
+
+    monkeypatch.setattr(utils, "_cgroup_cpu_limit", lambda: 2.5)
+    assert utils.available_cores() == 3
+
+    monkeypatch.setattr(utils, "_cgroup_cpu_limit", lambda: 0.2)
+    assert utils.available_cores() == 1
+
+
+def test_budgets_are_sized_from_the_cores(make_scheduler):
+    small = make_scheduler(COASTAL_CPU_CORES=2)
+    assert (small.inference_slots, small.torch_threads, small.executor_threads, small.opencv_threads) == (1, 2, 2, 1)
+
+    large = make_scheduler(COASTAL_CPU_CORES=16)
+    assert (large.inference_slots, large.torch_threads, large.executor_threads, large.opencv_threads) == (2, 8, 4, 4)
+    assert large.stage_threads == 16
+
+    pinned = make_scheduler(COASTAL_CPU_CORES=16, COASTAL_INFERENCE_SLOTS=4, COASTAL_TORCH_THREADS=0)
+    assert pinned.inference_slots == 4 and pinned.torch_threads == 1
+
+
+def test_inference_slot_is_reentrant_on_one_thread(make_scheduler):
+    scheduler = make_scheduler(COASTAL_CPU_CORES=1)
+    with scheduler.inference_slot("clip_image"):
+        # Would deadlock if the nested call waited for the only slot
+        with scheduler.inference_slot("clip_text"):
+            assert scheduler.stats()["inference"] == {"active": 1, "waiting": 0}
+
+    stages = scheduler.stats()["stages"]
+    assert stages["clip_image"]["calls"] == 1 and "clip_text" not in stages
+
+
+def test_inference_slots_limit_concurrency(make_scheduler):
+    scheduler = make_scheduler(COASTAL_CPU_CORES=8)
+    assert scheduler.inference_slots == 2
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def infer():
+        with scheduler.inference_slot("yolo"):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+    threads = [threading.Thread(target=infer) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] == 2
+    assert scheduler.stats()["stages"]["yolo"]["calls"] == 6
+
+
+def test_executor_counts_queued_and_running_work(make_scheduler):
+    scheduler = make_scheduler(COASTAL_EXECUTOR_THREADS=1)
+    release = threading.Event()
+
+    futures = [scheduler.executor.submit(release.wait) for _ in range(3)]
+    cancelled = scheduler.executor.submit(release.wait)
+    assert cancelled.cancel()
+    deadline = time.monotonic() + 2
+    while scheduler.stats()["executor"]["running_requests"] != 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert scheduler.stats()["executor"] == {
+        "queued_requests": 2, "running_requests": 1, "queued_stages": 0, "running_stages": 0
+    }
+
+    release.set()
+    for future in futures:
+        future.result(timeout=2)
+    assert scheduler.stats()["executor"]["queued_requests"] == 0
+    assert scheduler.stats()["executor"]["running_requests"] == 0
+    scheduler.executor.shutdown()
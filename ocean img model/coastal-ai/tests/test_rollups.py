@@ -0,0 +1,142 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from backend import rollups
+from backend.rollups import AlertRollups, _iso, granularity_for, parse_window, region_for
+
+# Middle of the previous hour (recent enough that the pruner keeps minute buckets)
+NOW = (int(time.time()) // 3600 - 1) * 3600 + 1800
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AlertRollups(os.path.join(str(tmp_path), "rollups.db"))
+    yield store
+    store.close()
+
+
+def decision(level, score, confidence=None):
+    return {"alert_level": level, "final_score": score, "confidence": score if confidence is None else confidence}
+
+
+def test_parse_window():
+    assert parse_window("30m") == 1800
+    assert parse_window(" 6H ") == 6 * 3600
+    assert parse_window("7d") == 7 * 86400
+    for window in ["", "6", "6w", "0h", "400d", "-1h"]:
+        with pytest.raises(ValueError):
+            parse_window(window)
+
+
+def test_granularity_for():
+    assert granularity_for(parse_window("30m")) == "minute"
+    assert granularity_for(parse_window("3h")) == "minute"
+    assert granularity_for(parse_window("6h")) == "hour"
+    assert granularity_for(parse_window("7d")) == "hour"
+    assert granularity_for(parse_window("30d")) == "day"
+
+
+def test_region_for():
+    assert region_for(13.1, 80.3) == "13.00,80.25"
+    assert region_for(-0.1, -0.1) == "-0.25,-0.25"
+    assert region_for(None, 80.3) == rollups.UNLOCATED_REGION
+
+
+def test_reports_are_folded_into_aligned_buckets(store):
+    timestamp = _iso(NOW)
+    store.record(decision("high", 0.8), "abnormal_wave", 13.1, 80.3, timestamp)
+    store.record(decision("low", 0.4, 0.2), "abnormal_wave", 13.2, 80.4, timestamp)
+
+    rows = store._connection().execute(
+        "SELECT granularity, bucket, region, reports, score_sum, confidence_sum, max_level, minimal, low, medium, high "
+        "FROM rollups ORDER BY granularity"
+    ).fetchall()
+    assert [row[:4] for row in rows] == [
+        ("day", NOW - NOW % 86400, "13.00,80.25", 2),
+        ("hour", NOW - NOW % 3600, "13.00,80.25", 2),
+        ("minute", NOW - NOW % 60, "13.00,80.25", 2),
+    ]
+    for row in rows:
+        assert row[4] == pytest.approx(1.2) and row[5] == pytest.approx(1.0)
+        assert row[6:] == (3, 0, 1, 0, 1)
+
+
+def test_query_totals_breakdowns_and_filters(store):
+    store.record(decision("high", 0.9), "abnormal_wave", 13.1, 80.3, _iso(NOW - 600))
+    store.record(decision("medium", 0.6), "abnormal_wave", 13.1, 80.3, _iso(NOW - 3 * 3600))
+    store.record(decision("low", 0.3), "marine_garbage", 15.0, 73.9, _iso(NOW - 3600))
+    store.record(decision("minimal", 0.1), "normal", None, None, _iso(NOW))
+    # Outside the window
+    store.record(decision("high", 1.0), "abnormal_wave", 13.1, 80.3, _iso(NOW - 2 * 86400))
+
+    result = store.query("6h", now=NOW)
+    assert result["granularity"] == "hour"
+    assert result["totals"]["reports"] == 4
+    assert result["totals"]["max_level"] == "high"
+    assert result["totals"]["by_level"] == {"minimal": 1, "low": 1, "medium": 1, "high": 1}
+    assert result["regions"][0]["region"] == "13.00,80.25" and result["regions"][0]["reports"] == 2
+    assert result["event_types"]["abnormal_wave"]["avg_score"] == 0.75
+
+    only_region = store.query("6h", region="15.00,73.75", now=NOW)
+    assert only_region["totals"]["reports"] == 1
+    assert list(only_region["event_types"]) == ["marine_garbage"]
+
+    only_event = store.query("7d", event_type="abnormal_wave", now=NOW)
+    assert only_event["totals"]["reports"] == 3 and only_event["totals"]["avg_score"] == pytest.approx(0.833, abs=1e-3)
+
+
+def test_query_series_has_one_entry_per_bucket(store):
+    store.record(decision("high", 0.9), "abnormal_wave", 13.1, 80.3, _iso(NOW - 600))
+    store.record(decision("low", 0.3), "abnormal_wave", 13.1, 80.3, _iso(NOW - 3600))
+
+    result = store.query("6h", series=True, now=NOW)
+    series = result["series"]
+    assert len(series) == 6
+    assert series[0]["bucket"] == result["from"]
+    assert [entry["reports"] for entry in series] == [0, 0, 0, 0, 1, 1]
+    assert "series" not in store.query("6h", now=NOW)
+
+
+def test_prune_drops_expired_buckets_only(store):
+    store.record(decision("high", 0.9), "abnormal_wave", 13.1, 80.3, _iso(NOW - 3 * 86400))
+    store.prune(now=NOW)
+
+    remaining = store._connection().execute("SELECT granularity FROM rollups ORDER BY granularity").fetchall()
+    assert remaining == [("day",), ("hour",)]
+
+
+def test_expired_buckets_are_pruned_off_the_request_path(store, monkeypatch):
+    pruned = []
+    monkeypatch.setattr(rollups, "PRUNE_INTERVAL", 0.01)
+    monkeypatch.setattr(AlertRollups, "prune", lambda self, now=None: pruned.append(threading.current_thread().name))
+
+    running = set(threading.enumerate())
+    store.record(decision("low", 0.3), "normal", 13.1, 80.3)
+    store.record(decision("low", 0.3), "normal", 13.1, 80.3)
+    deadline = time.monotonic() + 2
+    while len(pruned) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(pruned) >= 3 and set(pruned) == {"coastal-rollup-prune"}
+
+    # One pruner per process, however many reports are recorded
+    pruners = [thread for thread in threading.enumerate() if thread not in running]
+    assert len(pruners) == 1
+    store.close()
+    pruners[0].join(1)
+    assert not pruners[0].is_alive()
+
+
+def test_concurrent_writers_share_the_database(tmp_path):
+    path = os.path.join(str(tmp_path), "rollups.db")
+    first, second = AlertRollups(path), AlertRollups(path)
+    first.record(decision("high", 0.9), "abnormal_wave", 13.1, 80.3, _iso(NOW))
+    second.record(decision("high", 0.7), "abnormal_wave", 13.1, 80.3, _iso(NOW))
+    first.close()
+    second.close()
+
+    assert first.query("30m", now=NOW)["totals"]["reports"] == 2
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
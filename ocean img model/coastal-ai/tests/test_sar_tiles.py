@@ -0,0 +1,26 @@
+import numpy as np
+
+from backend.sar_tiles import TileCache
+
+
+def test_decoded_tiles_are_bounded_by_bytes():
+    cache = TileCache(max_bytes=3 * 400)
+    for i in range(5):
+        cache.put(i, np.zeros(100, dtype=np.float32))
+    assert cache.get(0) is None and cache.get(1) is None
+    assert cache.get(4) is not None
+    assert cache.info()["bytes"] == 3 * 400
+
+
+def test_memory_mapped_tiles_are_bounded_by_count(tmp_path):
+    cache = TileCache(max_bytes=1024, max_mapped=2)
+    for i in range(3):
+        path = tmp_path / f"tile{i}.npy"
+        np.save(path, np.zeros((64, 64), dtype=np.float32))
+        cache.put(i, np.load(path, mmap_mode="r"))
+
+    # 16 KiB maps do not count against the 1 KiB heap budget
+    info = cache.info()
+    assert info["bytes"] == 0
+    assert info["mapped_tiles"] == 2
+    assert cache.get(0) is None and cache.get(2) is not None
@@ -0,0 +1,131 @@
+import numpy as np
+
+from backend import temporal_analysis
+from backend.temporal_analysis import assess_video_consistency
+
+
+def walk(rng, n, dim=64, step=0.3):
+    """Normalized embeddings of a slowly changing scene (adjacent similarity ~0.95)"""
+    frames = [rng.standard_normal(dim)]
+    for _ in range(n - 1):
+        noise = rng.standard_normal(dim)
+        frames.append(frames[-1] / np.linalg.norm(frames[-1]) + step * noise / np.linalg.norm(noise))
+    frames = np.array(frames, dtype=np.float32)
+    return frames / np.linalg.norm(frames, axis=1, keepdims=True)
+
+
+def results(n, event_type="rough_sea"):
+    return [{"event_type": event_type, "clip_score": 0.8} for _ in range(n)]
+
+
+def test_natural_footage_is_consistent():
+    embeddings = walk(np.random.default_rng(0), 80)
+    check = assess_video_consistency(results(80), embeddings=embeddings)
+
+    assert check["is_consistent"] and check["suspicious_patterns"] == []
+    assert check["frame_similarity"]["method"] == "exact"
+    assert check["hard_cuts"] == [] and check["repeated_segments"] == []
+
+
+def test_looped_clip():
+    scene = walk(np.random.default_rng(1), 60)
+    embeddings = np.concatenate([scene, scene[:20]])
+    frame_indices = [30 * k for k in range(80)]
+    check = assess_video_consistency(results(80), embeddings=embeddings, frame_indices=frame_indices)
+
+    assert not check["is_consistent"]
+    assert "Video loops back to earlier footage" in check["suspicious_patterns"]
+    assert check["repeated_segments"] == [{
+        "kind": "loop", "source_frames": [0, 19 * 30], "repeat_frames": [60 * 30, 79 * 30],
+        "samples": 20, "similarity": 1.0
+    }]
+    assert check["offending_frames"] == frame_indices[60:]
+
+
+def test_repeated_segment_inside_the_video():
+    embeddings = walk(np.random.default_rng(2), 80)
+    embeddings[40:50] = embeddings[10:20]
+    check = assess_video_consistency(results(80), embeddings=embeddings)
+
+    assert [(seg["kind"], seg["source_frames"], seg["repeat_frames"]) for seg in check["repeated_segments"]] == [
+        ("repeated_segment", [10, 19], [40, 49])
+    ]
+    # The copied segment starts and ends with a jump
+    assert [cut["frame"] for cut in check["hard_cuts"]] == [40, 50]
+
+
+def test_splice_is_a_hard_cut():
+    rng = np.random.default_rng(3)
+    embeddings = np.concatenate([walk(rng, 40), walk(rng, 40)])
+    check = assess_video_consistency(results(80), embeddings=embeddings)
+
+    assert [cut["frame"] for cut in check["hard_cuts"]] == [40]
+    assert check["hard_cuts"][0]["previous_frame"] == 39
+    assert "1 hard cut(s) between frames - possible splice" in check["suspicious_patterns"]
+    assert check["repeated_segments"] == []
+
+
+def test_static_footage_is_not_reported_as_a_loop():
+    rng = np.random.default_rng(4)
+    embeddings = walk(rng, 1, step=0.0).repeat(50, axis=0) + 0.001 * rng.standard_normal((50, 64)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    check = assess_video_consistency(results(50), embeddings=embeddings)
+
+    assert check["frame_similarity"]["is_static"] and check["frame_similarity"]["method"] == "static"
+    assert check["suspicious_patterns"] == ["All frames near-identical - possible still image or frozen loop"]
+    assert check["repeated_segments"] == []
+
+
+def hash_walk(rng, n, flips=8):
+    """64-bit frame signatures that drift by `flips` bits per sample"""
+    hashes = [int(rng.integers(0, 2**63))]
+    for _ in range(n - 1):
+        bits = rng.choice(64, size=flips, replace=False)
+        hashes.append(hashes[-1] ^ sum(1 << int(bit) for bit in bits))
+    return hashes
+
+
+def test_signatures_only():
+    rng = np.random.default_rng(5)
+    scene = hash_walk(rng, 50)
+    signatures = scene + scene[:15]
+    check = assess_video_consistency(results(65), signatures=signatures)
+
+    assert check["frame_similarity"]["method"] == "signature"
+    assert check["frame_similarity"]["adjacent_mean"] is None
+    assert [(seg["kind"], seg["repeat_frames"]) for seg in check["repeated_segments"]] == [("loop", [50, 64])]
+    # The jump back to the start of the clip
+    assert [cut["frame"] for cut in check["hard_cuts"]] == [50]
+    assert check["hard_cuts"][0]["similarity"] is None and check["hard_cuts"][0]["hash_distance"] >= 24
+
+
+def test_long_videos_use_sketches_and_agree_with_the_exact_search(monkeypatch):
+    rng = np.random.default_rng(6)
+    scene = walk(rng, 1100)
+    embeddings = np.concatenate([scene, scene[200:240]])
+    embeddings[600:630] = embeddings[100:130]
+    n = len(embeddings)
+    assert n > temporal_analysis.EXACT_MAX_FRAMES
+
+    sketched = assess_video_consistency(results(n), embeddings=embeddings)
+    assert sketched["frame_similarity"]["method"] == "sketch"
+
+    monkeypatch.setattr(temporal_analysis, "EXACT_MAX_FRAMES", n)
+    exact = assess_video_consistency(results(n), embeddings=embeddings)
+    assert exact["frame_similarity"]["method"] == "exact"
+
+    assert sketched["repeated_segments"] == exact["repeated_segments"]
+    assert [(seg["kind"], seg["repeat_frames"]) for seg in exact["repeated_segments"]] == [
+        ("repeated_segment", [600, 629]), ("loop", [1100, 1139])
+    ]
+
+
+def test_without_frame_features_only_the_results_are_compared():
+    check = assess_video_consistency(results(10))
+    assert "frame_similarity" not in check
+    assert check["suspicious_patterns"] == ["All frames identical - possible video loop"]
+
+    mixed = results(7) + results(3, "normal")
+    for k, result in enumerate(mixed):
+        result["clip_score"] = 0.5 + 0.01 * k
+    assert assess_video_consistency(mixed)["is_consistent"]
@@ -0,0 +1,79 @@
+import queue
+import sys
+import threading
+import types
+
+import pytest
+
+from backend import video_mapreduce
+from backend.video_mapreduce import VideoBroker, connect_broker, plan_segments
+
+
+def test_segments_cover_every_sampled_frame():
+    segments = plan_segments(frame_count=30 * 300, fps=30, segment_seconds=60)
+    assert segments[0] == (0, 1800) and segments[-1] == (7200, None)
+    assert all(start % 30 == 0 for start, _ in segments)
+
+
+def test_broker_needs_an_explicit_authkey(monkeypatch):
+    monkeypatch.setattr(video_mapreduce, "BROKER_AUTHKEY", None)
+    with pytest.raises(RuntimeError, match="COASTAL_VIDEO_BROKER_AUTHKEY"):
+        video_mapreduce.broker_authkey()
+    with pytest.raises(SystemExit):
+        video_mapreduce.main(["broker"])
+
+    assert video_mapreduce.broker_authkey(b"cli-secret") == b"cli-secret"
+    monkeypatch.setattr(video_mapreduce, "BROKER_AUTHKEY", "env-secret")
+    assert video_mapreduce.broker_authkey() == b"env-secret"
+
+
+def test_results_of_dropped_jobs_are_discarded():
+    results = video_mapreduce._result_queue("job")
+    video_mapreduce._put_result("job", (0, {"frames": []}, None))
+    assert results.get_nowait() == (0, {"frames": []}, None)
+
+    video_mapreduce._drop_results("job")
+    video_mapreduce._put_result("job", (1, {"frames": []}, None))
+    assert "job" not in video_mapreduce._results
+
+
+def test_broker_round_trip(monkeypatch):
+    manager = VideoBroker(address=("127.0.0.1", 0), authkey=b"secret")
+    server = manager.get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.address
+    monkeypatch.setattr(video_mapreduce, "BROKER_AUTHKEY", "secret")
+
+    client = connect_broker(f"{host}:{port}")
+    results = client.result_queue("job-1")
+    client.put_result("job-1", (0, "segment", None))
+    assert results.get(timeout=5) == (0, "segment", None)
+
+    client.drop_results("job-1")
+    client.put_result("job-1", (1, "late segment", None))
+    with pytest.raises(queue.Empty):
+        client.result_queue("job-1").get(timeout=0.1)
+    client.drop_results("job-1")
+
+    with pytest.raises(Exception):
+        connect_broker(f"{host}:{port}", authkey=b"wrong")
+
+
+def test_workers_get_the_planned_sample_rate(monkeypatch):
+    fake = types.ModuleType("backend.vision_video")
+    fake.VIDEO_SAMPLE_FPS = 2.0
+    fake.video_info = lambda path, sample_fps: {
+        "frame_count": 30 * 300, "fps": 30.0, "sample_step": int(30 / sample_fps)
+    }
+    fake.merge_segments = lambda outputs: outputs
+    fake.aggregate_video = lambda merged: {"segments": merged}
+    monkeypatch.setitem(sys.modules, "backend.vision_video", fake)
+
+    tasks = []
+    monkeypatch.setattr(video_mapreduce, "VIDEO_BROKER", None)
+    monkeypatch.setattr(video_mapreduce, "_map_pool",
+                        lambda path, segments, sample_fps, options: tasks.append(sample_fps) or segments)
+
+    result = video_mapreduce.analyze_video_parallel("clip.mp4", segment_seconds=60)
+    assert tasks == [2.0]
+    assert all(start % 15 == 0 for start, _ in result["segments"])